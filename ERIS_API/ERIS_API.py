@@ -1,41 +1,58 @@
-from requests.auth import HTTPBasicAuth
-
 import pandas as pd
 
 import logging
 import requests
 import datetime
-import base64
+import threading
+import time
+import bisect
 import concurrent.futures
+import pickle
 
 
-from .ERIS_Responses import ERISResponse
+from .ERIS_Responses import ERISResponse, parse_columns, window_end
 from .ERIS_Parameters import ERISRequest, ERISTag
-from .models import Settings
+from .ERIS_Cache import ERISSegmentCache, ERISResponseCache, ERISSyncState
+from .ERIS_Retry import ERISRetryPolicy
+from .ERIS_Concurrency import ERISConcurrencyController
+from .ERIS_JSON import JSONDecoder
+from .ERIS_Metrics import ERISMetrics, add_stage, take_connect_time, time_connections
+from .ERIS_Sink import ERISParquetSink
+from .ERIS_Client import ERISClient
+from .models import ERISColumnChunk, ERISColumnData
+
+from typing import Any, Optional, Dict, Union, Iterator, List, Tuple
+from pathlib import Path
+from urllib3.util.request import ACCEPT_ENCODING
+
+ITER_OUTPUTS = ['dataframe', 'columns', 'response']
 
-config_settings = Settings()
 
-from typing import Optional, Dict, Union
+def _parse_columns_timed(content: bytes, is_xml: bool, json_decoder: Optional[JSONDecoder]=None) -> Tuple[List[ERISColumnData], float]:
+    """parse_columns, also returning the seconds it took. Run in the parser executor."""
+    started = time.perf_counter()
+    tag_data = parse_columns(content, is_xml, json_decoder)
+    return tag_data, time.perf_counter() - started
 
 
-class _Token_Auth(requests.auth.AuthBase):
-    """Subclass request auth for token authorization"""
-    def __init__(self, username: str, token: str):
-        self.username = username
-        self.token = token
+def _picklable(value: Any) -> bool:
+    try:
+        pickle.dumps(value)
+    except Exception:
+        return False
+    return True
 
-    def __call__(self, r: requests.Request):
-        assert self.username is not None, "No username supplied"
-        assert self.token is not None, "No token supplied"
-        _auth = ':'.join((self.username, self.token)).encode()
-        _encoded = base64.b64encode(_auth).strip()
-        authstr = 'Token ' + _encoded.decode()
-        r.headers['Authorization'] = authstr
-        return r
 
+class _ParseJob(object):
+    """Response of a request that has been downloaded and submitted to the parser executor"""
+    def __init__(self, request_parameters: ERISRequest, result: requests.Response, future: concurrent.futures.Future) -> None:
+        self.request_parameters = request_parameters
+        self.result = result
+        self.future = future
 
-class ERISAPI(object):
-    def __init__(self, base_url: str, client_id: str, username: Optional[str]=None, password: Optional[str]=None, token: Optional[str]=None, timeout: Optional[int]=None):
+
+class ERISAPI(ERISClient):
+    def __init__(self, base_url: str, client_id: str, username: Optional[str]=None, password: Optional[str]=None, token: Optional[str]=None, timeout: Optional[int]=None, workers: Optional[int]=None, keep_alive: Optional[bool]=None, warm_up: Optional[int]=None, cache: Optional[ERISSegmentCache]=None, response_cache: Optional[ERISResponseCache]=None, retry: Optional[ERISRetryPolicy]=None, token_path: Optional[Union[str, Path]]=None, token_renewal: Optional[int]=None, concurrency: Optional[ERISConcurrencyController]=None, json_decoder: Optional[JSONDecoder]=None, metrics: Optional[ERISMetrics]=None):
         """ERIS Api class. 
         
         Handles the authentication, and parsing of the supplied ERISRequest.
@@ -52,41 +69,136 @@ class ERISAPI(object):
             token (str, optional): token for login. Optional as a password can also be supplied.
 
             timeout (int, optional): Set default timeout for request. Defaults to 1800 seconds if left as None.
+
+            workers (int, optional): number of concurrent workers. Also sets the size of the connection pool. Defaults to 8.
+            keep_alive (bool, optional): keep connections open between requests. Defaults to True.
+            warm_up (int, optional): number of connections to open when the class is created. Defaults to None (no warm up).
+
+            cache (ERISSegmentCache, optional): on disk cache of tag data. Only the ranges missing from the cache are requested. Defaults to None.
+            response_cache (ERISResponseCache, optional): in memory cache of responses. Identical requests made at the same time share one request. Defaults to None.
+
+            retry (ERISRetryPolicy, optional): when to retry failed requests, and how long to wait. Defaults to ERISRetryPolicy().
+
+            token_path (str, optional): file to save the access token to, so later processes reuse it until it expires instead of logging in. 
+                The file is only readable by the current user. Defaults to None (not saved), or the eris_token_path environment variable.
+            token_renewal (int, optional): seconds before the token expires to renew it in the background, 
+                at most half the lifetime of the token. Defaults to 300.
+
+            concurrency (ERISConcurrencyController, optional): adapt the number of concurrent requests to the latency and errors of the server, up to `workers`. 
+                Defaults to None (always `workers` requests in flight).
+
+            json_decoder (str, Callable, optional): decoder of the JSON responses, by name ('orjson', 'ujson', 'json') or a function of the raw bytes. 
+                Defaults to the fastest installed, falling back to the standard library. Install orjson with pip install ERIS-API[fast-json].
+
+            metrics (ERISMetrics, optional): timings of each stage of the requests, and counters of the bytes, rows, retries and errors. 
+                Defaults to a new ERISMetrics, read from `metrics`.
         """
-        super().__init__()
+        if workers is None:
+            workers = concurrency.max_limit if concurrency is not None and concurrency.max_limit is not None else None
+        super().__init__(base_url, client_id, username, password, token, timeout, workers, keep_alive, retry, token_path, token_renewal, json_decoder, metrics)
+
+        self._renew_lock = threading.Lock()
+
+        self.cache = cache
+        self.response_cache = response_cache
 
-        self.base_url = base_url
-        self.base_url = base_url[:-1] if self.base_url.endswith("/") else base_url
+        self.concurrency = concurrency
+        if concurrency is not None:
+            concurrency.max_limit = self.workers if concurrency.max_limit is None else min(concurrency.max_limit, self.workers)
+            concurrency.limit = min(concurrency.limit, concurrency.max_limit)
 
-        self.base_esrm_url = self.base_url+"/esrm/rest"
-        self.base_api_url = self.base_url+"/api/rest"
+        self._local = threading.local()
+        self._adapter = self._build_adapter()
 
-        self.authenticate_url = "/auth/login"
-        self.data_url = "/tag/data"
+        if warm_up:
+            self.warm_up(warm_up)
 
-        self.timeout = 1800 if timeout is None else timeout
+    def _build_adapter(self) -> requests.adapters.HTTPAdapter:
+        """Build the connection pool shared by every request made from this class.
 
-        self.access_token = None
-        self.client_id = client_id
+        The pool is sized to the number of workers and blocks when all connections are in use,
+        so concurrent requests wait for a free keep-alive connection instead of opening new ones.
+        New connections are timed for the connect stage of the metrics.
+        """
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=self.workers,
+            pool_block=True
+        )
+        time_connections(adapter)
+        return adapter
 
-        self.username = username if username is not None else config_settings.eris_username
-        self.password = password if password is not None else config_settings.eris_password
-        self.login_token = token if token is not None else config_settings.eris_token
+    @property
+    def session(self) -> requests.Session:
+        """Session for the current thread.
 
-        assert any([_ is not None for _ in [self.login_token, self.password]]), "password or token must be supplied"
+        Each thread gets its own session so cookies and headers are not shared between threads,
+        but all sessions are mounted on the same adapter and share the one connection pool.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            session.headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+            session.headers["Accept-Encoding"] = ACCEPT_ENCODING
+            self._local.session = session
+        return session
+
+    def warm_up(self, connections: Optional[int]=None):
+        """Open connections to the ERIS server ahead of the first request.
+
+        Args:
+            connections (int, optional): number of connections to open. Limited to the pool size. Defaults to 1.
+        """
+        connections = 1 if connections is None or connections is True else connections
+        connections = min(connections, self.workers)
+
+        def _open():
+            try:
+                self.session.head(self.base_url, timeout=self.timeout)
+            except Exception as e:
+                logging.warning(f"Connection warm up failed: {e}")
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+            for _ in range(connections):
+                executor.submit(_open)
+
+    def close(self):
+        """Close the connection pool"""
+        self._adapter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def get_access_token(self, **kwargs) -> str:
         """Authenticate to ERIS and obtain an access token. 
 
         If token exists (aka a previous request) then the time is validated 
-        against the expiry time of the current token
+        against the expiry time of the current token.
+
+        Only one login is made at a time. Other threads wait for it and use the new token.
+        A token within `token_renewal` of its expiry is still returned, and a new one is requested in the background.
         """
         if self._current_token_valid():
-            return self.access_token.get("x-access-token")
+            token = self.access_token.get("x-access-token")
+            if not self._current_token_valid(self._renewal_margin()):
+                self._renew_token()
+            return token
 
+        with self._token_lock:
+            if self._current_token_valid():
+                return self.access_token.get("x-access-token")
+            return self._login(**kwargs)
+
+    def _login(self, **kwargs) -> str:
         auth_uri = self.base_api_url + self.authenticate_url
 
-        result = requests.post(
+        started = time.monotonic()
+        result = self.session.post(
             auth_uri, 
             auth=self.build_auth(), 
             headers={"x-client-id": self.client_id},
@@ -102,42 +214,31 @@ class ERISAPI(object):
 
         _data = result_json.get('data', {})
         self.access_token = _data
+        self._save_token()
+        self.metrics.record_login(time.monotonic() - started)
         return self.access_token.get("x-access-token")
 
-    def build_auth(self) -> Union[_Token_Auth, requests.auth.HTTPBasicAuth]:
-        """Construct the requests authorization class
-
-        Will return either HTTPBasicAuth or _Token_Auth.
-
-        If password is present, then HTTPBasic, otherwise _Token_Auth
-        """
-        username = self.username
-        password = self.password
-        token = self.login_token
-        if password is not None:
-            return HTTPBasicAuth(username, password)
-        elif token is not None:
-            return _Token_Auth(username, token)
-        
-        raise "Username, Password and Token is empty"
-
-    def _current_token_valid(self) -> bool:
-        """Validate if current token is valid.
-        
-        returns:
-            bool: is token valid then True, else False
-        """
-        if self.access_token is None: return False
-
-        expire_time = self.access_token.get("expires")
-        if expire_time is None: return False
-
-        check_time = datetime.datetime.now() + datetime.timedelta(minutes=1)
-        expire_time = datetime.datetime.strptime(expire_time, "%Y-%m-%dT%H:%M:%S.%f")
-        is_valid = True if expire_time>check_time else False
-        return is_valid
-
-    def request_api_data(self, request_parameters: ERISRequest, **kwargs) -> ERISResponse:
+    def _renew_token(self):
+        """Login in a background thread, unless a renewal is already running or one was started recently"""
+        if not self._renew_lock.acquire(blocking=False):
+            return
+        if not self._renewal_due():
+            self._renew_lock.release()
+            return
+
+        def _renew():
+            try:
+                with self._token_lock:
+                    if not self._current_token_valid(self._renewal_margin()):
+                        self._login()
+            except Exception as e:
+                logging.error(f"Token renewal failed: {e}")
+            finally:
+                self._renew_lock.release()
+
+        threading.Thread(target=_renew, daemon=True).start()
+
+    def request_api_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, parser: Optional[concurrent.futures.Executor]=None, **kwargs) -> ERISResponse:
         """Request ERIS data via the API. Requires request parameters in the form of ERISResponse class.
         Args:
             request_parameters (
@@ -146,60 +247,296 @@ class ERISAPI(object):
                     "end": datetime.datetime,
                     tags: ["optional label", "tag", "sample mode", "period"]
                 }): ERISResponse containing the requesting tags
+            fast (bool, optional): parse the response directly to columns instead of a model per row. Defaults to False.
+            stream (bool, optional): decode the response incrementally as it is downloaded instead of loading the whole body first. 
+                Results are columns, as with fast. Defaults to False.
+            parser (Executor, optional): decode the response in this executor, ie a ProcessPoolExecutor so parsing is not held by the GIL. 
+                Results are columns, as with fast. Defaults to None (decoded in the calling thread).
 
         Returns:
             dict: json result of the request as a dictionary
         """
+        uri = self.base_api_url + self.data_url
+        columns = fast or stream or parser is not None
+        return self._response_from_cache(uri, request_parameters, columns, self._load_api_data, request_parameters, fast, stream, parser, **kwargs)
+
+    def _load_api_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, parser: Optional[concurrent.futures.Executor]=None, **kwargs) -> ERISResponse:
+        if self._use_cache(request_parameters):
+            return self._request_cached_api_data(request_parameters, stream, **kwargs)
+        if parser is not None and not stream:
+            return self._request_parsed_api_data(request_parameters, parser, **kwargs)
+        return self._request_api_data(request_parameters, fast, stream, **kwargs)
+
+    def _request_parsed_api_data(self, request_parameters: ERISRequest, parser: concurrent.futures.Executor, **kwargs) -> ERISResponse:
+        """Download the response in this thread and decode it to columns in the parser executor"""
+        job = self._submit_parse(request_parameters, parser, **kwargs)
+        return self._finish_parse(job) if isinstance(job, _ParseJob) else job
+
+    def _submit_parse(self, request_parameters: ERISRequest, parser: concurrent.futures.Executor, **kwargs) -> Union['_ParseJob', requests.Response, None]:
+        """Download the response and submit it to the parser executor, without waiting for it to be decoded.
+
+        Returns the failed result if the download fails.
+        """
+        result = None
+        try:
+            uri = self.base_api_url + self.data_url
+            params = self._construct_request_parameters(request_parameters)
+            result = self.request_data(uri, params, **kwargs)
+
+            assert result.status_code == 200, "Failed to reach API"
+            future = parser.submit(_parse_columns_timed, result.content, False, self.json_decoder)
+            return _ParseJob(request_parameters, result, future)
+        except Exception as e:
+            logging.error(e)
+            self.metrics.record_error(e)
+            return result
+
+    def _finish_parse(self, job: '_ParseJob') -> Union[ERISResponse, requests.Response]:
+        """Wait for the response to be decoded and match it to the request. Returns the downloaded response if decoding fails."""
+        try:
+            tag_data, decode = job.future.result()
+            eris_response = ERISResponse.from_columns(job.request_parameters, tag_data)
+            eris_response.response_class = job.result
+            eris_response.timings.update(getattr(job.result, 'eris_timing', None) or {})
+            add_stage(eris_response.timings, 'decode', decode)
+            eris_response._measure_transfer()
+            self._record_response(eris_response)
+            return eris_response
+        except Exception as e:
+            logging.error(e)
+            self.metrics.record_error(e)
+            return job.result
+
+    def _response_from_cache(self, uri: str, request_parameters: ERISRequest, columns: Optional[bool], request, *args, **kwargs) -> ERISResponse:
+        """Answer the request from the response cache if there is one, otherwise call request(*args, **kwargs).
+
+        The cached response is rebound to the tags of this request. Failed requests are not cached.
+        """
+        if self.response_cache is None:
+            return request(*args, **kwargs)
+
+        key = self.response_cache.request_key(uri, self._construct_request_parameters(request_parameters), columns)
+        result = self.response_cache.get_or_request(
+            key,
+            lambda: request(*args, **kwargs),
+            lambda _: isinstance(_, ERISResponse) and _.tag_data is not None
+        )
+        return result.rebind(request_parameters) if isinstance(result, ERISResponse) else result
+
+    def _request_api_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, **kwargs) -> ERISResponse:
         eris_response = None
+        result = None
         try:
             uri = self.base_api_url + self.data_url
             params = self._construct_request_parameters(request_parameters)
+            if stream:
+                kwargs['stream'] = True
             result = self.request_data(uri, params, **kwargs)
 
             eris_response = result
 
             assert result.status_code == 200, "Failed to reach API"
             eris_response = ERISResponse(
-                result, request_parameters, False
+                result, request_parameters, False, fast, stream, json_decoder=self.json_decoder
             )
             eris_response.process_results()
+            self._record_response(eris_response)
 
             return eris_response
         except Exception as e:
             logging.error(e)
+            self.metrics.record_error(e)
         finally:
+            if stream and result is not None:
+                result.close()
             return eris_response
 
-    def request_esrm_data(self, request_parameters: ERISRequest, **kwargs) -> ERISResponse:
+    def _use_cache(self, request_parameters: ERISRequest) -> bool:
+        """The cache is only used for requests with a fixed start/end and without regex tags"""
+        if self.cache is None or request_parameters.regex:
+            return False
+        return all([isinstance(_, datetime.datetime) for _ in [request_parameters.start, request_parameters.end]])
+
+    def _request_cached_api_data(self, request_parameters: ERISRequest, stream: Optional[bool]=None, **kwargs) -> ERISResponse:
+        """Request only the ranges of each tag that are missing from the cache, then answer the request from the cache.
+
+        Tags missing the same ranges are requested together. If any request fails, the failed result is returned.
+        Only tags that returned rows without an error are saved, so the ranges of the others are requested again next time.
+        """
+        start, end = request_parameters.start, request_parameters.end
+        keys = {_.request_uuid: self.cache.tag_key(self.base_url, _) for _ in request_parameters.tags}
+
+        missing: Dict[tuple, List[ERISTag]] = {}
+        for tag in request_parameters.tags:
+            ranges = tuple(self.cache.missing_ranges(keys[tag.request_uuid], start, end))
+            if len(ranges) > 0:
+                missing.setdefault(ranges, []).append(tag)
+
+        for ranges, tags in missing.items():
+            for range_start, range_end in ranges:
+                _request = ERISRequest(range_start, range_end, tags, None, request_parameters.compact)
+                result = self._request_api_data(_request, True, stream, **kwargs)
+                if not isinstance(result, ERISResponse) or result.tag_data is None:
+                    return result
+
+                failed = result.failed_tags()
+                for tag in result.tag_data:
+                    if tag.eris_tag is not None and tag.eris_tag.request_uuid not in failed:
+                        self.cache.store(keys[tag.eris_tag.request_uuid], range_start, range_end, tag)
+
+        tag_data = []
+        for tag in request_parameters.tags:
+            data = self.cache.load(keys[tag.request_uuid], start, end)
+            data.tagUID = tag.request_uuid
+            tag_data.append(data)
+        return ERISResponse.from_columns(request_parameters, tag_data)
+
+    def sync(self, tags: Union[ERISTag, List[ERISTag]], store: ERISSyncState, start: Optional[datetime.datetime]=None, look_back: Optional[datetime.timedelta]=None, fast: Optional[bool]=None, stream: Optional[bool]=None, **kwargs) -> List[ERISResponse]:
+        """Request only the data received since the last sync of each tag.
+
+        The last timestamp received for each tag is kept in the store. Tags that have been synced before are requested 
+        from after that timestamp to now, and tags that have not are requested from `start`.
+        Watermarks are only moved forward once a request succeeds, so a failed sync is requested again on the next run.
+
+        Args:
+            tags (ERISTag, List[ERISTag]): tags to sync
+            store (ERISSyncState): store of the last timestamp of each tag
+            start (datetime, optional): start of tags that have not been synced before. Required if any tag has no watermark.
+            look_back (timedelta, optional): request this far before the watermark again, to pick up late corrections. 
+                Defaults to no look back (only data after the watermark).
+            fast (bool, optional): parse the response directly to columns. Defaults to False.
+            stream (bool, optional): decode the response incrementally. Defaults to False.
+
+        Returns:
+            List[ERISResponse]: one response per group of tags with the same start. Use combine_concurrent_results to combine them.
+        """
+        tags = tags if isinstance(tags, list) else [tags]
+        end = datetime.datetime.now().replace(microsecond=0)
+        keys = {_.request_uuid: store.tag_key(self.base_url, _) for _ in tags}
+
+        groups: Dict[datetime.datetime, List[ERISTag]] = {}
+        for tag in tags:
+            watermark = store.watermark(keys[tag.request_uuid])
+            if watermark is None:
+                assert start is not None, f"{tag.tag} has not been synced, a start time is required"
+                tag_start = start
+            elif look_back:
+                tag_start = watermark - look_back
+            else:
+                tag_start = watermark + datetime.timedelta(seconds=1)
+            if tag_start < end:
+                groups.setdefault(tag_start, []).append(tag)
+
+        results = []
+        for tag_start, group in sorted(groups.items(), key=lambda _: _[0]):
+            result = self.request_api_data(ERISRequest(tag_start, end, group), fast, stream, **kwargs)
+            results.append(result)
+            if not isinstance(result, ERISResponse) or result.tag_data is None:
+                logging.error(f"Sync of {len(group)} tags from {tag_start} failed, watermarks not updated")
+                continue
+
+            for tag in result.tag_data:
+                last = store.last_time(tag)
+                if tag.eris_tag is not None and last is not None:
+                    store.update(keys[tag.eris_tag.request_uuid], min(last, end))
+        return results
+
+    def stream_api_data(self, request_parameters: ERISRequest, chunk_size: Optional[int]=None, **kwargs) -> Iterator[ERISColumnChunk]:
+        """Request ERIS data via the API, decoding the response as it is downloaded.
+
+        Yields the data of each tag in chunks of at most `chunk_size` rows, so memory grows with the chunk size 
+        and not with the size of the response. The matching ERISTag of a chunk is in `chunk.eris_tag`.
+
+        Args:
+            request_parameters (ERISRequest): request of the tags
+            chunk_size (int, optional): maximum rows per chunk. Defaults to 10000.
+        """
+        uri = self.base_api_url + self.data_url
+        params = self._construct_request_parameters(request_parameters)
+        result = self.request_data(uri, params, stream=True, **kwargs)
+        try:
+            assert result.status_code == 200, "Failed to reach API"
+            eris_response = ERISResponse(
+                result, request_parameters, False, True, True, chunk_size
+            )
+            yield from self._stream_chunks(eris_response)
+        finally:
+            result.close()
+
+    def request_esrm_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, **kwargs) -> ERISResponse:
         """Requesting via the ESRM url
         requires API input dictionary and returns the XML content
+
+        Set `fast` to parse the response directly to columns instead of a model per row.
+        Set `stream` to parse the XML incrementally as it is downloaded. Results are columns, as with fast.
         """
+        uri = self.base_esrm_url + self.data_url
+        return self._response_from_cache(uri, request_parameters, fast or stream, self._request_esrm_data, request_parameters, fast, stream, **kwargs)
+
+    def _request_esrm_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, **kwargs) -> ERISResponse:
         eris_response = None
+        result = None
         try:
             params = self._construct_request_parameters(request_parameters)
             uri = self.base_esrm_url + self.data_url
-            result = requests.get(
-                uri, 
-                params=params, 
-                timeout=self.timeout,
-                **kwargs
-            )
+            if stream:
+                kwargs['stream'] = True
+            result = self._get(uri, params, **kwargs)
             eris_response = result
 
             assert result.status_code == 200, "Status Code failed"
 
             eris_response = ERISResponse(
-                result, request_parameters, True
+                result, request_parameters, True, fast, stream
             )
             eris_response.process_results()
+            self._record_response(eris_response)
 
             return eris_response
 
         except Exception as e:
             logging.error(e)
+            self.metrics.record_error(e)
         finally:
+            if stream and result is not None:
+                result.close()
             return eris_response    
 
+    def stream_esrm_data(self, request_parameters: ERISRequest, chunk_size: Optional[int]=None, **kwargs) -> Iterator[ERISColumnChunk]:
+        """Request ERIS data via the ESRM url, parsing the XML as it is downloaded.
+
+        Yields the data of each tag in chunks of at most `chunk_size` rows. See stream_api_data.
+        """
+        params = self._construct_request_parameters(request_parameters)
+        uri = self.base_esrm_url + self.data_url
+        result = self._get(uri, params, stream=True, **kwargs)
+        try:
+            assert result.status_code == 200, "Status Code failed"
+            eris_response = ERISResponse(
+                result, request_parameters, True, True, True, chunk_size
+            )
+            yield from self._stream_chunks(eris_response)
+        finally:
+            result.close()
+
+    def _stream_chunks(self, eris_response: ERISResponse) -> Iterator[ERISColumnChunk]:
+        """Yield the chunks of a streamed response, then record its transfer and metrics.
+
+        Only the time spent reading the next chunk is counted in decode, not the time the caller spends on each chunk.
+        """
+        chunks = eris_response.iter_chunks()
+        rows = 0
+        tags = set()
+        while True:
+            chunk = eris_response._timed('decode', next, chunks, None)
+            if chunk is None:
+                break
+            rows += len(chunk)
+            tags.add(chunk.tag_index)
+            yield chunk
+        self.transfer.record(eris_response)
+        self._record_metrics(eris_response, rows, len(tags))
+
     def request_data(self, request_url: str, request_parameters: Optional[ERISRequest]=None, **kwargs):
         """Generic request. 
         Intended use is to provide the authenticated request to any eris endpoint.
@@ -211,112 +548,326 @@ class ERISAPI(object):
             url (str): path to the requested endpoint
             request_parameters (dict, optional): dictionary of parameters to pass. Defaults to None.
 
+        If the token is rejected with a 401 (ie it was revoked or expired early), a new one is obtained and the request is made once more.
+
         Returns:
             request.Response: Response class from the request library.
         """
-        access_token = self.get_access_token(**kwargs)
         params = request_parameters if request_parameters is not None else None
-        result = requests.get(
-            request_url, 
-            params=params, 
-            timeout=self.timeout,
-            headers={
-                "x-access-token": access_token,
-                "x-client-id": self.client_id
-            },
-            **kwargs
-        )
-
-        return result
-
-    def _construct_request_parameters(self, tag_class: ERISRequest) -> Dict[str, str]:
-        _start = tag_class.start
-        _end = tag_class.end
-
-        dt_format = "%Y-%m-%dT%H:%M:%S"
-        _start = _start.strftime(dt_format) if isinstance(_start, datetime.datetime) else _start
-        _end = _end.strftime(dt_format) if isinstance(_end, datetime.datetime) else _end
-        _tags = ",".join([_.tag_to_string() for _ in tag_class.tags])
-        out_params = {"start": _start, "end": _end, "tags": _tags}
+        timing = {}
+        for attempt in range(2):
+            started = time.monotonic()
+            access_token = self.get_access_token(**kwargs)
+            add_stage(timing, 'auth', time.monotonic() - started)
+            result = self._get(
+                request_url, 
+                params, 
+                headers={
+                    "x-access-token": access_token,
+                    "x-client-id": self.client_id
+                },
+                timing=timing,
+                **kwargs
+            )
+            if result.status_code != 401 or attempt > 0:
+                return result
 
-        if tag_class.regex is not None:
-            out_params["regex"] = tag_class.regex
+            logging.warning(f"Access token rejected by {request_url}, logging in again")
+            result.close()
+            self._expire_token(access_token)
 
-        if tag_class.compact is not None:
-            out_params['compact'] = tag_class.compact
+    def _get(self, request_url: str, params: Optional[Dict]=None, headers: Optional[Dict[str, str]]=None, timing: Optional[Dict[str, float]]=None, **kwargs) -> requests.Response:
+        """GET from the shared session, retrying failures allowed by the retry policy with a backoff between attempts.
 
-        return out_params
+        A connection closed part way through the body (ChunkedEncodingError, or ContentDecodingError of the truncated body) 
+        is retried as a connection error. Streamed bodies are read after this returns, so are not retried.
+        Raises the last exception if a request that failed without a response is not retried. 
+        If it was a read timeout, the timed_out flag of the thread is set so the window can be split.
 
-    def request_api_data_concurrent(self, request_parameters: Optional[ERISRequest]=None, delta=None, **kwargs):
+        The connect, ttfb, download and backoff seconds of all attempts are added to `timing`, 
+        which is attached to the response as `eris_timing`.
+        """
+        timing = {} if timing is None else timing
+        attempt = 0
+        while True:
+            take_connect_time()
+            started = time.monotonic()
+            try:
+                result = self.session.get(
+                    request_url,
+                    params=params,
+                    timeout=self.timeout,
+                    headers=headers,
+                    **kwargs
+                )
+            except (requests.exceptions.ReadTimeout, requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError) as e:
+                timeout = isinstance(e, requests.exceptions.ReadTimeout)
+                self._record_latency(started, True)
+                self._record_timing(timing, started)
+                self.metrics.record_attempt(type(e).__name__)
+                delay = self.retry.retry_delay(attempt, timeout=timeout)
+                if delay is None:
+                    self._local.timed_out = timeout
+                    raise
+                reason = type(e).__name__
+            else:
+                self._record_latency(started, result.status_code == 429 or result.status_code in self.retry.retry_statuses)
+                self._record_timing(timing, started, result)
+                self.metrics.record_attempt(result.status_code)
+                retry_after = self.retry.parse_retry_after(result.headers.get('Retry-After')) if result.status_code == 429 else None
+                delay = self.retry.retry_delay(attempt, result.status_code, retry_after=retry_after)
+                if delay is None:
+                    result.eris_timing = timing
+                    return result
+                result.close()
+                reason = f"status {result.status_code}"
+
+            logging.warning(f"Request to {request_url} failed ({reason}), retry {attempt + 1} in {delay:.1f} seconds")
+            self.metrics.record_retry(request_url, reason, attempt + 1, delay)
+            time.sleep(delay)
+            add_stage(timing, 'backoff', delay)
+            attempt += 1
+
+    @staticmethod
+    def _record_timing(timing: Dict[str, float], started: float, result: Optional[requests.Response]=None):
+        """Split the time of an attempt into connect, ttfb (until the headers, from Response.elapsed) and download (the rest)"""
+        total = time.monotonic() - started
+        connect = take_connect_time()
+        elapsed = getattr(result, 'elapsed', None)
+        headers = elapsed.total_seconds() if isinstance(elapsed, datetime.timedelta) else total
+        add_stage(timing, 'connect', connect)
+        add_stage(timing, 'ttfb', max(0.0, headers - connect))
+        add_stage(timing, 'download', max(0.0, total - headers))
+
+    def _record_latency(self, started: float, overloaded: bool):
+        """Report the outcome of a request to the concurrency controller, if there is one"""
+        if self.concurrency is not None:
+            self.concurrency.record(time.monotonic() - started, overloaded)
+
+    def request_api_data_concurrent(self, request_parameters: Optional[ERISRequest]=None, delta=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None, target_bytes: Optional[int]=None, fast: Optional[bool]=None, stream: Optional[bool]=None, parse_workers: Optional[int]=None, compact: Optional[Union[bool, str]]=None, sink: Optional[ERISParquetSink]=None, **kwargs):
         """Performs the request api data as a concurrent call.
 
         Passing in a `delta` will set the daily window to perform the requests over. 
         ie delta=7 will window over 7 days.
 
+        The tags are also split into batches so the request url stays under `max_url_length` characters, 
+        and optionally at most `max_tags` tags per request. Every batch is requested for every window.
+
+        Alternatively pass `target_rows` (or `target_bytes`) to size the windows from the interval of the tags. 
+        Tags are grouped by interval, and each group gets windows expected to return about `target_rows` rows per request, 
+        so daily tags are requested in long windows and minute tags in short ones. Raw mode tags are estimated at `raw_interval`.
+
         Returns a list of results which you should iterate and parse to a dataframe with .convert_tags_to_dataframes and pd.concat
 
+        With a `sink`, each window is written as soon as it completes and then dropped, so memory stays flat for long extracts.
+        Samples at the end of a window are left to the next window, which also returns them. The sink is closed at the end, 
+        and the list of files written (one per tag and period) is returned instead.
+
         Args:
             request_parameters (Optional[ERISRequest], optional): _description_. Defaults to None.
+            delta (int, optional): days per request. Defaults to 30.
+            max_tags (int, optional): maximum tags per request. Defaults to None (no limit).
+            max_url_length (int, optional): maximum length of the request url. Defaults to 8000.
+            target_rows (int, optional): size the windows to return about this many rows per request. Replaces delta.
+            target_bytes (int, optional): size the windows to return about this many bytes per request, estimated at `row_bytes` per row. Replaces delta.
+            fast (bool, optional): parse the responses directly to columns. See request_api_data.
+            stream (bool, optional): decode the responses as they are downloaded. See request_api_data.
+            parse_workers (int, optional): decode the responses in a pool of this many processes, while the threads download the next windows. 
+                Results are columns, as with fast. json_decoder must be a name or a module level function. Defaults to None (decoded in the download threads).
+            compact (bool, str, optional): request compact responses, which leave out the row fields that are not used. 
+                With 'auto', compact is switched on when the request is expected to return more than `compact_rows` rows, unless set on the request.
+                Defaults to None (the `compact` of the request).
+            sink (ERISParquetSink, optional): write the windows to partitioned files rather than returning them.
 
         Returns:
             _type_: _description_
         """
-        request_ranges = self._build_concurrent_requests(request_parameters, delta)
+        results = []
+        written = {}
+        try:
+            for window, data in self._iter_windows(request_parameters, delta, max_tags, max_url_length, target_rows, target_bytes, fast, stream, parse_workers, compact, **kwargs):
+                if sink is None:
+                    results.append(data)
+                elif data is None:
+                    logging.warning(f"Request from {window.start} to {window.end} failed, nothing written")
+                else:
+                    written.update(dict.fromkeys(sink.write(data, window_end(window, request_parameters.end))))
+        finally:
+            if sink is not None:
+                sink.close()
+        return results if sink is None else list(written)
+
+    def iter_api_data(self, request_parameters: ERISRequest, delta=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None, target_bytes: Optional[int]=None, fast: Optional[bool]=None, stream: Optional[bool]=None, parse_workers: Optional[int]=None, compact: Optional[Union[bool, str]]=None, output: Optional[str]=None, per_tag: Optional[bool]=None, max_pending: Optional[int]=None, ordered: Optional[bool]=None, dedupe: Optional[bool]=None, **kwargs) -> Iterator[Union[pd.DataFrame, ERISColumnData, List[ERISColumnData], ERISResponse]]:
+        """Performs the same windowed requests as request_api_data_concurrent, yielding the data of each window as it completes.
+
+        At most `max_pending` windows are requested and not yet consumed at a time, so when the consumer is slower than the 
+        downloads no new requests are made until it catches up, and memory is bounded by the windows pending.
+
+        With `ordered=True` the windows are yielded in time order. A completed window waits for all earlier windows,
+        so a slow window holds back the rest (up to `max_pending`).
+
+        Failed windows are logged and skipped.
+
+        Args:
+            request_parameters (ERISRequest): request to split into windows. See request_api_data_concurrent for the window arguments.
+            output (str, optional): what to yield for each window, one of:
+                dataframe - Timestamp, Tag, Value dataframe (default)
+                columns - ERISColumnData of the tags, parsed with fast=True
+                response - the ERISResponse
+            per_tag (bool, optional): yield each tag of a window separately for the dataframe and columns outputs. Defaults to False.
+            max_pending (int, optional): windows requested but not yet yielded, including those in flight. Defaults to twice the workers.
+            ordered (bool, optional): yield the windows in time order. Defaults to False (in the order they complete).
+            dedupe (bool, optional): drop samples at the end of a dataframe window, which the next window also returns. Defaults to True.
+        """
+        output = 'dataframe' if output is None else output
+        assert output in ITER_OUTPUTS, f"output must be one of {', '.join(ITER_OUTPUTS)}"
+        max_pending = 2 * self.workers if max_pending is None else max_pending
+        assert max_pending > 0, "max_pending must be greater than 0"
+        dedupe = True if dedupe is None else dedupe
+        fast = True if output == 'columns' else fast
+
+        for window, data in self._iter_windows(request_parameters, delta, max_tags, max_url_length, target_rows, target_bytes, fast, stream, parse_workers, compact, max_pending, ordered, **kwargs):
+            if not isinstance(data, ERISResponse) or data.tag_data is None:
+                logging.warning(f"Request from {window.start} to {window.end} failed, skipped")
+                continue
+            if output == 'response':
+                yield data
+                continue
+
+            if output == 'columns':
+                items = data.tag_data
+            else:
+                end = window_end(window, request_parameters.end) if dedupe else None
+                items = [_ for _ in [data.tag_to_dataframe(tag) for tag in data.tag_data] if _ is not None]
+                items = items if end is None else [_[_['Timestamp'] < end] for _ in items]
+            if per_tag:
+                yield from items
+            elif output == 'columns':
+                yield items
+            elif len(items) > 0:
+                yield pd.concat(items)
+
+    def _iter_windows(self, request_parameters: ERISRequest, delta=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None, target_bytes: Optional[int]=None, fast: Optional[bool]=None, stream: Optional[bool]=None, parse_workers: Optional[int]=None, compact: Optional[Union[bool, str]]=None, max_pending: Optional[int]=None, ordered: Optional[bool]=None, **kwargs) -> Iterator[Tuple[ERISRequest, Any]]:
+        """Request the windows of a concurrent request, yielding each window and its result as it completes.
+
+        New windows are only submitted while fewer than `max_pending` are outstanding (None for no limit).
+        When ordered, windows are sorted by start and each is held until every earlier window has been yielded.
+        A window that is split after a timeout takes the place of the original in the order.
+        """
+        request_ranges = self._plan_windows(request_parameters, delta, max_tags, max_url_length, target_rows, target_bytes, compact)
+        if ordered:
+            request_ranges = sorted(request_ranges, key=lambda _: _.start)
 
         self.get_access_token(**kwargs)
+        self.retry.reset()
+
+        total = len(request_ranges)
+        windows = iter(enumerate(request_ranges))
+        pending = {}
+        completed = {}
+        order = []
+
+        if parse_workers:
+            assert _picklable(self.json_decoder), "json_decoder must be a name or a module level function to use parse_workers, as it is sent to the parser processes"
+        parser = concurrent.futures.ProcessPoolExecutor(max_workers=parse_workers) if parse_workers else None
+        if parser is not None:
+            kwargs['parser'] = parser
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+
+        def _submit(key, window):
+            pending[executor.submit(self._request_window, window, fast, stream, **kwargs)] = (key, window, None)
+            if ordered:
+                bisect.insort(order, key)
 
-        results = []
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-        # Start the load operations and mark each future with its URL
-            future_to_url = {
-                executor.submit(self.request_api_data, date_range, **kwargs): date_range 
-                for date_range in request_ranges
-            }
-
-            for c, future in enumerate(concurrent.futures.as_completed(future_to_url), 1):
-                print(f'Requests Completed: {c} of {len(request_ranges)}')
-                url = future_to_url[future]
-                try:
-                    data = future.result()
-                except Exception as exc:
-                    print('%r generated an exception: %s' % (url, exc))
-                else:
-                    results.append(data)
-        return results
+        try:
+            c = 0
+            while True:
+                while max_pending is None or len(pending) + len(completed) < max_pending:
+                    index, window = next(windows, (None, None))
+                    if window is None:
+                        break
+                    _submit((index,), window)
+
+                if ordered and len(order) > 0 and order[0] in completed:
+                    yield completed.pop(order.pop(0))
+                    continue
+                if len(pending) == 0:
+                    break
+
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key, url, job = pending.pop(future)
+                    if job is not None:
+                        data, timed_out = self._finish_parse(job), False
+                    else:
+                        try:
+                            data, timed_out = future.result()
+                        except Exception as exc:
+                            logging.error(f"Request from {url.start} to {url.end} generated an exception: {exc}")
+                            self.metrics.record_error(exc)
+                            if ordered:
+                                order.remove(key)
+                            continue
+                        if isinstance(data, _ParseJob):
+                            pending[data.future] = (key, url, data)
+                            continue
+
+                    halves = self._split_request(url) if timed_out else None
+                    if halves is not None:
+                        logging.warning(f"Request from {url.start} to {url.end} timed out, retrying as two windows")
+                        if ordered:
+                            order.remove(key)
+                        for i, half in enumerate(halves):
+                            _submit(key + (i,), half)
+                        total += 1
+                        continue
+
+                    c += 1
+                    logging.info(f'Requests Completed: {c} of {total}')
+                    if ordered:
+                        completed[key] = (url, data)
+                    else:
+                        yield url, data
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            if parser is not None:
+                parser.shutdown()
 
-    def _build_concurrent_requests(self, request_parameters: ERISRequest, delta: Optional[int]=None):
-        date_ranges = self._generate_date_range(
-            request_parameters.start,
-            request_parameters.end,
-            delta
-        )
+    def _request_window(self, request_parameters: ERISRequest, fast: Optional[bool]=None, stream: Optional[bool]=None, **kwargs):
+        """Request one window of a concurrent request. Returns the result and whether it failed from a read timeout.
 
-        request_list = []
-        for _ in date_ranges:
-            _request = ERISRequest(
-                _[0],
-                _[1],
-                request_parameters.tags,
-                request_parameters.regex,
-                request_parameters.compact
-            )
-            request_list.append(_request)
-        return request_list
-
-    def _generate_date_range(self, start_date=None, end_date=None, delta=None):        
-        delta = 30 if delta is None else delta
-        date_ranges = []
-        while start_date < end_date:
-            date_ranges.append(
-                (
-                    start_date,
-                    min(
-                        start_date + datetime.timedelta(days=delta+1),
-                        end_date
-                    )
-                )
-            )
-            start_date += datetime.timedelta(days=delta)
+        With a parser (and no cache), the result is a _ParseJob as soon as the response is downloaded, 
+        so the thread can download the next window while this one is decoded.
+        """
+        self._local.timed_out = False
+        if kwargs.get('parser') is not None and not stream and self.response_cache is None and not self._use_cache(request_parameters):
+            request = lambda: self._submit_parse(request_parameters, **kwargs)
+        else:
+            request = lambda: self.request_api_data(request_parameters, fast, stream, **kwargs)
+
+        if self.concurrency is None:
+            result = request()
+        else:
+            with self.concurrency:
+                result = request()
+        if isinstance(result, _ParseJob):
+            return result, False
+        failed = not isinstance(result, ERISResponse) or result.tag_data is None
+        return result, failed and self._local.timed_out
+
+    def _split_request(self, request_parameters: ERISRequest) -> Optional[List[ERISRequest]]:
+        """Split the window of a request in half, or None if it is too short to split (see ERISRetryPolicy.min_window)"""
+        start, end = request_parameters.start, request_parameters.end
+        if not self.retry.split_timeouts or not all([isinstance(_, datetime.datetime) for _ in [start, end]]):
+            return None
+        if end - start < 2 * self.retry.min_window:
+            return None
+
+        middle = (start + (end - start) / 2).replace(microsecond=0)
+        return [
+            ERISRequest(start, middle, request_parameters.tags, request_parameters.regex, request_parameters.compact),
+            ERISRequest(middle, end, request_parameters.tags, request_parameters.regex, request_parameters.compact),
+        ]
 
-        return date_ranges
\ No newline at end of file
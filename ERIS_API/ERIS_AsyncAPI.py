@@ -0,0 +1,344 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import time
+
+import requests
+
+from .ERIS_Client import ERISClient
+from .ERIS_Responses import ERISResponse
+from .ERIS_Parameters import ERISRequest
+from .ERIS_Retry import ERISRetryPolicy
+from .ERIS_JSON import JSONDecoder
+from .ERIS_Metrics import ERISMetrics, add_stage
+
+from typing import Optional, Dict, List, Union
+from pathlib import Path
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class _AsyncResponse(object):
+    """Read response from aiohttp exposing the parts of requests.Response used by ERISResponse"""
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str], url: str, encoding: Optional[str]=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.url = url
+        self.encoding = "utf-8" if encoding is None else encoding
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
+
+
+class AsyncERISAPI(ERISClient):
+    def __init__(self, base_url: str, client_id: str, username: Optional[str]=None, password: Optional[str]=None, token: Optional[str]=None, timeout: Optional[int]=None, workers: Optional[int]=None, keep_alive: Optional[bool]=None, retry: Optional[ERISRetryPolicy]=None, token_path: Optional[Union[str, Path]]=None, token_renewal: Optional[int]=None, json_decoder: Optional[JSONDecoder]=None, metrics: Optional[ERISMetrics]=None, parse_workers: Optional[int]=None):
+        """Asyncio version of the ERISAPI class.
+
+        The request methods are coroutines, and the windows and tokens are handled as in ERISAPI. 
+        iter_api_data, sync, the caches and the stream methods are only available on ERISAPI. The token is renewed in a background task, as with ERISAPI. 
+        Responses are parsed in a thread pool owned by the class, off the event loop, which is shut down by close.
+        Use as an async context manager, `async with AsyncERISAPI(...) as api:`.
+        Requires aiohttp to be installed.
+
+        Args:
+            base_url (str): URL of the ERIS page.
+            client_id (str): client ID of the ERIS site
+            username (str): username for authentication
+            password (str): password for login. Optional as a token can also be supplied. Default to password if both.
+            token (str, optional): token for login. Optional as a password can also be supplied.
+            timeout (int, optional): Set default timeout for request. Defaults to 1800 seconds if left as None.
+            workers (int, optional): maximum number of requests in flight at once. Also sets the size of the connection pool. Defaults to 8.
+            keep_alive (bool, optional): keep connections open between requests. Defaults to True.
+            retry (ERISRetryPolicy, optional): when to retry failed requests, and how long to wait. Defaults to ERISRetryPolicy().
+            token_path (str, optional): file to save the access token to, so later processes reuse it. See ERISAPI.
+            token_renewal (int, optional): seconds before the token expires to renew it in the background. See ERISAPI.
+            json_decoder (str, Callable, optional): decoder of the JSON responses. See ERISAPI.
+            metrics (ERISMetrics, optional): timings and counters of the requests. See ERISAPI. 
+                The connect and ttfb stages are not split out, so are counted in download.
+            parse_workers (int, optional): threads parsing the responses. Defaults to `workers`.
+        """
+        assert aiohttp is not None, "aiohttp is required for AsyncERISAPI. Install with pip install ERIS-API[async]"
+        super().__init__(base_url, client_id, username, password, token, timeout, workers, keep_alive, retry, token_path, token_renewal, json_decoder, metrics)
+
+        self.parse_workers = self.workers if parse_workers is None else parse_workers
+        assert self.parse_workers > 0, "parse_workers must be greater than 0"
+
+        self._client_session = None
+        self._executor = None
+        self._async_token_lock = None
+        self._renewal_task = None
+
+    @property
+    def client_session(self) -> 'aiohttp.ClientSession':
+        """aiohttp session holding the connection pool. Created on first use within the running loop."""
+        if self._client_session is None or self._client_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.workers,
+                force_close=not self.keep_alive
+            )
+            self._client_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._client_session
+
+    @property
+    def executor(self) -> concurrent.futures.ThreadPoolExecutor:
+        """Thread pool the responses are parsed in. Created on first use."""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.parse_workers)
+        return self._executor
+
+    async def close(self):
+        """Close the connection pool and shut down the parser threads"""
+        if self._client_session is not None:
+            await self._client_session.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _auth_headers(self) -> Dict[str, str]:
+        """Apply the requests authorization class to get the login header"""
+        _request = requests.Request(headers={})
+        self.build_auth()(_request)
+        return {"Authorization": _request.headers["Authorization"]}
+
+    def _clean_params(self, params: Optional[Dict]) -> Optional[Dict[str, str]]:
+        """aiohttp only accepts str/int/float parameters. Convert bools the same way requests does."""
+        if params is None:
+            return None
+        return {k: str(v) if isinstance(v, bool) else v for k, v in params.items()}
+
+    async def _read_response(self, result: 'aiohttp.ClientResponse') -> _AsyncResponse:
+        content = await result.read()
+        return _AsyncResponse(
+            result.status,
+            content,
+            dict(result.headers),
+            str(result.url),
+            result.charset
+        )
+
+    @property
+    def token_lock(self) -> asyncio.Lock:
+        """Lock held while logging in. Created on first use within the running loop."""
+        if self._async_token_lock is None:
+            self._async_token_lock = asyncio.Lock()
+        return self._async_token_lock
+
+    async def get_access_token(self, **kwargs) -> str:
+        """Authenticate to ERIS and obtain an access token.
+
+        Only one login is made at a time. Other callers wait for it and use the new token.
+        A token within `token_renewal` of its expiry is still returned, and a new one is requested in a background task.
+        """
+        if self._current_token_valid():
+            if not self._current_token_valid(self._renewal_margin()):
+                self._renew_token()
+            return self.access_token.get("x-access-token")
+
+        async with self.token_lock:
+            if self._current_token_valid():
+                return self.access_token.get("x-access-token")
+            return await self._login(**kwargs)
+
+    async def _login(self, **kwargs) -> str:
+        auth_uri = self.base_api_url + self.authenticate_url
+        headers = {"x-client-id": self.client_id}
+        headers.update(self._auth_headers())
+        started = time.monotonic()
+        async with self.client_session.post(auth_uri, headers=headers, **kwargs) as result:
+            result = await self._read_response(result)
+
+        assert result.status_code == 200, "Failed to reach authentication page"
+        result_json = result.json()
+
+        _status = result_json.get("status")
+        _message = result_json.get("message", "General Authentication Error")
+        assert _status == 200, f"status: {_status} - message: {_message}"
+
+        _data = result_json.get('data', {})
+        self.access_token = _data
+        self._save_token()
+        self.metrics.record_login(time.monotonic() - started)
+        return self.access_token.get("x-access-token")
+
+    def _renew_token(self):
+        """Login in a background task, unless a renewal is already running or one was started recently"""
+        if self._renewal_task is not None and not self._renewal_task.done():
+            return
+        if not self._renewal_due():
+            return
+        self._renewal_task = asyncio.ensure_future(self._renew())
+
+    async def _renew(self):
+        try:
+            async with self.token_lock:
+                if not self._current_token_valid(self._renewal_margin()):
+                    await self._login()
+        except Exception as e:
+            logging.error(f"Token renewal failed: {e}")
+
+    async def request_data(self, request_url: str, request_parameters: Optional[Dict]=None, **kwargs) -> _AsyncResponse:
+        """Generic authenticated request to any eris endpoint.
+
+        Args:
+            url (str): path to the requested endpoint
+            request_parameters (dict, optional): dictionary of parameters to pass. Defaults to None.
+
+        A token rejected with a 401 is replaced and the request made once more, as with ERISAPI.
+
+        Returns:
+            _AsyncResponse: response with status_code, content, text and json() like the requests library.
+        """
+        timing = {}
+        for attempt in range(2):
+            started = time.monotonic()
+            access_token = await self.get_access_token()
+            add_stage(timing, 'auth', time.monotonic() - started)
+            result = await self._get(
+                request_url,
+                request_parameters,
+                headers={
+                    "x-access-token": access_token,
+                    "x-client-id": self.client_id
+                },
+                timing=timing,
+                **kwargs
+            )
+            if result.status_code != 401 or attempt > 0:
+                return result
+
+            logging.warning(f"Access token rejected by {request_url}, logging in again")
+            self._expire_token(access_token)
+
+    async def _get(self, request_url: str, params: Optional[Dict]=None, headers: Optional[Dict[str, str]]=None, timing: Optional[Dict[str, float]]=None, **kwargs) -> _AsyncResponse:
+        """GET from the client session, retrying failures allowed by the retry policy. See ERISAPI._get"""
+        timing = {} if timing is None else timing
+        attempt = 0
+        while True:
+            started = time.monotonic()
+            try:
+                async with self.client_session.get(request_url, params=self._clean_params(params), headers=headers, **kwargs) as result:
+                    result = await self._read_response(result)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError) as e:
+                add_stage(timing, 'download', time.monotonic() - started)
+                self.metrics.record_attempt(type(e).__name__)
+                delay = self.retry.retry_delay(attempt, timeout=isinstance(e, asyncio.TimeoutError))
+                if delay is None:
+                    raise
+                reason = type(e).__name__
+            else:
+                add_stage(timing, 'download', time.monotonic() - started)
+                self.metrics.record_attempt(result.status_code)
+                retry_after = self.retry.parse_retry_after(result.headers.get('Retry-After')) if result.status_code == 429 else None
+                delay = self.retry.retry_delay(attempt, result.status_code, retry_after=retry_after)
+                if delay is None:
+                    result.eris_timing = timing
+                    return result
+                reason = f"status {result.status_code}"
+
+            logging.warning(f"Request to {request_url} failed ({reason}), retry {attempt + 1} in {delay:.1f} seconds")
+            self.metrics.record_retry(request_url, reason, attempt + 1, delay)
+            await asyncio.sleep(delay)
+            add_stage(timing, 'backoff', delay)
+            attempt += 1
+
+    async def request_api_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, **kwargs) -> ERISResponse:
+        """Request ERIS data via the API. See ERISAPI.request_api_data"""
+        eris_response = None
+        try:
+            uri = self.base_api_url + self.data_url
+            params = self._construct_request_parameters(request_parameters)
+            result = await self.request_data(uri, params, **kwargs)
+
+            eris_response = result
+
+            assert result.status_code == 200, "Failed to reach API"
+            eris_response = ERISResponse(
+                result, request_parameters, False, fast, json_decoder=self.json_decoder
+            )
+            await self._process_results(eris_response)
+            self._record_response(eris_response)
+
+            return eris_response
+        except Exception as e:
+            logging.error(e)
+            self.metrics.record_error(e)
+        finally:
+            return eris_response
+
+    async def request_esrm_data(self, request_parameters: ERISRequest, fast: Optional[bool]=None, **kwargs) -> ERISResponse:
+        """Requesting via the ESRM url. See ERISAPI.request_esrm_data"""
+        eris_response = None
+        try:
+            params = self._construct_request_parameters(request_parameters)
+            uri = self.base_esrm_url + self.data_url
+            result = await self._get(uri, params, **kwargs)
+            eris_response = result
+
+            assert result.status_code == 200, "Status Code failed"
+
+            eris_response = ERISResponse(
+                result, request_parameters, True, fast
+            )
+            await self._process_results(eris_response)
+            self._record_response(eris_response)
+
+            return eris_response
+
+        except Exception as e:
+            logging.error(e)
+            self.metrics.record_error(e)
+        finally:
+            return eris_response
+
+    async def request_api_data_concurrent(self, request_parameters: ERISRequest, delta=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None, target_bytes: Optional[int]=None, fast: Optional[bool]=None, compact: Optional[Union[bool, str]]=None) -> List[ERISResponse]:
+        """Performs the request api data as concurrent coroutines.
+
+        Number of requests in flight is limited to `workers`.
+        The windows are planned as in ERISAPI.request_api_data_concurrent, which describes the arguments. 
+        Streaming, sinks, the caches and parse_workers are only available on ERISAPI.
+        """
+        request_ranges = self._plan_windows(request_parameters, delta, max_tags, max_url_length, target_rows, target_bytes, compact)
+
+        await self.get_access_token()
+        self.retry.reset()
+
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def _request(date_range):
+            async with semaphore:
+                return await self.request_api_data(date_range, fast=fast)
+
+        results = []
+        tasks = [_request(date_range) for date_range in request_ranges]
+        for c, task in enumerate(asyncio.as_completed(tasks), 1):
+            try:
+                data = await task
+            except Exception as exc:
+                logging.error(f"Request generated an exception: {exc}")
+                self.metrics.record_error(exc)
+            else:
+                results.append(data)
+            logging.info(f'Requests Completed: {c} of {len(request_ranges)}')
+        return results
+
+    async def _process_results(self, eris_response: ERISResponse):
+        """Parse the response in the parser threads, so other requests carry on while it is parsed"""
+        await asyncio.get_running_loop().run_in_executor(self.executor, eris_response.process_results)
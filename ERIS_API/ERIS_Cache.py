@@ -0,0 +1,345 @@
+import concurrent.futures
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from ERIS_API import models
+from ERIS_API.ERIS_Parameters import ERISTag
+
+DT_FORMAT = "%Y-%m-%dT%H:%M:%S"
+SCHEMA_VERSION = 1
+
+
+def to_epoch(value: Union[str, datetime.datetime]) -> float:
+    """Seconds since the epoch of a datetime or a timestamp from the server, so times in any ISO format compare correctly.
+
+    Times without a timezone are taken as UTC, so they compare as written.
+    """
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def from_epoch(seconds: float) -> datetime.datetime:
+    """Naive datetime of an epoch from to_epoch"""
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).replace(tzinfo=None)
+
+
+class ERISSegmentCache(object):
+    def __init__(self, path: Union[str, Path]) -> None:
+        """On disk cache of tag data, stored in a SQLite database.
+
+        Data is keyed by (base_url, tag, mode, interval), and the time ranges that have been requested
+        for each key are tracked so only the missing ranges need to be requested again.
+
+        Ranges are half open [start, end), matching the windows of the concurrent requests.
+        Ranges after the current time are never marked as covered, as that data may still arrive.
+        Times are stored as seconds since the epoch, so timestamps with milliseconds or a timezone compare correctly.
+        The time of each row is also kept as returned by the server.
+
+        Args:
+            path (str): path to the database file, or a directory to create eris_cache.sqlite in.
+        """
+        path = Path(path)
+        if path.is_dir() or path.suffix == "":
+            path.mkdir(parents=True, exist_ok=True)
+            path = path / "eris_cache.sqlite"
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        """Create the tables. A cache from an earlier version, which stored times as text, is dropped."""
+        with self._lock, self._connection:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self._connection.executescript("""
+                    DROP TABLE IF EXISTS segments;
+                    DROP TABLE IF EXISTS rows;
+                    DROP TABLE IF EXISTS tags;
+                """)
+            self._connection.executescript(f"""
+                CREATE TABLE IF NOT EXISTS segments (key TEXT NOT NULL, start REAL NOT NULL, end REAL NOT NULL);
+                CREATE INDEX IF NOT EXISTS segments_key ON segments (key, start);
+                CREATE TABLE IF NOT EXISTS rows (key TEXT NOT NULL, epoch REAL NOT NULL, time TEXT, value, source TEXT, PRIMARY KEY (key, epoch));
+                CREATE TABLE IF NOT EXISTS tags (key TEXT PRIMARY KEY, metadata TEXT);
+                PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+
+    def close(self):
+        self._connection.close()
+
+    @staticmethod
+    def tag_key(base_url: str, tag: ERISTag) -> str:
+        return "|".join([base_url, tag.tag, tag.mode, tag.interval])
+
+    def _segments(self, key: str) -> List[Tuple[float, float]]:
+        cursor = self._connection.execute("SELECT start, end FROM segments WHERE key = ? ORDER BY start", (key,))
+        return cursor.fetchall()
+
+    def missing_ranges(self, key: str, start: datetime.datetime, end: datetime.datetime) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """Ranges between start and end that are not in the cache"""
+        _start, _end = to_epoch(start), to_epoch(end)
+        with self._lock:
+            segments = self._segments(key)
+
+        missing = []
+        position = _start
+        for seg_start, seg_end in segments:
+            if seg_end <= position:
+                continue
+            if seg_start >= _end:
+                break
+            if seg_start > position:
+                missing.append((position, seg_start))
+            position = max(position, seg_end)
+        if position < _end:
+            missing.append((position, _end))
+
+        return [(from_epoch(s), from_epoch(e)) for s, e in missing]
+
+    def store(self, key: str, start: datetime.datetime, end: datetime.datetime, tag: models.ERISColumnData):
+        """Save the data of a tag and mark start/end as covered.
+
+        A tag without rows is not saved, as it cannot be told apart from a tag that failed, so its range is requested again.
+        Only pass tags that returned without an error (see ERISResponse.failed_tags).
+        """
+        if len(tag) == 0:
+            return
+        end = min(end, datetime.datetime.now().replace(microsecond=0))
+        metadata = {field: getattr(tag, field) for field in models.ERISColumnData.metadata_fields if field != 'tagUID'}
+
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO rows (key, epoch, time, value, source) VALUES (?, ?, ?, ?, ?)",
+                [(key, to_epoch(t), t, v, s) for t, v, s in zip(tag.time, tag.value, tag.source)]
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tags (key, metadata) VALUES (?, ?)", (key, json.dumps(metadata))
+            )
+            if start < end:
+                self._add_segment(key, to_epoch(start), to_epoch(end))
+
+    def _add_segment(self, key: str, start: float, end: float):
+        """Add a covered range, merging it with any ranges it overlaps or touches"""
+        overlapping = self._connection.execute(
+            "SELECT start, end FROM segments WHERE key = ? AND start <= ? AND end >= ?", (key, end, start)
+        ).fetchall()
+        for seg_start, seg_end in overlapping:
+            start, end = min(start, seg_start), max(end, seg_end)
+        self._connection.execute("DELETE FROM segments WHERE key = ? AND start <= ? AND end >= ?", (key, end, start))
+        self._connection.execute("INSERT INTO segments (key, start, end) VALUES (?, ?, ?)", (key, start, end))
+
+    def load(self, key: str, start: datetime.datetime, end: datetime.datetime) -> models.ERISColumnData:
+        """Cached data of a tag between start and end (inclusive), ordered by time"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT time, value, source FROM rows WHERE key = ? AND epoch >= ? AND epoch <= ? ORDER BY epoch",
+                (key, to_epoch(start), to_epoch(end))
+            ).fetchall()
+            metadata = self._connection.execute("SELECT metadata FROM tags WHERE key = ?", (key,)).fetchone()
+
+        metadata: Dict[str, Any] = {} if metadata is None else json.loads(metadata[0])
+        return models.ERISColumnData(
+            time=[_[0] for _ in rows],
+            value=[_[1] for _ in rows],
+            source=[_[2] for _ in rows],
+            **metadata
+        )
+
+    def clear(self, key: Optional[str]=None):
+        """Remove everything from the cache, or only the data of one key"""
+        with self._lock, self._connection:
+            for table in ["segments", "rows", "tags"]:
+                if key is None:
+                    self._connection.execute(f"DELETE FROM {table}")
+                else:
+                    self._connection.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+
+
+class ERISResponseCache(object):
+    # memory of a row kept as columns (fast) or as a model
+    column_row_bytes = 200
+    model_row_bytes = 600
+
+    def __init__(self, max_entries: Optional[int]=None, max_bytes: Optional[int]=None, ttl: Optional[float]=None) -> None:
+        """In memory cache of ERISResponses, shared by every thread using the ERISAPI class.
+
+        Entries are evicted least recently used first once there are more than `max_entries`, 
+        or their total size is over `max_bytes`, and expire `ttl` seconds after they were requested.
+        Only the parsed tag data of a response is kept (see ERISResponse.detach), and its size is estimated from the rows.
+
+        Requests for the same key made while the first is still in flight wait for it instead of making their own request.
+
+        Args:
+            max_entries (int, optional): maximum number of responses. Defaults to 128.
+            max_bytes (int, optional): maximum total size of the tag data of the responses. Defaults to None (no limit).
+            ttl (float, optional): seconds a response is kept. Defaults to 300.
+        """
+        self.max_entries = 128 if max_entries is None else max_entries
+        self.max_bytes = max_bytes
+        self.ttl = 300 if ttl is None else ttl
+
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Any, Tuple[float, int, Any]]' = OrderedDict()
+        self._in_flight: Dict[Any, concurrent.futures.Future] = {}
+
+    @staticmethod
+    def request_key(uri: str, params: Dict[str, Any], columns: Optional[bool]=None) -> Tuple:
+        """Key of a request. The request_uuid of each tag is removed so the same tags from different ERISRequests match."""
+        params = dict(params)
+        params['tags'] = ",".join([_.split(":", 1)[-1] for _ in params.get('tags', '').split(",")])
+        return (uri, tuple(sorted((k, str(v)) for k, v in params.items())), bool(columns))
+
+    @classmethod
+    def response_size(cls, response: Any) -> int:
+        """Memory of the tag data kept for the response, estimated from the number of rows"""
+        tag_data = getattr(response, 'tag_data', None) or []
+        return sum([len(_) * cls.column_row_bytes if isinstance(_, models.ERISColumnData) else len(_.data or []) * cls.model_row_bytes for _ in tag_data])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, key: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, size, response = entry
+        if expires < time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def _remove(self, key: Any):
+        _, size, _ = self._entries.pop(key)
+        self.total_bytes -= size
+
+    def _put(self, key: Any, response: Any):
+        if hasattr(response, 'detach'):
+            response = response.detach()
+        size = self.response_size(response)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, response)
+        self.total_bytes += size
+
+        while len(self._entries) > self.max_entries or (self.max_bytes is not None and self.total_bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def get_or_request(self, key: Any, request: Callable[[], Any], cacheable: Optional[Callable[[Any], bool]]=None) -> Any:
+        """Return the cached response of the key, or call `request` to get it.
+
+        Only one call of `request` is made at a time for a key. Other callers wait for its result.
+        Results are only cached if `cacheable(result)` is True.
+        """
+        with self._lock:
+            response = self._get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                self.misses += 1
+                future = concurrent.futures.Future()
+                self._in_flight[key] = future
+            else:
+                self.hits += 1
+
+        if not owner:
+            return future.result()
+
+        try:
+            response = request()
+            if cacheable is None or cacheable(response):
+                with self._lock:
+                    self._put(key, response)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+
+class ERISSyncState(object):
+    def __init__(self, path: Union[str, Path]) -> None:
+        """On disk store of the last timestamp received for each tag, used by ERISAPI.sync.
+
+        Watermarks are keyed by (base_url, tag, mode, interval), the same as the ERISSegmentCache, and only ever move forward.
+
+        Args:
+            path (str): path to the database file, or a directory to create eris_sync.sqlite in.
+        """
+        path = Path(path)
+        if path.is_dir() or path.suffix == "":
+            path.mkdir(parents=True, exist_ok=True)
+            path = path / "eris_sync.sqlite"
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS watermarks (key TEXT PRIMARY KEY, time TEXT NOT NULL)")
+
+    def close(self):
+        self._connection.close()
+
+    tag_key = staticmethod(ERISSegmentCache.tag_key)
+
+    @staticmethod
+    def last_time(tag: Union[models.ERISColumnData, models.ERISData]) -> Optional[datetime.datetime]:
+        """Latest timestamp in the data of a tag, to the second"""
+        if isinstance(tag, models.ERISColumnData):
+            times = [datetime.datetime.strptime(str(_)[:19], DT_FORMAT) for _ in tag.time if _]
+        else:
+            times = [_.timestamp.replace(tzinfo=None, microsecond=0) for _ in tag.data or []]
+        return max(times) if len(times) > 0 else None
+
+    def watermark(self, key: str) -> Optional[datetime.datetime]:
+        """Last timestamp received for the key, or None if it has not been synced"""
+        with self._lock:
+            row = self._connection.execute("SELECT time FROM watermarks WHERE key = ?", (key,)).fetchone()
+        return None if row is None else datetime.datetime.strptime(row[0], DT_FORMAT)
+
+    def update(self, key: str, time: datetime.datetime):
+        """Move the watermark of the key forward to time. Earlier times are ignored."""
+        _time = time.strftime(DT_FORMAT)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO watermarks (key, time) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET time = MAX(time, excluded.time)",
+                (key, _time)
+            )
+
+    def clear(self, key: Optional[str]=None):
+        """Remove every watermark, or only the watermark of one key, so it is synced from the start again"""
+        with self._lock, self._connection:
+            if key is None:
+                self._connection.execute("DELETE FROM watermarks")
+            else:
+                self._connection.execute("DELETE FROM watermarks WHERE key = ?", (key,))
@@ -0,0 +1,380 @@
+from requests.auth import HTTPBasicAuth
+
+import logging
+import requests
+import datetime
+import base64
+import json
+import os
+import threading
+import time
+
+from .ERIS_Responses import ERISResponse, ERISTransferStats
+from .ERIS_Parameters import ERISRequest, ERISTag
+from .ERIS_Retry import ERISRetryPolicy
+from .ERIS_JSON import JSONDecoder
+from .ERIS_Metrics import ERISMetrics
+from .models import Settings
+
+config_settings = Settings()
+
+from typing import Optional, Dict, Union, List, Tuple
+from pathlib import Path
+from urllib.parse import urlencode, quote_plus
+
+
+class _Token_Auth(requests.auth.AuthBase):
+    """Subclass request auth for token authorization"""
+    def __init__(self, username: str, token: str):
+        self.username = username
+        self.token = token
+
+    def __call__(self, r: requests.Request):
+        assert self.username is not None, "No username supplied"
+        assert self.token is not None, "No token supplied"
+        _auth = ':'.join((self.username, self.token)).encode()
+        _encoded = base64.b64encode(_auth).strip()
+        authstr = 'Token ' + _encoded.decode()
+        r.headers['Authorization'] = authstr
+        return r
+
+
+class ERISClient(object):
+    def __init__(self, base_url: str, client_id: str, username: Optional[str]=None, password: Optional[str]=None, token: Optional[str]=None, timeout: Optional[int]=None, workers: Optional[int]=None, keep_alive: Optional[bool]=None, retry: Optional[ERISRetryPolicy]=None, token_path: Optional[Union[str, Path]]=None, token_renewal: Optional[int]=None, json_decoder: Optional[JSONDecoder]=None, metrics: Optional[ERISMetrics]=None):
+        """Parts shared by ERISAPI and AsyncERISAPI that do not make requests: the settings, the access token, 
+        planning the windows of a concurrent request and recording the responses.
+
+        See ERISAPI for the arguments.
+        """
+        self.base_url = base_url
+        self.base_url = base_url[:-1] if self.base_url.endswith("/") else base_url
+
+        self.base_esrm_url = self.base_url+"/esrm/rest"
+        self.base_api_url = self.base_url+"/api/rest"
+
+        self.authenticate_url = "/auth/login"
+        self.data_url = "/tag/data"
+
+        self.timeout = 1800 if timeout is None else timeout
+
+        self._token_lock = threading.Lock()
+        self._last_renewal = None
+        self.renewal_interval = 30
+        self.access_token = None
+        self.client_id = client_id
+
+        self.username = username if username is not None else config_settings.eris_username
+        self.password = password if password is not None else config_settings.eris_password
+        self.login_token = token if token is not None else config_settings.eris_token
+
+        assert any([_ is not None for _ in [self.login_token, self.password]]), "password or token must be supplied"
+
+        token_path = token_path if token_path is not None else config_settings.eris_token_path
+        self.token_path = Path(token_path) if token_path is not None else None
+        self.token_renewal = datetime.timedelta(seconds=300 if token_renewal is None else token_renewal)
+        self._load_token()
+
+        self.workers = 8 if workers is None else workers
+        self.keep_alive = True if keep_alive is None else keep_alive
+        assert self.workers > 0, "workers must be greater than 0"
+
+        self.retry = ERISRetryPolicy() if retry is None else retry
+
+        self.raw_interval = datetime.timedelta(minutes=1)
+        self.row_bytes = 400
+
+        self.tag_metadata: Dict[Tuple[str, str, str], Dict] = {}
+        self.transfer = ERISTransferStats()
+        self.json_decoder = json_decoder
+        self.compact_rows = 100000
+        self.metrics = ERISMetrics() if metrics is None else metrics
+
+    @property
+    def access_token(self) -> Optional[Dict]:
+        """Data of the current access token, including the x-access-token and its expiry"""
+        return self._access_token
+
+    @access_token.setter
+    def access_token(self, value: Optional[Dict]):
+        self._access_token = value
+        self._token_expires = self._parse_expiry(value)
+        self._token_lifetime = None if self._token_expires is None else self._token_expires - datetime.datetime.now()
+
+    @staticmethod
+    def _parse_expiry(token: Optional[Dict]) -> Optional[datetime.datetime]:
+        expire_time = None if token is None else token.get("expires")
+        if expire_time is None:
+            return None
+        try:
+            return datetime.datetime.strptime(expire_time, "%Y-%m-%dT%H:%M:%S.%f")
+        except ValueError:
+            logging.error(f"Unable to parse token expiry {expire_time}")
+            return None
+
+    def _renewal_margin(self) -> datetime.timedelta:
+        """token_renewal, capped at half the lifetime of the token so short lived tokens are not renewed on every request"""
+        if self._token_lifetime is None:
+            return self.token_renewal
+        return min(self.token_renewal, self._token_lifetime / 2)
+
+    def _renewal_due(self) -> bool:
+        """Renewals are started at most once every `renewal_interval` seconds, so a failing login is not retried on every request"""
+        now = time.monotonic()
+        if self._last_renewal is not None and now - self._last_renewal < self.renewal_interval:
+            return False
+        self._last_renewal = now
+        return True
+
+    def _token_owner(self) -> Dict[str, str]:
+        return {"base_url": self.base_url, "client_id": self.client_id, "username": self.username}
+
+    def _load_token(self):
+        """Use the token saved in token_path if it is for this site and user, and has not expired"""
+        if self.token_path is None or not self.token_path.exists():
+            return
+        try:
+            with open(self.token_path, 'r') as fl:
+                saved = json.loads(fl.read())
+        except (OSError, ValueError) as e:
+            logging.warning(f"Unable to read saved token: {e}")
+            return
+
+        if saved.get("owner") != self._token_owner():
+            return
+        self.access_token = saved.get("token")
+        if not self._current_token_valid():
+            self.access_token = None
+
+    def _save_token(self):
+        """Save the token to token_path, readable only by the current user. Written to a temporary file first so readers never see a partial file."""
+        if self.token_path is None:
+            return
+        data = json.dumps({"owner": self._token_owner(), "token": self.access_token})
+        tmp_path = self.token_path.with_name(f"{self.token_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            self.token_path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(tmp_path), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as fl:
+                fl.write(data)
+            os.replace(str(tmp_path), str(self.token_path))
+        except OSError as e:
+            logging.warning(f"Unable to save token: {e}")
+
+    def build_auth(self) -> Union[_Token_Auth, requests.auth.HTTPBasicAuth]:
+        """Construct the requests authorization class
+
+        Will return either HTTPBasicAuth or _Token_Auth.
+
+        If password is present, then HTTPBasic, otherwise _Token_Auth
+        """
+        username = self.username
+        password = self.password
+        token = self.login_token
+        if password is not None:
+            return HTTPBasicAuth(username, password)
+        elif token is not None:
+            return _Token_Auth(username, token)
+        
+        raise "Username, Password and Token is empty"
+
+    def _current_token_valid(self, margin: Optional[datetime.timedelta]=None) -> bool:
+        """Validate if current token is valid. The expiry is parsed once when the token is set.
+
+        Args:
+            margin (timedelta, optional): token must be valid for at least this long. Defaults to 1 minute.
+        
+        returns:
+            bool: is token valid then True, else False
+        """
+        expire_time = self._token_expires
+        if expire_time is None: return False
+
+        margin = datetime.timedelta(minutes=1) if margin is None else margin
+        check_time = datetime.datetime.now() + margin
+        is_valid = True if expire_time>check_time else False
+        return is_valid
+
+    def _expire_token(self, access_token: str):
+        """Drop the token if it is still the current one, so the next request logs in"""
+        with self._token_lock:
+            if self.access_token is not None and self.access_token.get("x-access-token") == access_token:
+                self.access_token = None
+
+    def _construct_request_parameters(self, tag_class: ERISRequest) -> Dict[str, str]:
+        _start = tag_class.start
+        _end = tag_class.end
+
+        dt_format = "%Y-%m-%dT%H:%M:%S"
+        _start = _start.strftime(dt_format) if isinstance(_start, datetime.datetime) else _start
+        _end = _end.strftime(dt_format) if isinstance(_end, datetime.datetime) else _end
+        _tags = ",".join([_.tag_to_string() for _ in tag_class.tags])
+        out_params = {"start": _start, "end": _end, "tags": _tags}
+
+        if tag_class.regex is not None:
+            out_params["regex"] = tag_class.regex
+
+        if tag_class.compact is not None:
+            out_params['compact'] = tag_class.compact
+
+        return out_params
+
+    def _record_response(self, eris_response: ERISResponse):
+        self.transfer.record(eris_response)
+        self._record_metrics(eris_response)
+        self._update_metadata(eris_response)
+
+    def _record_metrics(self, eris_response: ERISResponse, rows: Optional[int]=None, tags: Optional[int]=None):
+        """Add the stage timings, bytes and rows of the response to the metrics, which also time its dataframes from now on.
+
+        Streamed responses keep no tag data, so pass the `rows` and `tags` yielded.
+        """
+        eris_response.metrics = self.metrics
+        response = eris_response.response_class
+        self.metrics.record_response(
+            getattr(response, 'url', None), 
+            getattr(response, 'status_code', None), 
+            eris_response.timings, 
+            eris_response.compressed_bytes, 
+            eris_response.decompressed_bytes, 
+            eris_response.row_count() if rows is None else rows,
+            len(eris_response.tag_data or []) if tags is None else tags
+        )
+
+    def _update_metadata(self, eris_response: ERISResponse):
+        """Keep the metadata of tags from full responses, and fill it in on compact responses"""
+        if eris_response.tag_data is None:
+            return
+        if eris_response.compact:
+            eris_response.attach_metadata(self.tag_metadata)
+        else:
+            self.tag_metadata.update(eris_response.tag_metadata())
+
+    def _use_compact(self, request_parameters: ERISRequest) -> Optional[bool]:
+        """Compact setting of the request, or True if it is expected to return more than `compact_rows` rows"""
+        if request_parameters.compact is not None:
+            return request_parameters.compact
+        if not all([isinstance(_, datetime.datetime) for _ in [request_parameters.start, request_parameters.end]]):
+            return None
+
+        period = request_parameters.end - request_parameters.start
+        rows = sum([period / _.sample_interval(self.raw_interval) for _ in request_parameters.tags])
+        return True if rows > self.compact_rows else None
+
+    def _plan_windows(self, request_parameters: ERISRequest, delta=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None, target_bytes: Optional[int]=None, compact: Optional[Union[bool, str]]=None) -> List[ERISRequest]:
+        """Windows of a concurrent request, with `target_bytes` converted to rows and the compact setting applied"""
+        if target_bytes is not None:
+            target_rows = max(1, target_bytes // self.row_bytes)
+        if compact == 'auto':
+            compact = self._use_compact(request_parameters)
+        elif compact is None:
+            compact = request_parameters.compact
+        if compact != request_parameters.compact:
+            request_parameters = ERISRequest(request_parameters.start, request_parameters.end, request_parameters.tags, request_parameters.regex, compact)
+        return self._build_concurrent_requests(request_parameters, delta, max_tags, max_url_length, target_rows)
+
+    def _build_concurrent_requests(self, request_parameters: ERISRequest, delta: Optional[int]=None, max_tags: Optional[int]=None, max_url_length: Optional[int]=None, target_rows: Optional[int]=None):
+        if target_rows is not None:
+            return self._build_interval_requests(request_parameters, target_rows, max_tags, max_url_length)
+
+        date_ranges = self._generate_date_range(
+            request_parameters.start,
+            request_parameters.end,
+            delta
+        )
+        tag_batches = self._batch_tags(request_parameters, max_tags, max_url_length)
+
+        request_list = []
+        for _ in date_ranges:
+            for tags in tag_batches:
+                _request = ERISRequest(
+                    _[0],
+                    _[1],
+                    tags,
+                    request_parameters.regex,
+                    request_parameters.compact
+                )
+                request_list.append(_request)
+        return request_list
+
+    def _build_interval_requests(self, request_parameters: ERISRequest, target_rows: int, max_tags: Optional[int]=None, max_url_length: Optional[int]=None):
+        """Build the concurrent requests with the window of each batch of tags sized to `target_rows`.
+
+        Tags are grouped by their sample interval so a request never mixes daily and minute tags.
+        The window of a batch is the interval multiplied by the rows available to each tag, and is never less than one interval.
+        """
+        groups: Dict[datetime.timedelta, List[ERISTag]] = {}
+        for tag in request_parameters.tags:
+            groups.setdefault(tag.sample_interval(self.raw_interval), []).append(tag)
+
+        request_list = []
+        for interval in sorted(groups):
+            group_request = ERISRequest(
+                request_parameters.start,
+                request_parameters.end,
+                groups[interval],
+                request_parameters.regex,
+                request_parameters.compact
+            )
+            for tags in self._batch_tags(group_request, max_tags, max_url_length):
+                window = interval * max(1, target_rows // len(tags))
+                for _ in self._generate_date_range(request_parameters.start, request_parameters.end, window):
+                    request_list.append(ERISRequest(
+                        _[0],
+                        _[1],
+                        tags,
+                        request_parameters.regex,
+                        request_parameters.compact
+                    ))
+        return request_list
+
+    def _batch_tags(self, request_parameters: ERISRequest, max_tags: Optional[int]=None, max_url_length: Optional[int]=None) -> List[List[ERISTag]]:
+        """Split the tags of the request into batches.
+
+        Each batch has at most `max_tags` tags and the url of the request stays under `max_url_length` characters.
+        The url length is estimated from the encoded query string, using the request start/end. 
+        A single tag that is longer than the limit is sent on its own.
+        """
+        max_url_length = 8000 if max_url_length is None else max_url_length
+        max_tags = len(request_parameters.tags) if max_tags is None else max_tags
+        assert max_tags > 0, "max_tags must be greater than 0"
+
+        params = self._construct_request_parameters(request_parameters)
+        params.pop("tags")
+        base_length = len(self.base_api_url + self.data_url) + len("?" + urlencode(params) + "&tags=")
+
+        batches = []
+        batch, batch_length = [], base_length
+        for tag in request_parameters.tags:
+            tag_length = len(quote_plus(tag.tag_to_string()))
+            tag_length = tag_length if len(batch) == 0 else tag_length + len(quote_plus(","))
+            if len(batch) > 0 and (len(batch) >= max_tags or batch_length + tag_length > max_url_length):
+                batches.append(batch)
+                batch, batch_length = [], base_length
+                tag_length = len(quote_plus(tag.tag_to_string()))
+            batch.append(tag)
+            batch_length += tag_length
+        if len(batch) > 0:
+            batches.append(batch)
+        return batches
+
+    def _generate_date_range(self, start_date=None, end_date=None, delta=None):        
+        """Split start/end into consecutive windows of `delta` days (or a timedelta).
+
+        Windows do not overlap. Each window starts where the previous one ended, 
+        and the last window is cut off at the end date.
+        """
+        delta = 30 if delta is None else delta
+        delta = delta if isinstance(delta, datetime.timedelta) else datetime.timedelta(days=delta)
+        assert delta > datetime.timedelta(0), "delta must be greater than 0"
+
+        date_ranges = []
+        while start_date < end_date:
+            date_ranges.append(
+                (
+                    start_date,
+                    min(start_date + delta, end_date)
+                )
+            )
+            start_date += delta
+
+        return date_ranges
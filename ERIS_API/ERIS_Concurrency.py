@@ -0,0 +1,92 @@
+import threading
+import time
+
+from typing import Optional
+
+
+class ERISConcurrencyController(object):
+    def __init__(self, initial: Optional[int]=None, min_limit: Optional[int]=None, max_limit: Optional[int]=None, decrease: Optional[float]=None, latency_factor: Optional[float]=None) -> None:
+        """Adaptive limit on the number of requests in flight, using additive increase / multiplicative decrease (AIMD).
+
+        The limit is raised by one after each `limit` requests that succeed without the latency rising,
+        and multiplied by `decrease` when a request times out, is throttled (429), fails with a 5xx,
+        or takes longer than `latency_factor` times the average latency.
+        After a decrease, no further decrease is made for one average latency, so the requests that were already in flight do not cut it again.
+
+        Concurrent requests wait for a free slot with `with controller:`.
+
+        Args:
+            initial (int, optional): starting limit. Defaults to 4.
+            min_limit (int, optional): lowest limit. Defaults to 1.
+            max_limit (int, optional): highest limit. Defaults to the workers of the ERISAPI class.
+            decrease (float, optional): factor the limit is multiplied by on overload. Defaults to 0.5.
+            latency_factor (float, optional): latency above this multiple of the average is treated as overload. Defaults to 2.
+        """
+        self.min_limit = 1 if min_limit is None else min_limit
+        self.max_limit = max_limit
+        self.limit = 4 if initial is None else initial
+        self.limit = self.limit if self.max_limit is None else min(self.limit, self.max_limit)
+        self.decrease = 0.5 if decrease is None else decrease
+        self.latency_factor = 2.0 if latency_factor is None else latency_factor
+        assert 0 < self.decrease < 1, "decrease must be between 0 and 1"
+        assert self.min_limit > 0, "min_limit must be greater than 0"
+
+        self.latency = None
+        self.in_flight = 0
+
+        self._alpha = 0.2
+        self._successes = 0
+        self._last_decrease = None
+        self._condition = threading.Condition()
+
+    def _max_limit(self) -> int:
+        return self.limit if self.max_limit is None else self.max_limit
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+    def acquire(self):
+        """Wait until there are fewer than `limit` requests in flight"""
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def record(self, latency: float, overloaded: Optional[bool]=None):
+        """Adjust the limit from the outcome of a request.
+
+        Args:
+            latency (float): seconds the request took.
+            overloaded (bool, optional): the request timed out, was throttled or failed with a 5xx.
+        """
+        with self._condition:
+            slow = self.latency is not None and latency > self.latency * self.latency_factor
+            if overloaded or slow:
+                self._decrease()
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self._max_limit():
+                    self._successes = 0
+                    self.limit += 1
+                    self._condition.notify()
+
+            if not overloaded:
+                self.latency = latency if self.latency is None else self.latency + self._alpha * (latency - self.latency)
+
+    def _decrease(self):
+        now = time.monotonic()
+        cooldown = 0 if self.latency is None else self.latency
+        if self._last_decrease is not None and now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._successes = 0
+        self.limit = max(self.min_limit, int(self.limit * self.decrease))
@@ -0,0 +1,59 @@
+"""JSON decoders for the /tag/data responses.
+
+The fastest installed decoder is used by default (orjson, then ujson), falling back to the standard library.
+orjson is installed with the fast-json extra, pip install ERIS-API[fast-json].
+"""
+import json
+import logging
+
+from typing import Any, Callable, Dict, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+JSONDecoder = Union[str, Callable[[bytes], Any]]
+
+DECODERS: Dict[str, Callable[[bytes], Any]] = {'json': json.loads}
+if ujson is not None:
+    DECODERS['ujson'] = ujson.loads
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+
+_PREFERENCE = ['orjson', 'ujson', 'json']
+
+
+def get_decoder(decoder: Optional[JSONDecoder]=None) -> Callable[[bytes], Any]:
+    """Decoder function from its name ('orjson', 'ujson' or 'json'), or a function of the raw bytes.
+
+    Args:
+        decoder (str, Callable, optional): name or function of the decoder. Defaults to the fastest installed.
+    """
+    if callable(decoder):
+        return decoder
+    if decoder is None:
+        return next(DECODERS[_] for _ in _PREFERENCE if _ in DECODERS)
+    assert decoder in DECODERS, f"JSON decoder {decoder} is not installed. Available decoders: {', '.join(DECODERS)}"
+    return DECODERS[decoder]
+
+
+def loads(content: bytes, decoder: Optional[JSONDecoder]=None) -> Any:
+    """Decode the raw bytes of a response.
+
+    If the decoder fails (ie orjson does not accept NaN or Infinity values), the standard library decoder is tried instead.
+    """
+    decode = get_decoder(decoder)
+    try:
+        return decode(content)
+    except Exception as e:
+        if decode is json.loads:
+            raise
+        logging.warning(f"JSON decoder failed ({e}), falling back to the standard library")
+        return json.loads(content)
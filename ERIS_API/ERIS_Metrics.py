@@ -0,0 +1,222 @@
+import bisect
+import logging
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+STAGES = ['auth', 'connect', 'ttfb', 'download', 'backoff', 'decode', 'model', 'dataframe']
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0]
+
+_COUNTERS = {
+    "http_requests": ("status", "HTTP requests made to ERIS, including retries, by status"),
+    "retries": ("reason", "Requests retried, by reason"),
+    "errors": ("type", "Requests that failed, by exception"),
+    "logins": (None, "Logins made for an access token"),
+    "responses": (None, "Responses parsed"),
+    "compressed_bytes": (None, "Bytes received, as sent over the network"),
+    "decompressed_bytes": (None, "Bytes received, once decompressed"),
+    "rows": (None, "Rows parsed from the responses"),
+}
+
+_connect = threading.local()
+
+
+def _timed_connection(connection_class: type) -> type:
+    class _TimedConnection(connection_class):
+        """Connection adding the seconds spent connecting (including the TLS handshake) to the current thread"""
+        def connect(self):
+            started = time.monotonic()
+            try:
+                return super().connect()
+            finally:
+                _connect.seconds = getattr(_connect, 'seconds', 0.0) + time.monotonic() - started
+    return _TimedConnection
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _timed_connection(HTTPConnection)
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _timed_connection(HTTPSConnection)
+
+
+def time_connections(adapter) -> None:
+    """Time the connections opened by the pools of a requests HTTPAdapter. Read with take_connect_time."""
+    adapter.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+
+def take_connect_time() -> float:
+    """Seconds spent opening connections on this thread since the last call"""
+    seconds = getattr(_connect, 'seconds', 0.0)
+    _connect.seconds = 0.0
+    return seconds
+
+
+def add_stage(timing: Dict[str, float], stage: str, seconds: float):
+    timing[stage] = timing.get(stage, 0.0) + seconds
+
+
+class ERISMetrics(object):
+    def __init__(self, buckets: Optional[List[float]]=None) -> None:
+        """Timings and counters of the requests made by an ERISAPI class.
+
+        Each request is timed by stage:
+            auth: getting the access token, including waiting on a login.
+            connect: opening new connections, including the TLS handshake. Zero when a keep-alive connection is reused.
+            ttfb: from sending the request to receiving the response headers, less any connect time.
+            download: reading the body. Streamed responses are read while decoding, so are counted in decode.
+            backoff: waiting between retries.
+            decode: decoding the JSON or XML body.
+            model: building the models or columns of each tag.
+            dataframe: building the dataframes with convert_tags_to_dataframes.
+
+        Callbacks registered with `add_callback` are called as callback(event, data) for each
+        request (with its stages, bytes and rows), retry, error, login and dataframe.
+        Callbacks are called from the thread making the request, so should be quick and thread safe.
+
+        Totals are read with `snapshot` or `to_prometheus`.
+
+        Args:
+            buckets (List[float], optional): upper bounds in seconds of the stage histograms. Defaults to 5ms to 5 minutes.
+        """
+        self.buckets = sorted(DEFAULT_BUCKETS if buckets is None else buckets)
+        self._callbacks: List[Callable[[str, Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the counters and stage timings"""
+        with self._lock:
+            self._counters: Dict[str, Union[float, Dict[str, float]]] = {
+                name: ({} if label is not None else 0) for name, (label, _) in _COUNTERS.items()
+            }
+            self._stages: Dict[str, Dict[str, Any]] = {}
+
+    def add_callback(self, callback: Callable[[str, Dict[str, Any]], None]):
+        """Call callback(event, data) on each request, retry, error, login and dataframe"""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback: Callable[[str, Dict[str, Any]], None]):
+        self._callbacks.remove(callback)
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        for callback in list(self._callbacks):
+            try:
+                callback(event, data)
+            except Exception:
+                logging.exception(f"Metrics callback failed on {event}")
+
+    def _increment(self, name: str, amount: float=1, label: Optional[str]=None):
+        with self._lock:
+            if label is None:
+                self._counters[name] += amount
+            else:
+                self._counters[name][label] = self._counters[name].get(label, 0) + amount
+
+    def observe(self, stage: str, seconds: float):
+        """Add a time to the histogram of a stage"""
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = {"count": 0, "sum": 0.0, "buckets": [0] * len(self.buckets)}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for i in range(bisect.bisect_left(self.buckets, seconds), len(self.buckets)):
+                histogram["buckets"][i] += 1
+
+    def record_attempt(self, status: Union[int, str]):
+        """Count a HTTP request, by status or the exception if it failed without a response"""
+        self._increment("http_requests", label=str(status))
+
+    def record_retry(self, url: str, reason: str, attempt: int, delay: float):
+        self._increment("retries", label=reason)
+        self._emit("retry", {"url": url, "reason": reason, "attempt": attempt, "delay": delay})
+
+    def record_error(self, error: BaseException):
+        self._increment("errors", label=type(error).__name__)
+        self._emit("error", {"type": type(error).__name__, "message": str(error)})
+
+    def record_login(self, seconds: float):
+        self._increment("logins")
+        self._emit("login", {"seconds": seconds})
+
+    def record_response(self, url: Optional[str], status: Optional[int], timings: Dict[str, float], compressed_bytes: Optional[int], decompressed_bytes: Optional[int], rows: int, tags: int):
+        """Record the stages, bytes and rows of a parsed response"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+        self._increment("responses")
+        self._increment("compressed_bytes", compressed_bytes or decompressed_bytes or 0)
+        self._increment("decompressed_bytes", decompressed_bytes or 0)
+        self._increment("rows", rows)
+        self._emit("request", {
+            "url": url,
+            "status": status,
+            "stages": dict(timings),
+            "compressed_bytes": compressed_bytes,
+            "decompressed_bytes": decompressed_bytes,
+            "rows": rows,
+            "tags": tags
+        })
+
+    def record_dataframe(self, seconds: float, rows: int):
+        self.observe("dataframe", seconds)
+        self._emit("dataframe", {"seconds": seconds, "rows": rows})
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of the counters, and the count, total seconds and cumulative buckets (seconds: count) of each stage"""
+        with self._lock:
+            counters = {k: (dict(v) if isinstance(v, dict) else v) for k, v in self._counters.items()}
+            stages = {
+                stage: {
+                    "count": _["count"],
+                    "sum": _["sum"],
+                    "mean": _["sum"] / _["count"],
+                    "buckets": dict(zip(self.buckets, _["buckets"]))
+                } for stage, _ in self._stages.items()
+            }
+        return {"counters": counters, "stages": stages}
+
+    def to_prometheus(self, prefix: Optional[str]=None) -> str:
+        """Counters and stage histograms in the Prometheus text format, ie to serve on a /metrics endpoint
+
+        Args:
+            prefix (str, optional): prefix of the metric names. Defaults to eris.
+        """
+        prefix = "eris" if prefix is None else prefix
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in snapshot["counters"].items():
+            label, description = _COUNTERS[name]
+            metric = f"{prefix}_{name}_total"
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            if label is None:
+                lines.append(f"{metric} {_number(value)}")
+            else:
+                lines += [f'{metric}{{{label}="{_escape(k)}"}} {_number(v)}' for k, v in sorted(value.items())]
+
+        metric = f"{prefix}_stage_seconds"
+        lines += [f"# HELP {metric} Seconds spent in each stage of a request", f"# TYPE {metric} histogram"]
+        for stage in sorted(snapshot["stages"], key=lambda _: STAGES.index(_) if _ in STAGES else len(STAGES)):
+            histogram = snapshot["stages"][stage]
+            stage = _escape(stage)
+            for le, count in histogram["buckets"].items():
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="{_number(le)}"}} {count}')
+            lines += [
+                f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}',
+                f'{metric}_sum{{stage="{stage}"}} {_number(histogram["sum"])}',
+                f'{metric}_count{{stage="{stage}"}} {histogram["count"]}',
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
@@ -1,8 +1,36 @@
 from typing import List, Union, Dict, Any, Optional
 import datetime
+import re
 
 from uuid import uuid4
 
+_DURATION = re.compile(
+    r"^P(?:(?P<years>\d+)Y)?(?:(?P<months>\d+)M)?(?:(?P<weeks>\d+)W)?(?:(?P<days>\d+)D)?"
+    r"(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+(?:\.\d+)?)S)?)?$"
+)
+
+
+def interval_to_timedelta(interval: Optional[str]) -> Optional[datetime.timedelta]:
+    """Convert an ISO 8601 duration (ie P1D, PT15M) to a timedelta.
+
+    Months and years are approximated as 30 and 365 days.
+    Returns None if the interval is not a duration or is zero.
+    """
+    if interval is None:
+        return None
+    match = _DURATION.match(interval.strip().upper())
+    if match is None or interval.strip().upper() in ["P", "PT"]:
+        return None
+
+    parts = {k: float(v) for k, v in match.groupdict().items() if v is not None}
+    result = datetime.timedelta(
+        days=parts.get("years", 0) * 365 + parts.get("months", 0) * 30 + parts.get("weeks", 0) * 7 + parts.get("days", 0),
+        hours=parts.get("hours", 0),
+        minutes=parts.get("minutes", 0),
+        seconds=parts.get("seconds", 0)
+    )
+    return result if result > datetime.timedelta(0) else None
+
 
 class ERISTag(object):
     def __init__(self, label: Optional[str]=None, tag: Optional[str]=None, mode: Optional[str]=None, interval: Optional[str]=None) -> None:
@@ -39,6 +67,17 @@ class ERISTag(object):
 
         return ":".join(vals)
 
+    def sample_interval(self, raw_interval: Optional[datetime.timedelta]=None) -> Optional[datetime.timedelta]:
+        """Expected time between samples of the tag.
+
+        Raw mode returns every recorded sample regardless of the interval, so `raw_interval` is used for it
+        and for any interval that is not a duration.
+        """
+        if self.mode is not None and self.mode.lower() == "raw":
+            return raw_interval
+        interval = interval_to_timedelta(self.interval)
+        return raw_interval if interval is None else interval
+
     def __str__(self) -> str:
         lbl = f"Label: {self.label}" if self.label is not None else None
         tag = f"Tag: {self.tag}"
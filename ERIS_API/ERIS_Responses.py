@@ -2,10 +2,14 @@
 import pandas as pd
 import xml.etree.ElementTree as ET
 from xml.etree.ElementTree import Element
+import copy
+import datetime
 import json
 import logging
+import threading
+import time
 
-from typing import Optional, List, Dict, Union, Mapping, Any
+from typing import Optional, List, Dict, Union, Mapping, Any, Iterator, Set, Tuple
 
 from pydantic import ValidationError
 
@@ -13,26 +17,301 @@ import requests
 from requests.models import requote_uri
 import xmltodict
 
-from ERIS_API import ERIS_Parameters, models
+from ERIS_API import ERIS_JSON, ERIS_Metrics, ERIS_Parameters, ERIS_Streaming, models
+
+
+def parse_columns(content: bytes, is_xml: bool, json_decoder: Optional[ERIS_JSON.JSONDecoder]=None) -> List[models.ERISColumnData]:
+    """Decode a response body straight to columns per tag, as with fast=True.
+
+    A module level function of bytes so it can be run in a process pool. The columns are sent back without the ERISTags,
+    which are matched by ERISResponse.from_columns.
+    """
+    if is_xml:
+        data_obj = ERISResponse._parse_xml(content.decode())
+    else:
+        data_obj = ERIS_JSON.loads(content, json_decoder)
+    return [models.ERISColumnData.from_raw(tag) for tag in data_obj['tag']]
+
+
+def window_end(window: ERIS_Parameters.ERISRequest, end: Any) -> Optional[datetime.datetime]:
+    """End of a window when a later window starts there and also returns the samples at that time, otherwise None.
+
+    Windows are half open [start, end), so a sample on the boundary of two windows is kept from the later window.
+    Samples at or after the returned time are dropped. Shared by combine_concurrent_results, iter_api_data and the sink
+    so they all keep the same copy.
+
+    Args:
+        window (ERISRequest): request of the window
+        end: end of the whole request, which is the end of the last window
+    """
+    if isinstance(window.end, datetime.datetime) and window.end != end:
+        return window.end
+    return None
+
+
+def lean_dataframe(df: pd.DataFrame, float32: Optional[bool]=None, index: Optional[bool]=None) -> pd.DataFrame:
+    """Convert a Timestamp, Tag, Value dataframe to smaller types.
+
+    Tag becomes categorical, Timestamp datetime64 and Value a nullable Int64 or Float64 (missing values are <NA>).
+    Values that are not all numeric (ie status tags) are kept as a categorical of the strings.
+
+    Args:
+        df (pd.DataFrame): dataframe from tag_to_dataframe
+        float32 (bool, optional): store numeric values as Float32, halving their size at about 7 significant digits. Defaults to False.
+        index (bool, optional): set Timestamp as the index. Defaults to False.
+    """
+    float32 = False if float32 is None else float32
+    index = False if index is None else index
+
+    result = pd.DataFrame({
+        'Timestamp': pd.to_datetime(df['Timestamp']),
+        'Tag': df['Tag'].astype('category'),
+        'Value': _lean_values(df['Value'], float32)
+    }, index=df.index)
+    return result.set_index('Timestamp') if index else result
+
+
+def _lean_values(values: pd.Series, float32: bool) -> pd.Series:
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().sum() > values.isna().sum():
+        return values.astype('category')
+    if float32:
+        return numeric.astype('Float32')
+    if pd.api.types.is_integer_dtype(numeric):
+        return numeric.astype('Int64')
+    return numeric.astype('Float64')
+
+
+def concat_dataframes(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate dataframes keeping the categorical columns.
+
+    pandas falls back to object when the categories differ, so the categories are combined first.
+    """
+    frames = list(frames)
+    columns = [_ for _ in frames[0].columns if isinstance(frames[0][_].dtype, pd.CategoricalDtype)]
+    for column in columns:
+        categories = pd.api.types.union_categoricals([_[column] for _ in frames if isinstance(_[column].dtype, pd.CategoricalDtype)]).categories
+        frames = [_.assign(**{column: pd.Categorical(_[column], categories=categories)}) for _ in frames]
+    return pd.concat(frames)
+
+
+ALIGNMENTS = ['outer', 'inner', 'interval']
+
+
+def wide_dataframe(columns: List[Tuple[Any, List[Any], List[Any]]], align: Optional[str]=None, interval: Optional[datetime.timedelta]=None, origin: Optional[datetime.datetime]=None) -> Optional[pd.DataFrame]:
+    """Build a Timestamp indexed dataframe with a column per tag, straight from the time and value columns of each tag.
+
+    Tags with mismatched timestamps are aligned by:
+        outer - every timestamp of any tag, missing values are NaN
+        inner - only timestamps every tag has
+        interval - timestamps are snapped to the nearest step of `interval` from `origin`, on a regular index from the first to the last step
+
+    Args:
+        columns (List[Tuple]): label, times and values of each tag
+        align (str, optional): one of outer, inner or interval. Defaults to outer.
+        interval (datetime.timedelta, optional): step to snap to when align is interval.
+        origin (datetime.datetime, optional): first step when align is interval. Defaults to the earliest timestamp.
+    """
+    align = 'outer' if align is None else align
+    assert align in ALIGNMENTS, f"align must be one of {', '.join(ALIGNMENTS)}"
+    assert align != 'interval' or interval is not None, "An interval is required to align to the interval"
+
+    series = []
+    for label, times, values in columns:
+        tag_series = pd.Series(column_values(values).to_numpy(), index=pd.DatetimeIndex(pd.to_datetime(times), name='Timestamp'), name=label)
+        series.append(tag_series)
+    if len(series) == 0:
+        logging.warning("No data to build a dataframe from")
+        return
+
+    if align == 'interval':
+        step = pd.Timedelta(interval)
+        origin = min([_.index.min() for _ in series]) if origin is None else pd.Timestamp(origin)
+        series = [_.set_axis(_snap(_.index, step, origin)) for _ in series]
+        series = [_[~_.index.duplicated(keep='last')] for _ in series]
+        grid = pd.date_range(origin, max([_.index.max() for _ in series]), freq=step, name='Timestamp')
+        series = [_.reindex(grid) for _ in series]
+    else:
+        series = [_[~_.index.duplicated(keep='last')] for _ in series]
+
+    return pd.concat(series, axis=1, join='inner' if align == 'inner' else 'outer', sort=True)
+
+
+def _snap(index: pd.DatetimeIndex, step: pd.Timedelta, origin: pd.Timestamp) -> pd.DatetimeIndex:
+    offsets = index.asi8 - origin.value
+    snapped = (offsets + step.value // 2) // step.value * step.value + origin.value
+    return pd.DatetimeIndex(snapped.astype('datetime64[ns]'), name='Timestamp')
+
+
+def column_values(values: List[Any]) -> pd.Series:
+    """Convert values the same as the ERISDataRow model. Blank strings become None and numbers are parsed, leaving the column as is if it is not numeric."""
+    values = pd.Series(values, dtype=object)
+    values = values.where(values != '', None)
+    return pd.to_numeric(values, errors='ignore')
+
+
+class ERISTransferStats(object):
+    def __init__(self) -> None:
+        """Running totals of the bytes received over the network (compressed) and decoded (decompressed) by the responses of an ERISAPI class"""
+        self.requests = 0
+        self.compressed_bytes = 0
+        self.decompressed_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, response: 'ERISResponse'):
+        if response.decompressed_bytes is None:
+            return
+        with self._lock:
+            self.requests += 1
+            self.compressed_bytes += response.compressed_bytes or response.decompressed_bytes
+            self.decompressed_bytes += response.decompressed_bytes
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """Decompressed bytes per compressed byte"""
+        return self.decompressed_bytes / self.compressed_bytes if self.compressed_bytes > 0 else None
 
 
 class ERISResponse(object):
-    def __init__(self, request_response: requests.Response, eris_parameters: ERIS_Parameters.ERISRequest, is_xml: bool) -> None:
+    def __init__(self, request_response: requests.Response, eris_parameters: ERIS_Parameters.ERISRequest, is_xml: bool, fast: Optional[bool]=None, stream: Optional[bool]=None, chunk_size: Optional[int]=None, json_decoder: Optional[ERIS_JSON.JSONDecoder]=None) -> None:
+        """Parses the response of an ERIS request.
+
+        Args:
+            request_response (requests.Response): response of the request
+            eris_parameters (ERISRequest): request the response is for
+            is_xml (bool): response is XML (ESRM endpoint) rather than JSON
+            fast (bool, optional): parse directly to columns (models.ERISColumnData) instead of a pydantic model per row. Defaults to False.
+            stream (bool, optional): decode the body incrementally as it is read. Requires the request to be made with stream=True. 
+                Results are always columns. Defaults to False.
+            chunk_size (int, optional): maximum rows per chunk when streaming. Defaults to 10000.
+            json_decoder (str, Callable, optional): decoder of the raw JSON bytes, by name ('orjson', 'ujson', 'json') or a function. 
+                Defaults to the fastest installed, falling back to the standard library. See ERIS_JSON.
+
+        Responses of compact requests are always parsed to columns, as the rows do not match the model.
+        """
         super().__init__()
 
         self.response_class = request_response
         self.is_xml = is_xml
         self.eris_parameters = eris_parameters
+        self.compact = eris_parameters is not None and eris_parameters.compact == True
+        self.fast = (False if fast is None else fast) or self.compact
+        self.stream = False if stream is None else stream
+        self.chunk_size = chunk_size
+        self.json_decoder = json_decoder
         
         self.response_dict = None
         self.raw_model = None
         self.tag_data = None
         self.tag_dataframes = []
 
+        self.content_encoding = None
+        self.compressed_bytes = None
+        self.decompressed_bytes = None
+
+        timing = getattr(request_response, 'eris_timing', None)
+        self.timings: Dict[str, float] = dict(timing) if isinstance(timing, dict) else {}
+        self.metrics: Optional[ERIS_Metrics.ERISMetrics] = None
+
+    @classmethod
+    def from_columns(cls, eris_parameters: ERIS_Parameters.ERISRequest, tag_data: List[models.ERISColumnData], is_xml: Optional[bool]=None) -> 'ERISResponse':
+        """Build a response from tag data that is already in columns (ie from a cache) rather than a request.
+
+        The tagUID of each tag must be the request_uuid of its ERISTag.
+        """
+        response = cls(None, eris_parameters, False if is_xml is None else is_xml, True)
+        response.tag_data = tag_data
+        response._match_tags()
+        return response
+
+    def rebind(self, eris_parameters: ERIS_Parameters.ERISRequest) -> 'ERISResponse':
+        """Copy of the response for another ERISRequest of the same tags (ie a cached response).
+
+        The tags of both requests must be in the same order. The parsed data is shared, 
+        but each tag is matched to the ERISTag of the new request so its label is used.
+        """
+        if eris_parameters is self.eris_parameters:
+            return self
+
+        response = copy.copy(self)
+        response.eris_parameters = eris_parameters
+        response.tag_dataframes = []
+        response.timings = dict(self.timings)
+        if self.tag_data is None:
+            return response
+
+        uuid_map = {old.request_uuid: new for old, new in zip(self.eris_parameters.tags, eris_parameters.tags)}
+        response.tag_data = []
+        for tag in self.tag_data:
+            tag = copy.copy(tag)
+            eris_tag = uuid_map.get(tag.tagUID)
+            tag.eris_tag = eris_tag
+            tag.tagUID = eris_tag.request_uuid if eris_tag is not None else tag.tagUID
+            response.tag_data.append(tag)
+        return response
+
+    def detach(self) -> 'ERISResponse':
+        """Copy of the response keeping only the parsed tag data, to hold on to it (ie in ERISResponseCache) without the memory of the request.
+
+        The body, decoded dictionary, model and dataframes are dropped, so failed_tags and export_eris_response are not available on the copy.
+        """
+        response = copy.copy(self)
+        response.response_class = None
+        response.response_dict = None
+        response.raw_model = None
+        response.tag_dataframes = []
+        return response
+
     def _match_tags(self):
+        """Match each tag to its ERISTag by tagUID. 
+        
+        Compact responses may not include the tagUID, in which case tags are matched by position if every tag was returned.
+        """
         eris_tags = self.eris_parameters.tags
-        for tag in self.tag_data:
+        positional = len(self.tag_data) == len(eris_tags)
+        for tag, e_tag in zip(self.tag_data, eris_tags):
+            tag.eris_tag = self._match_tag(eris_tags, tag)
+            if tag.eris_tag is None and tag.tagUID is None and positional:
+                tag.eris_tag = e_tag
+                tag.tagUID = e_tag.request_uuid
+        for tag in self.tag_data[len(eris_tags):]:
             tag.eris_tag = self._match_tag(eris_tags, tag)
+
+    @staticmethod
+    def metadata_key(eris_tag: ERIS_Parameters.ERISTag) -> Tuple[str, str, str]:
+        """Key of the metadata of a tag. The interval and mode are part of the metadata, so the same tag requested another way has its own entry."""
+        return (eris_tag.tag, eris_tag.mode, eris_tag.interval)
+
+    def tag_metadata(self) -> Dict[Tuple[str, str, str], Dict[str, Any]]:
+        """Metadata (name, description, engUnits, etc) of each tag returned, keyed by metadata_key. Used to fill in compact responses."""
+        metadata = {}
+        for tag in self.tag_data or []:
+            if tag.eris_tag is None or tag.name is None:
+                continue
+            metadata[self.metadata_key(tag.eris_tag)] = {field: getattr(tag, field) for field in models.ERISColumnData.metadata_fields if field != 'tagUID'}
+        return metadata
+
+    def failed_tags(self) -> Set[str]:
+        """tagUIDs of the tags the server reported an exception for. Only known for responses that were not streamed."""
+        info = self.response_dict.get('info') if isinstance(self.response_dict, dict) else None
+        info = [info] if isinstance(info, dict) else info or []
+        return {_.get('key') for _ in info if isinstance(_, dict) and _.get('type') == 'exception' and _.get('key') is not None}
+
+    def attach_metadata(self, metadata: Optional[Dict[Tuple[str, str, str], Dict[str, Any]]]=None):
+        """Fill in the metadata missing from the tags (ie a compact response). 
+        
+        Taken from `metadata` (see tag_metadata) if the tag is in it, otherwise the name, interval and mode of the ERISTag.
+        """
+        metadata = {} if metadata is None else metadata
+        for tag in self.tag_data or []:
+            eris_tag = tag.eris_tag
+            if eris_tag is None:
+                continue
+            values = {'name': eris_tag.tag, 'sampleInterval': eris_tag.interval, 'samplingMode': eris_tag.mode}
+            values.update(metadata.get(self.metadata_key(eris_tag), {}))
+            for field, value in values.items():
+                if getattr(tag, field, None) is None:
+                    setattr(tag, field, value)
     
     def _match_tag(self, eris_tags, tag):
         for e_tag in eris_tags:
@@ -42,28 +321,55 @@ class ERISResponse(object):
 
     def process_results(self):
         try:
-            data_obj = self.parse_data()
-            result_data = self.load_model(data_obj)
+            if self.stream:
+                self._timed('decode', self.load_chunks)
+            else:
+                data_obj = self._timed('decode', self.parse_data)
+                self._measure_transfer()
+                if self.fast:
+                    self._timed('model', self.load_columns, data_obj)
+                else:
+                    self._timed('model', self.load_model, data_obj)
             self._match_tags()
             return self.tag_data
         
         except:
             logging.exception("Error processing results. Partial results may be available in class parameters")
 
+    def _timed(self, stage: str, function, *args):
+        """Call function(*args), adding the seconds it takes to the timings of the stage"""
+        started = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            ERIS_Metrics.add_stage(self.timings, stage, time.perf_counter() - started)
+
+    def row_count(self) -> int:
+        """Rows of all tags in the response"""
+        return sum([len(tag) if isinstance(tag, models.ERISColumnData) else len(tag.data or []) for tag in self.tag_data or []])
+
     def parse_data(self) -> Dict:
         """this converts the request to the valid json"""
         data_obj = None
         if self.is_xml:
             data_obj = self._parse_xml(self.response_class.text)
         else:
-            data_obj = self._parse_json(self.response_class.json())
+            data_obj = self._parse_json(self._decode_json())
         self.response_dict = data_obj
         return self.response_dict
 
+    def _decode_json(self) -> Dict:
+        """Decode the raw bytes of the response with the json_decoder. Responses without raw bytes use their own json()"""
+        content = getattr(self.response_class, 'content', None)
+        if not isinstance(content, bytes):
+            return self.response_class.json()
+        return ERIS_JSON.loads(content, self.json_decoder)
+
     def _parse_json(self, response_content: Dict) -> Dict:
         return response_content
 
-    def _parse_xml(self, response_content: str) -> Dict:
+    @staticmethod
+    def _parse_xml(response_content: str) -> Dict:
         tag_tree = xmltodict.parse(response_content, attr_prefix="")
         if not 'tagDataset' in tag_tree:
             logging.warning("No tagDataset found in response")
@@ -91,7 +397,76 @@ class ERISResponse(object):
         self.tag_data = [models.ERISData(**tag.dict()) for tag in tag_model.tags]
         return self.tag_data
 
-    def convert_tags_to_dataframes(self, concat=None) -> pd.DataFrame:
+    def load_columns(self, data_obj) -> List[models.ERISColumnData]:
+        """Fast version of load_model. Converts the decoded response straight to columns per tag"""
+        self.tag_data = [models.ERISColumnData.from_raw(tag) for tag in data_obj['tag']]
+        return self.tag_data
+
+    def iter_chunks(self) -> Iterator[models.ERISColumnChunk]:
+        """Decode the response incrementally, yielding column chunks of each tag as they are read.
+
+        Requires the request to be made with stream=True. The body can only be read once.
+        """
+        eris_tags = self.eris_parameters.tags
+        self.decompressed_bytes = 0
+        body = self._count_bytes(self.response_class.iter_content(chunk_size=ERIS_Streaming.DEFAULT_READ_SIZE))
+        parser = ERIS_Streaming.iter_xml_tag_chunks if self.is_xml else ERIS_Streaming.iter_json_tag_chunks
+        for chunk in parser(body, self.chunk_size):
+            chunk.eris_tag = self._match_tag(eris_tags, chunk)
+            yield chunk
+        self._measure_transfer(self.decompressed_bytes)
+
+    def _count_bytes(self, body: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass through the decompressed body, counting its size"""
+        for data in body:
+            self.decompressed_bytes += len(data)
+            yield data
+
+    def _measure_transfer(self, decompressed: Optional[int]=None):
+        """Record the size of the body as received (compressed_bytes) and once decoded (decompressed_bytes).
+
+        The received size is read from the connection if available, otherwise the Content-Length header.
+        """
+        response = self.response_class
+        headers = getattr(response, 'headers', None)
+        headers = headers if isinstance(headers, Mapping) else {}
+        if decompressed is None:
+            content = getattr(response, 'content', None)
+            decompressed = len(content) if isinstance(content, bytes) else None
+
+        self.content_encoding = headers.get('Content-Encoding')
+        self.decompressed_bytes = decompressed
+        self.compressed_bytes = self._wire_bytes(headers)
+        if self.compressed_bytes is None and self.content_encoding is None:
+            self.compressed_bytes = decompressed
+
+    def _wire_bytes(self, headers: Mapping) -> Optional[int]:
+        tell = getattr(getattr(self.response_class, 'raw', None), 'tell', None)
+        wire = tell() if callable(tell) else None
+        if isinstance(wire, int) and wire > 0:
+            return wire
+        try:
+            return int(headers['Content-Length'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def load_chunks(self) -> List[models.ERISColumnData]:
+        """Streaming version of load_columns. Joins the chunks of each tag back together"""
+        self.tag_data = []
+        tag = None
+        for chunk in self.iter_chunks():
+            tag = models.ERISColumnData() if tag is None else tag
+            tag.time.extend(chunk.time)
+            tag.value.extend(chunk.value)
+            tag.source.extend(chunk.source)
+            if chunk.last:
+                for field in models.ERISColumnData.metadata_fields:
+                    setattr(tag, field, getattr(chunk, field))
+                self.tag_data.append(tag)
+                tag = None
+        return self.tag_data
+
+    def convert_tags_to_dataframes(self, concat=None, lean=None, float32=None, index=None) -> pd.DataFrame:
         """Convert all internal tag data to individual data frames
 
         If concat is True, then it will concatenate it to a single dataframe as the return.
@@ -103,16 +478,19 @@ class ERISResponse(object):
 
         Option to also attempt to convert the value field to a numeric type.
         Will default to True if not specified
+
+        With lean=True the dataframes use smaller types, see lean_dataframe.
         """
         concat = True if concat is None else concat
         for tag in self.tag_data:
-            self.tag_to_dataframe(tag)
+            self.tag_to_dataframe(tag, lean=lean, float32=float32, index=index)
         if len(self.tag_dataframes) == 0:
             logging.warning("No dataframes in response")
             return
 
-        result = pd.concat(self.tag_dataframes) if concat == True else self.tag_dataframes
-        return result
+        if concat != True:
+            return self.tag_dataframes
+        return concat_dataframes(self.tag_dataframes) if lean else pd.concat(self.tag_dataframes)
 
     def _determine_tag_label(self, tag_dict: models.ERISData, tag_label=None, custom_label=None) -> Optional[str]:
         tag_label = 'name' if tag_label is None else tag_label
@@ -129,7 +507,7 @@ class ERISResponse(object):
 
         return label_name
 
-    def tag_to_dataframe(self, tag: models.ERISData, tag_label=None, custom_label=None) -> pd.DataFrame:
+    def tag_to_dataframe(self, tag: Union[models.ERISData, models.ERISColumnData], tag_label=None, custom_label=None, lean=None, float32=None, index=None) -> pd.DataFrame:
         """Convert a tag to a pandas data frame of the format 
         If a label is given in the ERISTag class it will try and match to this in the processing. This is the label to use.
         Otherwise it will either use a custom label if provided or default to the name attribute in the response.
@@ -146,23 +524,93 @@ class ERISResponse(object):
             tag (dictionary of tag): dictionary of the tag returned from _process_tree
             tag_label (string): One of the dictionary keys to use as a label. Default is 'name'
             custom_label (string): Label of own choosing
+            lean (bool): use a categorical Tag, datetime64 Timestamp and nullable Value. Default is False
+            float32 (bool): with lean, store numeric values as Float32. Default is False
+            index (bool): with lean, set Timestamp as the index. Default is False
         """
         # tag_label = 'tagUID' if tag_label is None else tag_label
         # label_name = tag.get(tag_label) if custom_label is None else custom_label
         label_name = self._determine_tag_label(tag, tag_label, custom_label)
 
-        if len(tag.data) == 0:
+        _rows = tag if isinstance(tag, models.ERISColumnData) else tag.data
+        if len(_rows) == 0:
             _uid = tag.name
             logging.warning(f"No data for tag {_uid} - {label_name}")
             return
 
-        df = pd.DataFrame([_.dict() for _ in tag.data])
-        df.rename(columns={
-            'timestamp': 'Timestamp',
-            'tag': 'Tag',
-            'value': 'Value'
-        }, inplace=True)
-        df["Tag"] = label_name
+        started = time.perf_counter()
+        if isinstance(tag, models.ERISColumnData):
+            df = self._columns_to_dataframe(tag, label_name)
+        else:
+            df = pd.DataFrame([_.dict() for _ in tag.data])
+            df.rename(columns={
+                'timestamp': 'Timestamp',
+                'tag': 'Tag',
+                'value': 'Value'
+            }, inplace=True)
+            df["Tag"] = label_name
 
+        if lean:
+            df = lean_dataframe(df, float32, index)
         self.tag_dataframes.append(df)
+        self._record_dataframe(time.perf_counter() - started, len(df))
         return df
+
+    def _record_dataframe(self, seconds: float, rows: int):
+        ERIS_Metrics.add_stage(self.timings, 'dataframe', seconds)
+        if self.metrics is not None:
+            self.metrics.record_dataframe(seconds, rows)
+
+    def _columns_to_dataframe(self, tag: models.ERISColumnData, label_name: Optional[str]) -> pd.DataFrame:
+        """Build the Timestamp, Tag, Value dataframe from the tag columns in one step.
+
+        Values are converted the same as the ERISDataRow model. Blank strings become None and 
+        numbers are parsed, leaving the column as is if it is not numeric.
+        """
+        return pd.DataFrame({
+            'Timestamp': pd.to_datetime(tag.time),
+            'Tag': label_name,
+            'Value': column_values(tag.value)
+        })
+
+    def tag_columns(self, tag: Union[models.ERISData, models.ERISColumnData]) -> Tuple[List[Any], List[Any]]:
+        """Times and values of a tag from either parser"""
+        if isinstance(tag, models.ERISColumnData):
+            return tag.time, tag.value
+        rows = [] if tag.data is None else tag.data
+        return [_.timestamp for _ in rows], [_.value for _ in rows]
+
+    def interval(self) -> Optional[datetime.timedelta]:
+        """Smallest sample interval of the requested tags, ignoring raw mode tags"""
+        intervals = [_.sample_interval() for _ in self.eris_parameters.tags]
+        intervals = [_ for _ in intervals if _ is not None]
+        return min(intervals) if len(intervals) > 0 else None
+
+    def start_time(self) -> Optional[datetime.datetime]:
+        """Start of the request, if it is a time rather than a relative expression"""
+        try:
+            return pd.Timestamp(self.eris_parameters.start).to_pydatetime()
+        except (ValueError, TypeError):
+            return None
+
+    def convert_tags_to_wide(self, align: Optional[str]=None, interval: Optional[datetime.timedelta]=None, tag_label=None) -> Optional[pd.DataFrame]:
+        """Convert all tags to a single Timestamp indexed dataframe with a column per tag.
+
+        Built from the columns of each tag, so the long Timestamp, Tag, Value dataframe is never made and there is nothing to pivot.
+        See wide_dataframe for the alignment of tags with different timestamps.
+
+        Args:
+            align (str, optional): outer, inner or interval. Defaults to outer.
+            interval (datetime.timedelta, optional): step when align is interval. Defaults to the smallest interval of the requested tags.
+            tag_label (str, optional): key to label the columns with when the tag is not matched. Defaults to 'name'.
+        """
+        interval = self.interval() if interval is None else interval
+        columns = []
+        for tag in [] if self.tag_data is None else self.tag_data:
+            times, values = self.tag_columns(tag)
+            label_name = self._determine_tag_label(tag, tag_label)
+            if len(times) == 0:
+                logging.warning(f"No data for tag {tag.name} - {label_name}")
+                continue
+            columns.append((label_name, times, values))
+        return wide_dataframe(columns, align, interval, self.start_time())
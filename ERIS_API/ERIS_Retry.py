@@ -0,0 +1,96 @@
+import datetime
+import email.utils
+import random
+import threading
+
+from typing import Optional, Iterable
+
+
+class ERISRetryPolicy(object):
+    def __init__(self, max_retries: Optional[int]=None, timeout_retries: Optional[int]=None, backoff: Optional[float]=None, max_backoff: Optional[float]=None, jitter: Optional[bool]=None, retry_statuses: Optional[Iterable[int]]=None, budget: Optional[int]=None, split_timeouts: Optional[bool]=None, min_window: Optional[datetime.timedelta]=None) -> None:
+        """When and how long to wait before retrying a failed request.
+
+        Requests that fail with a retry status (5xx), are throttled (429), fail to connect or have their connection closed part way through the body are retried up to `max_retries` times.
+        Timeouts are retried separately, up to `timeout_retries` times, as a request that timed out is likely to again.
+        The wait doubles each retry from `backoff` up to `max_backoff` seconds, and is randomised between 0 and that value when `jitter` is set.
+        A 429 waits at least as long as the Retry-After header of the response.
+
+        The `budget` limits the total retries made until `reset` is called, so a struggling server is not sent a retry for every request.
+        request_api_data_concurrent resets it at the start of each call.
+
+        Args:
+            max_retries (int, optional): retries of 5xx, 429 and connection errors. Defaults to 3.
+            timeout_retries (int, optional): retries of timeouts. Defaults to 1.
+            backoff (float, optional): seconds to wait before the first retry. Defaults to 1.
+            max_backoff (float, optional): maximum seconds to wait before a retry. Defaults to 60.
+            jitter (bool, optional): randomise the wait. Defaults to True.
+            retry_statuses (Iterable[int], optional): status codes to retry, other than 429. Defaults to 500, 502, 503 and 504.
+            budget (int, optional): total retries allowed until reset. Defaults to None (no limit).
+            split_timeouts (bool, optional): concurrent windows that time out are split in half and requested again. Defaults to True.
+            min_window (timedelta, optional): windows shorter than twice this are not split. Defaults to 1 hour.
+        """
+        self.max_retries = 3 if max_retries is None else max_retries
+        self.timeout_retries = 1 if timeout_retries is None else timeout_retries
+        self.backoff = 1.0 if backoff is None else backoff
+        self.max_backoff = 60.0 if max_backoff is None else max_backoff
+        self.jitter = True if jitter is None else jitter
+        self.retry_statuses = {500, 502, 503, 504} if retry_statuses is None else set(retry_statuses)
+        self.budget = budget
+        self.split_timeouts = True if split_timeouts is None else split_timeouts
+        self.min_window = datetime.timedelta(hours=1) if min_window is None else min_window
+
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Reset the retries counted against the budget"""
+        with self._lock:
+            self.retries = 0
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.budget is not None and self.retries >= self.budget:
+                return False
+            self.retries += 1
+            return True
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """Seconds to wait from a Retry-After header, given as seconds or a http date"""
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(0.0, (retry_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds())
+
+    def retry_delay(self, attempt: int, status_code: Optional[int]=None, timeout: Optional[bool]=None, retry_after: Optional[float]=None) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the request should not be retried.
+
+        Args:
+            attempt (int): number of retries already made for the request.
+            status_code (int, optional): status of the response. None if the request failed without a response.
+            timeout (bool, optional): the request timed out.
+            retry_after (float, optional): seconds from the Retry-After header of the response.
+        """
+        if timeout:
+            limit = self.timeout_retries
+        elif status_code is None or status_code == 429 or status_code in self.retry_statuses:
+            limit = self.max_retries
+        else:
+            return None
+
+        if attempt >= limit or not self._take_budget():
+            return None
+
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if status_code == 429 and retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
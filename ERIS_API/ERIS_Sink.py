@@ -0,0 +1,148 @@
+import datetime
+import threading
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from urllib.parse import quote
+from uuid import uuid4
+
+import pandas as pd
+
+from ERIS_API.ERIS_Responses import ERISResponse, column_values
+
+try:
+    import pyarrow
+    import pyarrow.dataset
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+FORMATS = {'parquet': 'parquet', 'arrow': 'ipc'}
+
+
+class _PartitionWriter(object):
+    """Open file of one tag and date partition, appended to by every window until the sink is closed"""
+    def __init__(self, path: Path, schema: 'pyarrow.Schema', format: str, compression: str) -> None:
+        self.path = path
+        self.schema = schema
+        self.file = None
+        if format == 'parquet':
+            self.writer = pyarrow.parquet.ParquetWriter(str(path), schema, compression=compression)
+        else:
+            self.file = pyarrow.OSFile(str(path), 'wb')
+            self.writer = pyarrow.ipc.new_file(self.file, schema)
+
+    def write(self, table: 'pyarrow.Table'):
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+
+class ERISParquetSink(object):
+    def __init__(self, path: Union[str, Path], format: Optional[str]=None, period: Optional[str]=None, compression: Optional[str]=None) -> None:
+        """Writes the tag data of responses to files partitioned by tag and date, so responses do not need to be kept in memory.
+
+        Files are laid out as hive partitions, path/tag=<label>/date=<period>/part-<uuid>.parquet, with a Timestamp and Value column.
+        Each partition is kept open and every window is appended to it (as a row group), so a run writes one file per tag and period. 
+        The files are complete once `close` is called, which request_api_data_concurrent does at the end of the run. 
+        A window whose values change type (ie a numeric tag returning text) starts a new file of the partition.
+        The output can be read with pyarrow, duckdb, spark, polars, etc without going through this package, or with `dataset`.
+        Numeric values are stored as float64, and tags with text values (ie status) as strings.
+
+        Requires pyarrow to be installed.
+
+        Args:
+            path (str): directory to write the files to.
+            format (str, optional): parquet or arrow (Arrow IPC). Defaults to parquet.
+            period (str, optional): pandas period of the date partitions, ie D, M or Y. Defaults to M (monthly).
+            compression (str, optional): parquet compression codec. Defaults to snappy.
+        """
+        assert pyarrow is not None, "pyarrow is required for ERISParquetSink. Install with pip install ERIS-API[parquet]"
+        self.format = 'parquet' if format is None else format
+        assert self.format in FORMATS, f"format must be one of {', '.join(FORMATS)}"
+        self.period = 'M' if period is None else period
+        self.compression = 'snappy' if compression is None else compression
+
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.files: List[Path] = []
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._writers: Dict[Tuple[str, str], _PartitionWriter] = {}
+
+    def write(self, response: ERISResponse, end: Optional[datetime.datetime]=None) -> List[Path]:
+        """Write every tag of a response. Returns the files written to, which may already hold earlier windows.
+
+        Args:
+            response (ERISResponse): processed response.
+            end (datetime.datetime, optional): skip samples at or after this time, which the next window also returns.
+        """
+        files = []
+        for tag in [] if response.tag_data is None else response.tag_data:
+            times, values = response.tag_columns(tag)
+            files += self.write_columns(response._determine_tag_label(tag), times, values, end)
+        return files
+
+    def write_columns(self, label: Any, times: List[Any], values: List[Any], end: Optional[datetime.datetime]=None) -> List[Path]:
+        """Write the time and value columns of one tag, appended to the file of each date partition"""
+        timestamps = pd.DatetimeIndex(pd.to_datetime(times))
+        values = column_values(values)
+        if end is not None:
+            keep = timestamps < pd.Timestamp(end)
+            timestamps, values = timestamps[keep], values[keep]
+        if len(timestamps) == 0:
+            return []
+
+        if pd.api.types.is_numeric_dtype(values):
+            value_array = pyarrow.array(values.astype('float64'), type=pyarrow.float64())
+        else:
+            value_array = pyarrow.array(values.where(values.isna(), values.astype(str)), type=pyarrow.string(), from_pandas=True)
+        table = pyarrow.table({'Timestamp': pyarrow.array(timestamps, type=pyarrow.timestamp('ns')), 'Value': value_array})
+
+        files = []
+        periods = timestamps.to_period(self.period)
+        for period in periods.unique():
+            rows = (periods == period).nonzero()[0]
+            files.append(self._write_table(table.take(rows), label, str(period)))
+        return files
+
+    def _write_table(self, table: 'pyarrow.Table', label: Any, period: str) -> Path:
+        partition = quote(str(label), safe='')
+        with self._lock:
+            writer = self._writers.get((partition, period))
+            if writer is not None and not table.schema.equals(writer.schema):
+                writer.close()
+                writer = None
+            if writer is None:
+                directory = self.path / f"tag={partition}" / f"date={period}"
+                directory.mkdir(parents=True, exist_ok=True)
+                writer = _PartitionWriter(directory / f"part-{uuid4().hex}.{self.format}", table.schema, self.format, self.compression)
+                self._writers[(partition, period)] = writer
+                self.files.append(writer.path)
+
+            writer.write(table)
+            self.rows += table.num_rows
+        return writer.path
+
+    def close(self):
+        """Close the open files. Later writes start new files."""
+        with self._lock:
+            writers, self._writers = list(self._writers.values()), {}
+        for writer in writers:
+            writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def dataset(self) -> 'pyarrow.dataset.Dataset':
+        """Dataset of everything written, with the tag and date partitions as columns. Closes the open files first."""
+        self.close()
+        return pyarrow.dataset.dataset(str(self.path), format=FORMATS[self.format], partitioning='hive')
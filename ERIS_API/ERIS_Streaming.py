@@ -0,0 +1,251 @@
+import codecs
+import json
+import re
+import xml.etree.ElementTree as ET
+
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from ERIS_API import models
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_READ_SIZE = 64 * 1024
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _JSONStreamReader(object):
+    """Incremental reader over a json document arriving as chunks of bytes.
+
+    Only the structure that needs to be walked (the response object, the tag list and each data list) is read
+    piece by piece. Everything else is decoded one complete value at a time with the stdlib decoder, so memory
+    grows with the largest single value rather than the whole body.
+    """
+    def __init__(self, chunks: Iterable[bytes]) -> None:
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        """Read the next chunk into the buffer, dropping what has been consumed.
+
+        returns:
+            bool: False if the end of the body has been reached
+        """
+        if self.eof:
+            return False
+        try:
+            text = self._text_decoder.decode(next(self._chunks))
+        except StopIteration:
+            text = self._text_decoder.decode(b'', final=True)
+            self.eof = True
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def _error(self, message: str):
+        return json.JSONDecodeError(message, self.buffer, self.pos)
+
+    def peek(self) -> str:
+        """Return the next non whitespace character without consuming it"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise self._error("Unexpected end of response")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise self._error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete json value.
+
+        A value that reaches the end of the buffer may be cut off (ie a number), so it is only accepted
+        once there is at least one more character after it or the body has ended.
+        """
+        self.peek()
+        while True:
+            try:
+                obj, end = self._json_decoder.raw_decode(self.buffer, self.pos)
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+    def keys(self) -> Iterator[str]:
+        """Iterate the keys of an object. The caller must read the value of each key before continuing."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+    def items(self) -> Iterator[int]:
+        """Iterate the items of an array. The caller must read each item before continuing."""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise self._error("Expecting ',' delimiter")
+
+
+def iter_json_tag_chunks(chunks: Iterable[bytes], chunk_size: Optional[int]=None) -> Iterator[models.ERISColumnChunk]:
+    """Decode a /tag/data json response incrementally into column chunks.
+
+    Each tag's data is split into chunks of at most `chunk_size` rows. Every tag produces at least one chunk,
+    and the last chunk of a tag has `last` set and holds all of the tag metadata.
+
+    Args:
+        chunks (Iterable[bytes]): body of the response, ie requests.Response.iter_content()
+        chunk_size (int, optional): maximum rows per chunk. Defaults to 10000.
+    """
+    chunk_size = DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size
+    reader = _JSONStreamReader(chunks)
+
+    for key in reader.keys():
+        if key == 'tag' and reader.peek() == '[':
+            for tag_index in reader.items():
+                yield from _iter_tag(reader, tag_index, chunk_size)
+        else:
+            reader.value()
+
+
+def _iter_tag(reader: _JSONStreamReader, tag_index: int, chunk_size: int) -> Iterator[models.ERISColumnChunk]:
+    metadata: Dict[str, Any] = {}
+    chunk = None
+    for key in reader.keys():
+        if key == 'data' and reader.peek() == '[':
+            chunk = models.ERISColumnChunk(tag_index, **metadata)
+            for _ in reader.items():
+                time, value, source = models.row_columns(reader.value())
+                chunk.time.append(time)
+                chunk.value.append(value)
+                chunk.source.append(source)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = models.ERISColumnChunk(tag_index, **metadata)
+        elif key in models.ERISColumnData.metadata_fields:
+            metadata[key] = reader.value()
+        else:
+            reader.value()
+
+    chunk = models.ERISColumnChunk(tag_index, **metadata) if chunk is None else chunk
+    for field in models.ERISColumnData.metadata_fields:
+        setattr(chunk, field, metadata.get(field))
+    chunk.last = True
+    yield chunk
+
+
+def _local_name(name: str) -> str:
+    """Drop the namespace from an element name"""
+    return name.rsplit('}', 1)[-1]
+
+
+def iter_xml_tag_chunks(chunks: Iterable[bytes], chunk_size: Optional[int]=None) -> Iterator[models.ERISColumnChunk]:
+    """Parse an ESRM /tag/data xml response incrementally into column chunks.
+
+    Elements are cleared as soon as they have been read, so neither the whole document nor a dictionary of it is held.
+    As with ERISResponse._parse_xml, tags without any data (ie errors) are skipped.
+
+    Args:
+        chunks (Iterable[bytes]): body of the response, ie requests.Response.iter_content()
+        chunk_size (int, optional): maximum rows per chunk. Defaults to 10000.
+    """
+    chunk_size = DEFAULT_CHUNK_SIZE if chunk_size is None else chunk_size
+    parser = ET.XMLPullParser(events=('start', 'end'))
+
+    reader = _XMLTagReader(chunk_size)
+    for data in chunks:
+        parser.feed(data)
+        yield from reader.read(parser.read_events())
+    parser.close()
+    yield from reader.read(parser.read_events())
+
+
+class _XMLTagReader(object):
+    """Walks the events of the pull parser. tagDataset > tag > (tagUID, name, ..., data)"""
+    def __init__(self, chunk_size: int) -> None:
+        self.chunk_size = chunk_size
+        self.depth = 0
+        self.root = None
+        self.tag = None
+        self.tag_index = 0
+        self.metadata = None
+        self.chunk = None
+
+    def read(self, events) -> Iterator[models.ERISColumnChunk]:
+        for event, elem in events:
+            if event == 'start':
+                self.depth += 1
+                if self.depth == 1:
+                    self.root = elem
+                elif self.depth == 2 and _local_name(elem.tag) == 'tag':
+                    self.tag = elem
+                    self.metadata = {k: v for k, v in elem.attrib.items() if k in models.ERISColumnData.metadata_fields}
+                    self.chunk = None
+                continue
+
+            self.depth -= 1
+            if self.metadata is None:
+                continue
+
+            name = _local_name(elem.tag)
+            if self.depth == 2:
+                if name == 'data':
+                    yield from self._add_row(elem.attrib)
+                elif name in models.ERISColumnData.metadata_fields:
+                    self.metadata[name] = elem.text
+                # detach the child once read, or every row of the tag is kept until the tag closes
+                self.tag.remove(elem)
+            elif self.depth == 1:
+                yield from self._end_tag()
+                self.tag = None
+                self.root.clear()
+
+    def _add_row(self, attrib: Dict[str, str]) -> Iterator[models.ERISColumnChunk]:
+        if self.chunk is None:
+            self.chunk = models.ERISColumnChunk(self.tag_index, **self.metadata)
+        self.chunk.time.append(attrib.get('time'))
+        self.chunk.value.append(attrib.get('value'))
+        self.chunk.source.append(attrib.get('source'))
+        if len(self.chunk) >= self.chunk_size:
+            yield self.chunk
+            self.chunk = models.ERISColumnChunk(self.tag_index, **self.metadata)
+
+    def _end_tag(self) -> Iterator[models.ERISColumnChunk]:
+        chunk, metadata = self.chunk, self.metadata
+        self.chunk, self.metadata = None, None
+        if chunk is None:
+            return
+
+        for field in models.ERISColumnData.metadata_fields:
+            setattr(chunk, field, metadata.get(field))
+        chunk.last = True
+        self.tag_index += 1
+        yield chunk
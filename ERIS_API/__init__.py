@@ -1,4 +1,10 @@
 from .ERIS_API import ERISAPI
+from .ERIS_AsyncAPI import AsyncERISAPI
 from .ERIS_Parameters import ERISTag, ERISRequest
+from .ERIS_Cache import ERISSegmentCache, ERISResponseCache, ERISSyncState
+from .ERIS_Retry import ERISRetryPolicy
+from .ERIS_Concurrency import ERISConcurrencyController
+from .ERIS_Sink import ERISParquetSink
+from .ERIS_Metrics import ERISMetrics
 
-from .utils import extract_tags_from_url, json_to_tags, export_eris_response, combine_concurrent_results
+from .utils import extract_tags_from_url, json_to_tags, export_eris_response, combine_concurrent_results, combine_concurrent_results_wide
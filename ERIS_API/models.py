@@ -1,4 +1,4 @@
-from typing import Any, Optional, Union, List, Dict
+from typing import Any, Optional, Union, List, Dict, Tuple
 from unittest.mock import Base
 from pydantic import BaseModel, Field, BaseSettings
 from pydantic.validators import str_validator
@@ -10,6 +10,7 @@ class Settings(BaseSettings):
     eris_username: Optional[str] = None
     eris_token: Optional[str] = None
     eris_password: Optional[str]= None
+    eris_token_path: Optional[str] = None
 
 
 def empty_to_none(v: str) -> Optional[str]:
@@ -85,3 +86,66 @@ class RawERISTag(BaseModel):
 
 class RawERISResponse(BaseModel):
     tags: List[RawERISTag] = Field(alias='tag')
+
+
+def row_columns(row: Union[Dict[str, Any], List[Any]]) -> Tuple[Any, Any, Any]:
+    """time, value and source of a response row. Compact rows may be a list of [time, value(, source)] instead of an object."""
+    if isinstance(row, dict):
+        return row.get('time'), row.get('value'), row.get('source')
+    return row[0], row[1] if len(row) > 1 else None, row[2] if len(row) > 2 else None
+
+
+class ERISColumnData(object):
+    """Column based version of ERISData used by the fast parser.
+
+    Holds the same tag metadata as ERISData, but the data is stored as a list per column
+    instead of an ERISDataRow per sample.
+    """
+    metadata_fields = ['tagUID', 'name', 'description', 'engUnits', 'sampleInterval', 'samplingMode', 'provider']
+
+    def __init__(self, time: Optional[List[Any]]=None, value: Optional[List[Any]]=None, source: Optional[List[Any]]=None, eris_tag: Optional[Any]=None, **metadata) -> None:
+        for field in self.metadata_fields:
+            setattr(self, field, metadata.get(field))
+
+        self.time = [] if time is None else time
+        self.value = [] if value is None else value
+        self.source = [] if source is None else source
+        self.eris_tag = eris_tag
+
+    @classmethod
+    def from_raw(cls, raw_tag: Dict[str, Any]) -> 'ERISColumnData':
+        """Build from a decoded response tag without creating a model per row.
+
+        Rows are either objects, or lists of [time, value, source] as sent in compact mode.
+        """
+        rows = raw_tag.get('data')
+        rows = [] if rows is None else rows
+        metadata = {field: raw_tag.get(field) for field in cls.metadata_fields}
+        if len(rows) > 0 and not isinstance(rows[0], dict):
+            return cls(*[list(_) for _ in zip(*[row_columns(row) for row in rows])], **metadata)
+        return cls(
+            time=[_.get('time') for _ in rows],
+            value=[_.get('value') for _ in rows],
+            source=[_.get('source') for _ in rows],
+            **metadata
+        )
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+    def dict(self) -> Dict[str, Any]:
+        result = {field: getattr(self, field) for field in self.metadata_fields}
+        result.update({'time': self.time, 'value': self.value, 'source': self.source, 'eris_tag': self.eris_tag})
+        return result
+
+
+class ERISColumnChunk(ERISColumnData):
+    """Part of the data of a tag, produced when streaming a response.
+
+    `tag_index` is the position of the tag in the response and `last` marks the final chunk of the tag.
+    Metadata is the metadata read up to this point; the last chunk holds all of it.
+    """
+    def __init__(self, tag_index: int, last: bool=False, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.tag_index = tag_index
+        self.last = last
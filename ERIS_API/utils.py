@@ -1,13 +1,15 @@
 from ERIS_API.ERIS_Parameters import ERISRequest
-from ERIS_API.ERIS_Responses import ERISResponse
+from ERIS_API.ERIS_Responses import ERISResponse, lean_dataframe, concat_dataframes, wide_dataframe, window_end
 from urllib.parse import urlparse, unquote, parse_qs
 from .ERIS_API import ERISTag
 
-from typing import Dict, Optional
+from typing import Any, Dict, List, Optional
 from pathlib import Path
 import pandas as pd
 
+import datetime
 import json
+import logging
 
 
 def extract_tags_from_url(url):
@@ -131,7 +133,8 @@ def _save_eris_request(path: Path, eris_request: ERISRequest):
 
 
 def _save_raw_model(path: Path, request):
-    _save_json(path/'raw_model.json', request.raw_model.dict())
+    raw_model = request.raw_model.dict() if request.raw_model is not None else None
+    _save_json(path/'raw_model.json', raw_model)
 
 
 def _save_tag_data(path: Path, request: ERISResponse):
@@ -147,5 +150,97 @@ def _save_file(_path, _data):
     with open(_path, 'w') as fl:
         fl.write(_data)
 
-def combine_concurrent_results(result_set):
-    return pd.concat([_.convert_tags_to_dataframes() for _ in result_set])
\ No newline at end of file
+def combine_concurrent_results(result_set: List[ERISResponse], dedupe: Optional[bool]=None, lean: Optional[bool]=None, float32: Optional[bool]=None, index: Optional[bool]=None) -> Optional[pd.DataFrame]:
+    """Combine the results of request_api_data_concurrent to a single dataframe.
+
+    The results are put back in time order per tag rather than the order they completed in.
+    Windows are sorted by start and appended per tag, so the output is ordered by tag then time without sorting the rows.
+
+    When dedupe is True (default), the samples at the end of each window are dropped, as the next window also returns them
+    (see ERIS_Responses.window_end). The last window keeps its end. This is the same rule as iter_api_data and the sink.
+
+    Args:
+        result_set (List[ERISResponse]): results of request_api_data_concurrent
+        dedupe (bool, optional): drop rows duplicated at window boundaries. Defaults to True.
+        lean (bool, optional): use a categorical Tag, datetime64 Timestamp and nullable Value, see lean_dataframe. Defaults to False.
+        float32 (bool, optional): with lean, store numeric values as Float32. Defaults to False.
+        index (bool, optional): with lean, set Timestamp as the index. Defaults to False.
+    """
+    dedupe = True if dedupe is None else dedupe
+
+    responses = [_ for _ in result_set if isinstance(_, ERISResponse) and _.tag_data is not None]
+    if len(responses) < len(result_set):
+        logging.warning(f"{len(result_set) - len(responses)} failed results skipped")
+    responses.sort(key=lambda _: _.eris_parameters.start)
+    last_end = _last_end(responses)
+
+    tag_frames: Dict[Any, List[pd.DataFrame]] = {}
+    for response in responses:
+        end = window_end(response.eris_parameters, last_end) if dedupe else None
+        for tag in response.tag_data:
+            df = response.tag_to_dataframe(tag)
+            if df is None:
+                continue
+            label = df['Tag'].iat[0]
+            df = df if end is None else df[df['Timestamp'] < end]
+            if len(df) > 0:
+                tag_frames.setdefault(_tag_key(tag, label), []).append(df)
+
+    if len(tag_frames) == 0:
+        logging.warning("No dataframes in results")
+        return
+
+    merged = [pd.concat(frames) for frames in tag_frames.values()]
+    if not lean:
+        return pd.concat(merged)
+    return concat_dataframes([lean_dataframe(_, float32, index) for _ in merged])
+
+
+def combine_concurrent_results_wide(result_set: List[ERISResponse], align: Optional[str]=None, interval: Optional[datetime.timedelta]=None) -> Optional[pd.DataFrame]:
+    """Combine the results of request_api_data_concurrent to a Timestamp indexed dataframe with a column per tag.
+
+    The time and value columns of each tag are appended across windows in time order and the wide dataframe
+    is built from them directly (see ERIS_Responses.wide_dataframe), without making a long dataframe per window.
+    Samples repeated at window boundaries are dropped, keeping the later window's copy as with combine_concurrent_results.
+
+    Args:
+        result_set (List[ERISResponse]): results of request_api_data_concurrent
+        align (str, optional): outer, inner or interval. Defaults to outer.
+        interval (datetime.timedelta, optional): step when align is interval. Defaults to the smallest interval of the requested tags.
+    """
+    responses = [_ for _ in result_set if isinstance(_, ERISResponse) and _.tag_data is not None]
+    if len(responses) < len(result_set):
+        logging.warning(f"{len(result_set) - len(responses)} failed results skipped")
+    if len(responses) == 0:
+        logging.warning("No dataframes in results")
+        return
+    responses.sort(key=lambda _: _.eris_parameters.start)
+
+    tag_columns: Dict[Any, Any] = {}
+    for response in responses:
+        for tag in response.tag_data:
+            times, values = response.tag_columns(tag)
+            if len(times) == 0:
+                continue
+            label = response._determine_tag_label(tag)
+            label_times, label_values = tag_columns.setdefault(_tag_key(tag, label), (label, [], []))[1:]
+            label_times.extend(times)
+            label_values.extend(values)
+
+    if interval is None:
+        interval = min([_.interval() for _ in responses if _.interval() is not None], default=None)
+    return wide_dataframe(list(tag_columns.values()), align, interval, responses[0].start_time())
+
+
+def _tag_key(tag, label):
+    """Key to match the same tag across windows. Labels are not guaranteed unique so the ERISTag is used if matched."""
+    eris_tag = tag.eris_tag
+    if eris_tag is None:
+        return (label, tag.name)
+    return (label, eris_tag.tag, eris_tag.mode, eris_tag.interval)
+
+
+def _last_end(responses: List[ERISResponse]) -> Optional[datetime.datetime]:
+    """End of the last window, which is the end of the whole request"""
+    ends = [_.eris_parameters.end for _ in responses if isinstance(_.eris_parameters.end, datetime.datetime)]
+    return max(ends) if len(ends) > 0 else None
\ No newline at end of file
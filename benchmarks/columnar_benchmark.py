@@ -0,0 +1,43 @@
+"""Compare the pydantic model parser against the columnar fast parser.
+
+python -m benchmarks.columnar_benchmark --tags 20 --rows 1440
+"""
+import argparse
+import time
+
+from ERIS_API import ERISTag, ERISRequest
+from ERIS_API.ERIS_Responses import ERISResponse
+
+from benchmarks.synthetic import generate_json_bytes, SyntheticResponse
+
+
+def _run(content: bytes, request: ERISRequest, fast: bool) -> float:
+    start = time.perf_counter()
+    response = ERISResponse(SyntheticResponse(content), request, False, fast)
+    response.process_results()
+    response.convert_tags_to_dataframes()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1440)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tags = [ERISTag(f"label {i}", f"tag{i}", "average", "PT1M") for i in range(args.tags)]
+    request = ERISRequest("2021-01-01T00:00:00", "2021-01-02T00:00:00", tags)
+    content = generate_json_bytes([_.request_uuid for _ in tags], args.rows)
+
+    model_time = min(_run(content, request, False) for _ in range(args.repeat))
+    fast_time = min(_run(content, request, True) for _ in range(args.repeat))
+
+    print(f"{args.tags} tags x {args.rows} rows ({len(content)/1e6:.1f} MB)")
+    print(f"model:    {model_time:.3f}s")
+    print(f"columnar: {fast_time:.3f}s")
+    print(f"speedup:  {model_time/fast_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
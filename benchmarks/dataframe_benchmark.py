@@ -0,0 +1,34 @@
+"""Compare the memory of the default and lean dataframes.
+
+python -m benchmarks.dataframe_benchmark --tags 20 --rows 50000
+"""
+import argparse
+
+from ERIS_API import ERISTag, ERISRequest
+from ERIS_API.ERIS_Responses import ERISResponse
+
+from benchmarks.synthetic import generate_json_bytes, SyntheticResponse
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=50000)
+    args = parser.parse_args()
+
+    tags = [ERISTag(f"label {i}", f"tag{i}", "average", "PT1M") for i in range(args.tags)]
+    request = ERISRequest("2021-01-01T00:00:00", "2021-02-05T00:00:00", tags)
+    response = ERISResponse(SyntheticResponse(generate_json_bytes([_.request_uuid for _ in tags], args.rows)), request, False, True)
+    response.process_results()
+
+    total = args.tags * args.rows
+    print(f"{args.tags} tags x {args.rows} rows")
+    for name, kwargs in [("default", {}), ("lean", {"lean": True}), ("lean float32", {"lean": True, "float32": True}), ("lean index", {"lean": True, "index": True})]:
+        response.tag_dataframes = []
+        df = response.convert_tags_to_dataframes(**kwargs)
+        size = df.memory_usage(deep=True).sum()
+        print(f"{name:<13} {size / total:.1f} MB per million rows  dtypes: {', '.join(f'{k}={v}' for k, v in df.dtypes.items())}")
+
+
+if __name__ == "__main__":
+    main()
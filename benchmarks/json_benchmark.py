@@ -0,0 +1,50 @@
+"""Compare the installed JSON decoders on a synthetic /tag/data response.
+
+python -m benchmarks.json_benchmark --tags 20 --rows 1440
+"""
+import argparse
+import time
+
+from ERIS_API import ERISTag, ERISRequest
+from ERIS_API import ERIS_JSON
+from ERIS_API.ERIS_Responses import ERISResponse
+
+from benchmarks.synthetic import generate_json_bytes, SyntheticResponse
+
+
+def _decode(content: bytes, decoder: str) -> float:
+    start = time.perf_counter()
+    ERIS_JSON.loads(content, decoder)
+    return time.perf_counter() - start
+
+
+def _parse(content: bytes, request: ERISRequest, decoder: str) -> float:
+    start = time.perf_counter()
+    response = ERISResponse(SyntheticResponse(content), request, False, True, json_decoder=decoder)
+    response.process_results()
+    response.convert_tags_to_dataframes()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1440)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    tags = [ERISTag(f"label {i}", f"tag{i}", "average", "PT1M") for i in range(args.tags)]
+    request = ERISRequest("2021-01-01T00:00:00", "2021-01-02T00:00:00", tags)
+    content = generate_json_bytes([_.request_uuid for _ in tags], args.rows)
+
+    print(f"{args.tags} tags x {args.rows} rows ({len(content)/1e6:.1f} MB)")
+    baseline = None
+    for decoder in ERIS_JSON.DECODERS:
+        decode_time = min(_decode(content, decoder) for _ in range(args.repeat))
+        parse_time = min(_parse(content, request, decoder) for _ in range(args.repeat))
+        baseline = decode_time if baseline is None else baseline
+        print(f"{decoder:<7} decode: {decode_time:.3f}s ({baseline/decode_time:.1f}x)  fast parse: {parse_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Drive the client against the mock ERIS server and report throughput, latency and recovery from faults.
+
+python -m benchmarks.load_test --tags 20 --days 30 --interval PT1M --delta 1 2 7 --workers 4 8 16 --latency 0.1 --error-rate 0.05
+
+Every combination of --workers and --delta (or --target-rows) is run and reported as a row of the table, to compare settings.
+"""
+import argparse
+import asyncio
+import datetime
+import functools
+import itertools
+import time
+
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+from ERIS_API import ERISAPI, AsyncERISAPI, ERISRequest, ERISTag, ERISConcurrencyController, ERISRetryPolicy, combine_concurrent_results
+from ERIS_API.ERIS_AsyncAPI import aiohttp
+from ERIS_API.ERIS_Responses import ERISResponse
+
+from benchmarks.mock_server import MockERISServer, MockFaults
+
+RUNS = ['concurrent', 'iter', 'async']
+
+
+def expected_rows(request: ERISRequest, raw_interval: datetime.timedelta) -> int:
+    """Rows the mock server returns for the request, each tag at its interval including the end"""
+    period = request.end - request.start
+    return sum([int(period / _.sample_interval(raw_interval)) + 1 for _ in request.tags])
+
+
+def _timed(function: Callable, latencies: List[float]) -> Callable:
+    """Record the seconds each window takes, including retries and parsing"""
+    @functools.wraps(function)
+    def _wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            latencies.append(time.monotonic() - started)
+    return _wrapper
+
+
+def _timed_async(function: Callable, latencies: List[float]) -> Callable:
+    @functools.wraps(function)
+    async def _wrapper(*args, **kwargs):
+        started = time.monotonic()
+        try:
+            return await function(*args, **kwargs)
+        finally:
+            latencies.append(time.monotonic() - started)
+    return _wrapper
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if len(values) == 0:
+        return {"p50": None, "p90": None, "p99": None, "max": None}
+    series = pd.Series(values)
+    return {"p50": series.quantile(0.5), "p90": series.quantile(0.9), "p99": series.quantile(0.99), "max": series.max()}
+
+
+def run_load_test(api: ERISAPI, request: ERISRequest, run: Optional[str]=None, server: Optional[MockERISServer]=None, **kwargs) -> Dict[str, Any]:
+    """Request the data with one of the concurrent modes and measure it.
+
+    Args:
+        api (ERISAPI): client pointed at the server. AsyncERISAPI for the async run.
+        request (ERISRequest): request to split into windows.
+        run (str, optional): concurrent (request_api_data_concurrent), iter (iter_api_data) or async. Defaults to concurrent.
+        server (MockERISServer, optional): server, to include its request latencies, statuses and the expected rows.
+        **kwargs: passed to the request method, ie delta, target_rows, fast, stream, compact.
+    """
+    run = 'concurrent' if run is None else run
+    assert run in RUNS, f"run must be one of {', '.join(RUNS)}"
+    latencies = []
+    server_requests = 0 if server is None else len(server.latencies)
+    started = time.monotonic()
+
+    api.request_api_data = (_timed_async if run == 'async' else _timed)(api.request_api_data, latencies)
+    try:
+        if run == 'async':
+            results = asyncio.run(_run_async(api, request, **kwargs))
+        elif run == 'iter':
+            results = list(api.iter_api_data(request, output='response', **kwargs))
+        else:
+            results = api.request_api_data_concurrent(request, **kwargs)
+    finally:
+        del api.request_api_data
+    duration = time.monotonic() - started
+
+    failed = [_ for _ in results if not isinstance(_, ERISResponse) or _.tag_data is None]
+    df = combine_concurrent_results(results)
+    rows = 0 if df is None else len(df)
+
+    report = {
+        "run": run,
+        "workers": api.workers,
+        "windows": len(latencies),
+        "failed_windows": len(failed),
+        "rows": rows,
+        "seconds": duration,
+        "rows_per_second": rows / duration,
+        "mb_per_second": api.transfer.compressed_bytes / 1e6 / duration,
+        "window_latency": _percentiles(latencies),
+    }
+    if server is not None:
+        server_latencies = server.latencies[server_requests:]
+        report["server_latency"] = _percentiles(server_latencies)
+        report["server_requests"] = len(server_latencies)
+        report["statuses"] = dict(server.statuses)
+        report["missing_rows"] = expected_rows(request, server.raw_interval) - rows
+    return report
+
+
+async def _run_async(api: AsyncERISAPI, request: ERISRequest, **kwargs) -> List[ERISResponse]:
+    async with api:
+        return await api.request_api_data_concurrent(request, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", default="PT1M")
+    parser.add_argument("--mode", default="average")
+    parser.add_argument("--run", choices=RUNS, default="concurrent")
+    parser.add_argument("--workers", type=int, nargs="+", default=[8])
+    parser.add_argument("--delta", type=int, nargs="+", default=[7], help="days per window")
+    parser.add_argument("--target-rows", type=int, nargs="+", help="size windows by rows instead of --delta")
+    parser.add_argument("--adaptive", action="store_true", help="use an ERISConcurrencyController up to --workers")
+    parser.add_argument("--fast", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--compact", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--body-rate", type=int, default=None, help="bytes per second")
+    parser.add_argument("--timeout", type=int, default=None, help="client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    assert args.run != 'async' or aiohttp is not None, "aiohttp is required for the async run"
+
+    tags = [ERISTag(f"label {i}", f"tag{i}", args.mode, args.interval) for i in range(args.tags)]
+    start = datetime.datetime(2021, 1, 1)
+    request = ERISRequest(start, start + datetime.timedelta(days=args.days), tags)
+    windows = [{"target_rows": _} for _ in args.target_rows] if args.target_rows else [{"delta": _} for _ in args.delta]
+
+    reports = []
+    for workers, window in itertools.product(args.workers, windows):
+        faults = MockFaults(args.latency, args.jitter, args.error_rate, drop_rate=args.drop_rate, body_rate=args.body_rate, seed=args.seed, truncate_rate=args.truncate_rate)
+        with MockERISServer(faults=faults) as server:
+            api_class = AsyncERISAPI if args.run == 'async' else ERISAPI
+            api_kwargs = {"workers": workers, "timeout": args.timeout, "retry": ERISRetryPolicy(backoff=0.1)}
+            if args.adaptive and args.run != 'async':
+                api_kwargs["concurrency"] = ERISConcurrencyController(max_limit=workers)
+            api = api_class(server.url, "client", "user", password="pass", **api_kwargs)
+
+            kwargs = {**window, "fast": args.fast, "compact": True if args.compact else None}
+            if args.run != 'async':
+                kwargs["stream"] = args.stream
+            report = run_load_test(api, request, args.run, server, **kwargs)
+        reports.append({**window, **report})
+
+    table = pd.DataFrame([{
+        **{k: v for k, v in _.items() if not isinstance(v, dict)},
+        **{f"latency_{k}": v for k, v in _["window_latency"].items()},
+        "faults": sum([v for k, v in _["statuses"].items() if k != "200"]),
+    } for _ in reports])
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.float_format", "{:.3f}".format):
+        print(table.drop(columns=["run"]).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
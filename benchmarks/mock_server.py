@@ -0,0 +1,295 @@
+"""Local stand in for an ERIS server, to test and tune the client without touching a real ERIS.
+
+Serves /api/rest/auth/login, /api/rest/tag/data (JSON, including compact responses) and /esrm/rest/tag/data (XML)
+with synthetic data for whatever tags are requested, and can inject faults: latency, 429/5xx responses,
+slow bodies, dropped connections and bodies cut off part way.
+
+python -m benchmarks.mock_server --port 8080 --latency 0.2 --error-rate 0.05
+
+    api = ERISAPI("http://127.0.0.1:8080", "client", "user", password="pass")
+"""
+import argparse
+import datetime
+import gzip
+import http.server
+import json
+import random
+import threading
+import time
+
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+from uuid import uuid4
+
+from ERIS_API.ERIS_Parameters import interval_to_timedelta
+
+from benchmarks.synthetic import generate_json_response, response_to_xml
+
+DT_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class MockFaults(object):
+    def __init__(self, latency: Optional[float]=None, jitter: Optional[float]=None, error_rate: Optional[float]=None, error_statuses: Optional[List[int]]=None, retry_after: Optional[int]=None, drop_rate: Optional[float]=None, body_rate: Optional[int]=None, seed: Optional[int]=None, truncate_rate: Optional[float]=None) -> None:
+        """Faults injected into the tag data responses of the MockERISServer.
+
+        Args:
+            latency (float, optional): seconds before each response starts. Defaults to 0.
+            jitter (float, optional): up to this many seconds added to the latency at random. Defaults to 0.
+            error_rate (float, optional): fraction of requests answered with one of `error_statuses`. Defaults to 0.
+            error_statuses (List[int], optional): statuses of the errors, picked at random. Defaults to [429, 500, 502, 503].
+            retry_after (int, optional): Retry-After seconds sent with 429 responses. Defaults to 1.
+            drop_rate (float, optional): fraction of requests where the connection is closed without a response. Defaults to 0.
+            body_rate (int, optional): send the body at this many bytes per second. Defaults to None (as fast as possible).
+            seed (int, optional): seed of the random faults, to repeat a run. With a seed the faults of each request are drawn 
+                from the seed and the request (see MockERISServer.request_key), so are the same whatever order concurrent requests arrive in.
+                Defaults to None.
+            truncate_rate (float, optional): fraction of requests where the headers and half the body are sent before the connection is closed. Defaults to 0.
+        """
+        self.latency = 0.0 if latency is None else latency
+        self.jitter = 0.0 if jitter is None else jitter
+        self.error_rate = 0.0 if error_rate is None else error_rate
+        self.error_statuses = [429, 500, 502, 503] if error_statuses is None else error_statuses
+        self.retry_after = 1 if retry_after is None else retry_after
+        self.drop_rate = 0.0 if drop_rate is None else drop_rate
+        self.body_rate = body_rate
+        self.seed = seed
+        self.truncate_rate = 0.0 if truncate_rate is None else truncate_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self, key: Optional[str], draw):
+        """draw(rng) from a generator of the seed and key, or from the shared generator without a seed or key"""
+        if self.seed is not None and key is not None:
+            return draw(random.Random(f"{self.seed}:{key}"))
+        with self._lock:
+            return draw(self._random)
+
+    def delay(self, key: Optional[str]=None) -> float:
+        return self.latency + self._draw(f"{key}:delay" if key is not None else None, lambda _: _.uniform(0, self.jitter))
+
+    def outcome(self, key: Optional[str]=None) -> Optional[str]:
+        """'drop', 'truncate', an error status or None for a normal response"""
+        def _outcome(rng: random.Random):
+            roll = rng.random()
+            if roll < self.drop_rate:
+                return 'drop'
+            if roll < self.drop_rate + self.truncate_rate:
+                return 'truncate'
+            if roll < self.drop_rate + self.truncate_rate + self.error_rate:
+                return rng.choice(self.error_statuses)
+            return None
+        return self._draw(key, _outcome)
+
+
+class MockERISServer(object):
+    def __init__(self, host: Optional[str]=None, port: Optional[int]=None, faults: Optional[MockFaults]=None, token_lifetime: Optional[datetime.timedelta]=None, raw_interval: Optional[datetime.timedelta]=None, density: Optional[float]=None, blank: Optional[float]=None) -> None:
+        """ERIS server on a local port, running in a background thread.
+
+        Data is generated for the requested tags at their interval over the requested window, including the end.
+        Tokens from the login expire after `token_lifetime`, after which tag data requests get a 401.
+
+        Args:
+            host (str, optional): address to listen on. Defaults to 127.0.0.1.
+            port (int, optional): port to listen on. Defaults to 0 (any free port, see `url`).
+            faults (MockFaults, optional): faults to inject. Defaults to none.
+            token_lifetime (datetime.timedelta, optional): lifetime of the access tokens. Defaults to 15 minutes.
+            raw_interval (datetime.timedelta, optional): time between samples of raw mode tags. Defaults to 1 minute.
+            density (float, optional): fraction of the optional row fields in full responses. See benchmarks.synthetic.
+            blank (float, optional): fraction of blank values. See benchmarks.synthetic.
+        """
+        self.faults = MockFaults() if faults is None else faults
+        self.token_lifetime = datetime.timedelta(minutes=15) if token_lifetime is None else token_lifetime
+        self.raw_interval = datetime.timedelta(minutes=1) if raw_interval is None else raw_interval
+        self.density = density
+        self.blank = blank
+
+        self.tokens: Dict[str, datetime.datetime] = {}
+        self.statuses: Dict[str, int] = {}
+        self.latencies: List[float] = []
+        self.chunks = 0
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1" if host is None else host, 0 if port is None else port), _MockHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'MockERISServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def record(self, outcome, latency: float):
+        with self._lock:
+            self.statuses[str(outcome)] = self.statuses.get(str(outcome), 0) + 1
+            self.latencies.append(latency)
+
+    def request_key(self, path: str, query: Dict[str, List[str]]) -> str:
+        """Key of a tag data request, from its path, window and tags (without the random tag uids), and how many times it has been made"""
+        tags = ",".join([_.split(":", 1)[-1] for _ in query.get("tags", [""])[0].split(",")])
+        key = f"{path}?start={query.get('start', [''])[0]}&end={query.get('end', [''])[0]}&tags={tags}"
+        with self._lock:
+            attempt = self._attempts[key] = self._attempts.get(key, 0) + 1
+        return f"{key}#{attempt}"
+
+    def login(self) -> Dict[str, str]:
+        token = uuid4().hex
+        expires = datetime.datetime.now() + self.token_lifetime
+        with self._lock:
+            self.tokens[token] = expires
+        return {"x-access-token": token, "expires": expires.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3]}
+
+    def token_valid(self, token: Optional[str]) -> bool:
+        with self._lock:
+            expires = self.tokens.get(token)
+        return expires is not None and expires > datetime.datetime.now()
+
+    def tag_data(self, query: Dict[str, List[str]]) -> Dict:
+        """Synthetic response for the start, end and tags of the query, as generate_json_response"""
+        start = datetime.datetime.strptime(query["start"][0], DT_FORMAT)
+        end = datetime.datetime.strptime(query["end"][0], DT_FORMAT)
+
+        tags = []
+        for requested in query["tags"][0].split(","):
+            uid, tag, mode, interval = requested.split(":")
+            step = self.raw_interval if mode.lower() == "raw" else interval_to_timedelta(interval) or self.raw_interval
+            rows = int((end - start) / step) + 1 if end >= start else 0
+            tag_data = generate_json_response([uid], rows, start, step, self.density, self.blank)["tag"][0]
+            tag_data.update({"name": tag, "sampleInterval": interval, "samplingMode": f"{mode}:{interval}"})
+            for row in tag_data["data"]:
+                row["source"] = tag
+            tags.append(tag_data)
+        return {"info": [], "tag": tags}
+
+
+class _MockHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def mock(self) -> MockERISServer:
+        return self.server.mock
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if url.path != "/api/rest/auth/login":
+            return self._send(404, b"")
+        if self.headers.get("Authorization") is None:
+            return self._send_json(200, {"status": 401, "message": "No credentials"})
+        self._send_json(200, {"status": 200, "message": "", "data": self.mock.login()})
+
+    def do_GET(self):
+        started = time.monotonic()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path not in ["/api/rest/tag/data", "/esrm/rest/tag/data"]:
+            return self._send(404, b"")
+        if url.path.startswith("/api") and not self.mock.token_valid(self.headers.get("x-access-token")):
+            self.mock.record(401, time.monotonic() - started)
+            return self._send_json(401, {"status": 401, "message": "Token expired"})
+
+        key = self.mock.request_key(url.path, query)
+        time.sleep(self.mock.faults.delay(key))
+        outcome = self.mock.faults.outcome(key)
+        if outcome == 'drop':
+            self.close_connection = True
+            self.mock.record(outcome, time.monotonic() - started)
+            return
+        if outcome is not None and outcome != 'truncate':
+            headers = {"Retry-After": str(self.mock.faults.retry_after)} if outcome == 429 else {}
+            self.mock.record(outcome, time.monotonic() - started)
+            return self._send_json(outcome, {"status": outcome, "message": "Injected fault"}, headers)
+
+        try:
+            response = self.mock.tag_data(query)
+        except (KeyError, ValueError) as e:
+            self.mock.record(400, time.monotonic() - started)
+            return self._send_json(400, {"status": 400, "message": f"Bad request {e}"})
+
+        truncate = outcome == 'truncate'
+        if url.path.startswith("/esrm"):
+            self._send(200, response_to_xml(response), "application/xml", truncate=truncate)
+        else:
+            compact = query.get("compact", ["False"])[0].lower() == "true"
+            self._send(200, json.dumps(_compact(response) if compact else response).encode(), truncate=truncate)
+        self.mock.record(outcome if truncate else 200, time.monotonic() - started)
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict[str, str]]=None):
+        self._send(status, json.dumps(body).encode(), headers=headers)
+
+    def _send(self, status: int, body: bytes, content_type: Optional[str]=None, headers: Optional[Dict[str, str]]=None, truncate: Optional[bool]=None):
+        """Send a response. When truncated, the headers are for the full body but only half of it is sent before the connection is closed."""
+        if "gzip" in (self.headers.get("Accept-Encoding") or "") and len(body) > 0:
+            body = gzip.compress(body, compresslevel=1)
+            headers = {**({} if headers is None else headers), "Content-Encoding": "gzip"}
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if content_type is None else content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in ({} if headers is None else headers).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+        length = len(body) // 2 if truncate else len(body)
+        if truncate:
+            self.close_connection = True
+
+        rate = self.mock.faults.body_rate
+        chunk = max(1, length if rate is None else rate // 10)
+        for i in range(0, length, chunk):
+            self.wfile.write(body[i:min(i + chunk, length)])
+            with self.mock._lock:
+                self.mock.chunks += 1
+            if rate is not None:
+                time.sleep(chunk / rate)
+
+
+def _compact(response: Dict) -> Dict:
+    """Compact response, rows of [time, value] without the tag metadata"""
+    return {"tag": [{"tagUID": _["tagUID"], "data": [[row["time"], row["value"]] for row in _["data"]]} for _ in response["tag"]]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--body-rate", type=int, default=None, help="bytes per second")
+    parser.add_argument("--token-lifetime", type=float, default=900, help="seconds")
+    args = parser.parse_args()
+
+    faults = MockFaults(args.latency, args.jitter, args.error_rate, drop_rate=args.drop_rate, body_rate=args.body_rate, truncate_rate=args.truncate_rate)
+    server = MockERISServer(port=args.port, faults=faults, token_lifetime=datetime.timedelta(seconds=args.token_lifetime))
+    server.start()
+    print(f"Mock ERIS running on {server.url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
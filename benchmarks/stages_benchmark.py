@@ -0,0 +1,176 @@
+"""Time and measure the peak memory of each stage of ERISResponse on synthetic responses.
+
+Each stage is timed on a fresh response (the earlier stages are run first, untimed), taking the best of `--repeat` runs.
+Peak memory is measured in a separate run with tracemalloc, as tracing slows the stage down.
+
+Results are saved as json to compare against later, ie between releases:
+
+python -m benchmarks.stages_benchmark --tags 20 --rows 1440 --save benchmarks/results/1.5.1.json
+python -m benchmarks.stages_benchmark --tags 20 --rows 1440 --compare benchmarks/results/1.5.1.json
+
+With --compare the exit code is 1 if any stage is slower or uses more memory than the threshold.
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from ERIS_API import ERISTag, ERISRequest
+from ERIS_API.ERIS_Responses import ERISResponse
+
+from benchmarks.synthetic import generate_json_bytes, generate_xml_bytes, SyntheticResponse
+
+
+def _stages(is_xml: bool) -> List[Tuple[str, Callable[[ERISResponse], None]]]:
+    """Stages in the order ERISResponse.process_results runs them, followed by the dataframe conversion"""
+    stages = [("parse_data", lambda _: _.parse_data())]
+    if is_xml:
+        stages.append(("_parse_xml", lambda _: _._parse_xml(_.response_class.text)))
+    stages += [
+        ("load_model", lambda _: _.load_model(_.response_dict)),
+        ("_match_tags", lambda _: _._match_tags()),
+        ("tag_to_dataframe", lambda _: _.tag_to_dataframe(_.tag_data[0])),
+        ("convert_tags_to_dataframes", lambda _: _.convert_tags_to_dataframes()),
+    ]
+    return stages
+
+
+def _fast_stages() -> List[Tuple[str, Callable[[ERISResponse], None]]]:
+    """Stages of the columnar parser used with fast=True, run after parse_data"""
+    return [
+        ("load_columns", lambda _: _.load_columns(_.response_dict)),
+        ("fast_match_tags", lambda _: _._match_tags()),
+        ("fast_convert_tags_to_dataframes", lambda _: _.convert_tags_to_dataframes()),
+    ]
+
+
+def _prepare(content: bytes, request: ERISRequest, is_xml: bool, stages, index: int) -> ERISResponse:
+    """Fresh response with the stages before `index` run. _parse_xml is already part of parse_data so is not rerun."""
+    response = ERISResponse(SyntheticResponse(content), request, is_xml)
+    for name, stage in stages[:index]:
+        if name != "_parse_xml":
+            stage(response)
+    response.tag_dataframes = []
+    return response
+
+
+def _measure(content: bytes, request: ERISRequest, is_xml: bool, stages, repeat: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    for index, (name, stage) in enumerate(stages):
+        times = []
+        for _ in range(repeat):
+            response = _prepare(content, request, is_xml, stages, index)
+            start = time.perf_counter()
+            stage(response)
+            times.append(time.perf_counter() - start)
+
+        response = _prepare(content, request, is_xml, stages, index)
+        tracemalloc.start()
+        stage(response)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        results[name] = {"seconds": round(min(times), 6), "peak_mb": round(peak / 1e6, 3)}
+    return results
+
+
+def run(tags: int, rows: int, density: float, blank: float, repeat: int, formats: List[str]) -> Dict:
+    eris_tags = [ERISTag(f"label {i}", f"tag{i}", "average", "PT1M") for i in range(tags)]
+    request = ERISRequest("2021-01-01T00:00:00", "2021-01-02T00:00:00", eris_tags)
+    uids = [_.request_uuid for _ in eris_tags]
+
+    results = {}
+    for fmt in formats:
+        is_xml = fmt == "xml"
+        generate = generate_xml_bytes if is_xml else generate_json_bytes
+        content = generate(uids, rows, density=density, blank=blank)
+
+        stages = _stages(is_xml)
+        results[fmt] = _measure(content, request, is_xml, stages, repeat)
+        fast = _measure(content, request, is_xml, stages[:1] + _fast_stages(), repeat)
+        results[fmt].update({k: v for k, v in fast.items() if k != "parse_data"})
+        results[fmt]["size_mb"] = round(len(content) / 1e6, 3)
+
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "parameters": {"tags": tags, "rows": rows, "density": density, "blank": blank, "repeat": repeat},
+        "results": results,
+    }
+
+
+def compare(current: Dict, previous: Dict, threshold: float) -> List[str]:
+    """Stages that are slower or use more memory than the previous results by more than the threshold (ie 0.2 for 20%)"""
+    if current["parameters"] != previous["parameters"]:
+        print(f"Parameters differ from the previous results: {previous['parameters']}")
+
+    regressions = []
+    for fmt, stages in current["results"].items():
+        for name, result in stages.items():
+            before = previous["results"].get(fmt, {}).get(name)
+            if not isinstance(result, dict) or before is None:
+                continue
+            for metric in ["seconds", "peak_mb"]:
+                if before[metric] > 0 and result[metric] > before[metric] * (1 + threshold):
+                    regressions.append(f"{fmt} {name} {metric}: {before[metric]} -> {result[metric]}")
+    return regressions
+
+
+def _print(results: Dict, previous: Optional[Dict]=None):
+    params = results["parameters"]
+    print(f"{params['tags']} tags x {params['rows']} rows, density {params['density']}, blank {params['blank']}")
+    for fmt, stages in results["results"].items():
+        print(f"\n{fmt} ({stages['size_mb']} MB)")
+        for name, result in stages.items():
+            if not isinstance(result, dict):
+                continue
+            line = f"  {name:<32} {result['seconds']:>9.4f}s {result['peak_mb']:>9.1f} MB peak"
+            before = None if previous is None else previous["results"].get(fmt, {}).get(name)
+            if before is not None and before["seconds"] > 0:
+                line += f"  ({result['seconds'] / before['seconds']:.2f}x time)"
+            print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tags", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=1440)
+    parser.add_argument("--density", type=float, default=1.0, help="fraction of the optional row fields included")
+    parser.add_argument("--blank", type=float, default=0.0, help="fraction of blank values")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--format", choices=["json", "xml", "both"], default="both")
+    parser.add_argument("--save", type=Path, help="file to save the results to")
+    parser.add_argument("--compare", type=Path, help="previous results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed increase over the previous results")
+    args = parser.parse_args()
+
+    formats = ["json", "xml"] if args.format == "both" else [args.format]
+    results = run(args.tags, args.rows, args.density, args.blank, args.repeat, formats)
+
+    previous = None if args.compare is None else json.loads(args.compare.read_text())
+    _print(results, previous)
+
+    if args.save is not None:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(results, indent=2))
+        print(f"\nSaved to {args.save}")
+
+    if previous is not None:
+        regressions = compare(results, previous, args.threshold)
+        for _ in regressions:
+            print(f"REGRESSION {_}")
+        sys.exit(1 if len(regressions) > 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
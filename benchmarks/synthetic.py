@@ -0,0 +1,121 @@
+"""Synthetic ERIS responses for benchmarking"""
+import datetime
+import json
+
+from typing import Any, Dict, List, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+
+_OPTIONAL_FIELDS = {
+    "annotationText": [],
+    "valueQualifier": "EQ",
+    "initialValueQualifier": "EQ",
+    "initialValue": "",
+    "quality": 100,
+    "comments": "",
+    "flags": "",
+    "annotations": [],
+    "valid": True,
+    "limit": "",
+    "colour": "",
+    "operator": "",
+    "use": True,
+    "status": "",
+    "reviewRequired": False,
+    "reviewed": False,
+    "final": True
+}
+
+
+def _row(time: datetime.datetime, value: Any, source: str, density: float=1.0) -> Dict:
+    """Row with time, value and source, plus the first `density` fraction of the other fields ERIS returns"""
+    row = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "value": value, "source": source}
+    fields = list(_OPTIONAL_FIELDS.items())
+    row.update(fields[:round(len(fields) * density)])
+    return row
+
+
+def _value(r: int, i: int, blank: float) -> str:
+    if blank > 0 and (r * 7919 + i) % 1000 < blank * 1000:
+        return ""
+    return str(round(r * 0.25 + i, 4))
+
+
+def generate_json_response(tag_uids: List[str], rows: int, start: Optional[datetime.datetime]=None, step: Optional[datetime.timedelta]=None, density: Optional[float]=None, blank: Optional[float]=None) -> Dict:
+    """Generate a decoded /tag/data response with `rows` samples for each tag uid
+
+    Args:
+        tag_uids (List[str]): tagUID of each tag, the request_uuid of the ERISTag to match.
+        rows (int): samples per tag.
+        start (datetime.datetime, optional): time of the first sample. Defaults to 2021-01-01.
+        step (datetime.timedelta, optional): time between samples. Defaults to 1 minute.
+        density (float, optional): fraction of the optional row fields (quality, flags, etc) to include. Defaults to 1 (all).
+        blank (float, optional): fraction of blank values. Defaults to 0.
+    """
+    start = datetime.datetime(2021, 1, 1) if start is None else start
+    step = datetime.timedelta(minutes=1) if step is None else step
+    density = 1.0 if density is None else density
+    blank = 0.0 if blank is None else blank
+
+    tags = []
+    for i, uid in enumerate(tag_uids):
+        tags.append({
+            "info": [{"value": "", "type": "timer"}],
+            "tagUID": uid,
+            "name": f"name{i}",
+            "description": f"description {i}",
+            "engUnits": "m3",
+            "sampleInterval": "PT1M",
+            "samplingMode": "average:PT1M",
+            "descriptor": [],
+            "annotation": [],
+            "data": [_row(start + step * r, _value(r, i, blank), f"tag{i}", density) for r in range(rows)]
+        })
+    return {"info": [], "tag": tags}
+
+
+def generate_json_bytes(tag_uids: List[str], rows: int, **kwargs) -> bytes:
+    return json.dumps(generate_json_response(tag_uids, rows, **kwargs)).encode()
+
+
+def generate_xml_bytes(tag_uids: List[str], rows: int, **kwargs) -> bytes:
+    """Generate an ESRM tagDataset response with the same data as generate_json_response. Takes the same arguments."""
+    return response_to_xml(generate_json_response(tag_uids, rows, **kwargs))
+
+
+def response_to_xml(response: Dict) -> bytes:
+    """Convert a response from generate_json_response to the ESRM tagDataset XML"""
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+        '<tagDataset xmlns="http://www.eramosa.com/2011/eSCADAr/Tag" complete="true">'
+    ]
+    for tag in response["tag"]:
+        lines.append('    <tag provider="SYNTHETIC">')
+        for field in ["tagUID", "name", "description", "engUnits", "sampleInterval", "samplingMode"]:
+            lines.append(f'        <{field}>{escape(tag[field])}</{field}>')
+        for row in tag["data"]:
+            attributes = " ".join(f'{k}={quoteattr(_attribute(v))}' for k, v in row.items() if not isinstance(v, list))
+            lines.append(f'        <data {attributes}/>')
+        lines.append('    </tag>')
+    lines.append('</tagDataset>')
+    return "\n".join(lines).encode()
+
+
+def _attribute(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+class SyntheticResponse(object):
+    """Stand in for requests.Response holding a synthetic body"""
+    def __init__(self, content: bytes):
+        self.status_code = 200
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode()
+
+    def json(self, **kwargs):
+        return json.loads(self.content, **kwargs)
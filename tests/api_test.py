@@ -1 +1,474 @@
-# tests for the api
\ No newline at end of file
+# tests for the api
+import unittest
+from unittest.mock import MagicMock, patch
+
+import datetime
+import gzip
+import http.server
+import os
+import stat
+import tempfile
+import threading
+import time
+import concurrent.futures
+import json
+import requests
+from pathlib import Path
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag
+from ERIS_API import ERIS_Responses, models
+import ERIS_API.ERIS_API
+
+
+class TestERISAPISession(unittest.TestCase):
+    def create_api(self, **kwargs):
+        return ERISAPI("https://eris.com/", "client", "user", password="pass", **kwargs)
+
+    def test_pool_size_matches_workers(self):
+        api = self.create_api(workers=4)
+        self.assertEqual(api._adapter._pool_maxsize, 4)
+        self.assertEqual(api._adapter._pool_block, True)
+
+    def test_default_workers(self):
+        api = self.create_api()
+        self.assertEqual(api.workers, 8)
+        self.assertEqual(api._adapter._pool_maxsize, 8)
+
+    def test_session_shares_adapter(self):
+        api = self.create_api()
+        session = api.session
+        self.assertIs(session, api.session)
+        self.assertIs(session.get_adapter("https://eris.com/api/rest/tag/data"), api._adapter)
+        self.assertEqual(session.headers["Connection"], "keep-alive")
+
+    def test_session_no_keep_alive(self):
+        api = self.create_api(keep_alive=False)
+        self.assertEqual(api.session.headers["Connection"], "close")
+
+    def test_request_data_uses_session(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        with patch.object(requests.Session, 'get') as mock_get:
+            api.request_data("https://eris.com/api/rest/tag/data", {"a": "b"})
+            self.assertEqual(mock_get.call_count, 1)
+            self.assertEqual(mock_get.call_args.kwargs['headers']['x-access-token'], "abc")
+
+    def test_get_access_token_uses_session(self):
+        api = self.create_api()
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.json.return_value = {"status": 200, "data": {"x-access-token": "abc"}}
+        with patch.object(requests.Session, 'post', return_value=mock_response) as mock_post:
+            self.assertEqual(api.get_access_token(), "abc")
+            self.assertEqual(mock_post.call_count, 1)
+
+    def test_request_api_data_stream(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.iter_content.return_value = [b'{"tag": [{"tagUID": "a", "data": [{"time": "2021-01-01T00:00:00", "value": 1}]}]}']
+        request = ERISRequest("2021-01-01T00:00:00", "2021-01-02T00:00:00", ERISTag("lbl", "tag", "mode", "interval"))
+        with patch.object(requests.Session, 'get', return_value=mock_response) as mock_get:
+            result = api.request_api_data(request, stream=True)
+            self.assertEqual(mock_get.call_args.kwargs['stream'], True)
+
+        self.assertEqual(result.tag_data[0].value, [1])
+        mock_response.json.assert_not_called()
+        mock_response.close.assert_called_once()
+
+    def test_warm_up(self):
+        with patch.object(requests.Session, 'head') as mock_head:
+            self.create_api(workers=2, warm_up=4)
+            self.assertEqual(mock_head.call_count, 2)
+
+
+def token_response(token, expires):
+    mock_response = MagicMock(spec=requests.Response)
+    mock_response.status_code = 200
+    mock_response.json.return_value = {"status": 200, "data": {"x-access-token": token, "expires": expires.strftime("%Y-%m-%dT%H:%M:%S.%f")}}
+    return mock_response
+
+
+class TestAccessToken(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.token_path = Path(self.tmp.name) / "token.json"
+        self.expires = datetime.datetime.now() + datetime.timedelta(hours=1)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def create_api(self, username="user", **kwargs):
+        return ERISAPI("https://eris.com/", "client", username, password="pass", **kwargs)
+
+    def test_expiry_parsed_once(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        self.assertEqual(api._token_expires, datetime.datetime(2999,1,1))
+        api.access_token = {"x-access-token": "abc", "expires": "bad"}
+        self.assertFalse(api._current_token_valid())
+
+    def test_single_login(self):
+        api = self.create_api()
+
+        def _slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return token_response("abc", self.expires)
+
+        with patch.object(requests.Session, 'post', side_effect=_slow_post) as mock_post:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                tokens = list(executor.map(lambda _: api.get_access_token(), range(8)))
+
+        self.assertEqual(tokens, ["abc"] * 8)
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_renewed_before_expiry(self):
+        api = self.create_api(token_renewal=600)
+        api.access_token = {"x-access-token": "old", "expires": (datetime.datetime.now() + datetime.timedelta(minutes=5)).strftime("%Y-%m-%dT%H:%M:%S.%f")}
+        api._token_lifetime = datetime.timedelta(hours=1)
+        renewed = threading.Event()
+
+        def _post(*args, **kwargs):
+            renewed.set()
+            return token_response("new", self.expires)
+
+        with patch.object(requests.Session, 'post', side_effect=_post) as mock_post:
+            self.assertEqual(api.get_access_token(), "old")
+            self.assertTrue(renewed.wait(5))
+            with api._renew_lock:
+                pass
+            self.assertEqual(api.get_access_token(), "new")
+        self.assertEqual(mock_post.call_count, 1)
+
+    def test_short_token_not_renewed_every_request(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": (datetime.datetime.now() + datetime.timedelta(minutes=3)).strftime("%Y-%m-%dT%H:%M:%S.%f")}
+        self.assertAlmostEqual(api._renewal_margin().total_seconds(), 90, delta=1)
+
+        with patch.object(requests.Session, 'post') as mock_post:
+            for _ in range(10):
+                self.assertEqual(api.get_access_token(), "abc")
+        mock_post.assert_not_called()
+
+    def test_renewals_rate_limited(self):
+        api = self.create_api()
+        self.assertTrue(api._renewal_due())
+        self.assertFalse(api._renewal_due())
+        api.renewal_interval = 0
+        self.assertTrue(api._renewal_due())
+
+    def test_token_file_reused(self):
+        api = self.create_api(token_path=self.token_path)
+        with patch.object(requests.Session, 'post', return_value=token_response("abc", self.expires)):
+            api.get_access_token()
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.token_path).st_mode), 0o600)
+
+        with patch.object(requests.Session, 'post') as mock_post:
+            self.assertEqual(self.create_api(token_path=self.token_path).get_access_token(), "abc")
+            mock_post.assert_not_called()
+
+    def test_token_file_other_user(self):
+        api = self.create_api(token_path=self.token_path)
+        with patch.object(requests.Session, 'post', return_value=token_response("abc", self.expires)):
+            api.get_access_token()
+        self.assertIsNone(self.create_api("other", token_path=self.token_path).access_token)
+
+    def test_token_file_expired(self):
+        api = self.create_api(token_path=self.token_path)
+        with patch.object(requests.Session, 'post', return_value=token_response("abc", datetime.datetime.now())):
+            api.get_access_token()
+        self.assertIsNone(self.create_api(token_path=self.token_path).access_token)
+
+
+class TestProcessParsing(unittest.TestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+
+    def create_api(self):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", workers=4)
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        return api
+
+    def fixture_response(self, *args, **kwargs):
+        with open(self.json_fixture_path, 'rb') as fl:
+            content = fl.read()
+        # match the tagUIDs of the fixture to the tags of the request
+        params = args[1]
+        for uid, tag in zip(["uid1", "uid2"], params['tags'].split(",")):
+            content = content.replace(f'"{uid}"'.encode(), json.dumps(tag.split(":")[0]).encode())
+        mock_response = MagicMock(spec=requests.Response)
+        mock_response.status_code = 200
+        mock_response.content = content
+        return mock_response
+
+    def create_request(self):
+        tags = [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")]
+        return ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,7), tags)
+
+    def test_parser_executor(self):
+        api = self.create_api()
+        with patch.object(ERISAPI, 'request_data', side_effect=self.fixture_response):
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as parser:
+                result = api.request_api_data(self.create_request(), parser=parser)
+
+        df = result.convert_tags_to_dataframes()
+        self.assertEqual(df.shape, (12, 3))
+        self.assertEqual(df.Tag.unique().tolist(), ["lbl1", "lbl2"])
+
+    def test_concurrent_parse_workers(self):
+        api = self.create_api()
+        with patch.object(ERISAPI, 'request_data', side_effect=self.fixture_response):
+            results = api.request_api_data_concurrent(self.create_request(), delta=2, parse_workers=2)
+
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all([_.tag_data[0].eris_tag.label == "lbl1" for _ in results]))
+
+    def test_download_not_held_by_parse(self):
+        api = self.create_api()
+        parsed = threading.Event()
+        parse = ERIS_API.ERIS_API._parse_columns_timed
+
+        def _slow_parse(*args):
+            parsed.wait(5)
+            return parse(*args)
+
+        with patch.object(ERISAPI, 'request_data', side_effect=self.fixture_response):
+            with patch('ERIS_API.ERIS_API._parse_columns_timed', side_effect=_slow_parse):
+                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as parser:
+                    job, timed_out = api._request_window(self.create_request(), parser=parser)
+                    self.assertFalse(job.future.done())
+                    parsed.set()
+                    result = api._finish_parse(job)
+
+        self.assertFalse(timed_out)
+        self.assertEqual(result.convert_tags_to_dataframes().shape, (12, 3))
+
+    def test_parse_workers_decoder_picklable(self):
+        api = self.create_api()
+        api.json_decoder = lambda content: json.loads(content)
+        with self.assertRaises(AssertionError):
+            api.request_api_data_concurrent(self.create_request(), delta=2, parse_workers=2)
+
+    def test_process_pool(self):
+        with open(self.json_fixture_path, 'rb') as fl:
+            content = fl.read()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as parser:
+            tag_data = parser.submit(ERIS_Responses.parse_columns, content, False).result()
+        self.assertEqual([_.tagUID for _ in tag_data], ["uid1", "uid2"])
+        self.assertEqual(len(tag_data[0]), 6)
+
+
+class _GzipHandler(http.server.BaseHTTPRequestHandler):
+    body = b""
+    accept_encoding = []
+
+    def do_GET(self):
+        _GzipHandler.accept_encoding.append(self.headers.get("Accept-Encoding"))
+        content = gzip.compress(self.body)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestCompression(unittest.TestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        with open(cls.json_fixture_path, 'rb') as fl:
+            _GzipHandler.body = fl.read()
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _GzipHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        return super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.shutdown()
+        cls.server.server_close()
+        return super().tearDownClass()
+
+    def create_api(self):
+        api = ERISAPI(f"http://127.0.0.1:{self.server.server_address[1]}/", "client", "user", password="pass")
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        return api
+
+    @patch('ERIS_API.ERIS_Parameters.uuid4')
+    def create_request(self, mk):
+        mk.side_effect = ['uid1', 'uid2']
+        tags = [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")]
+        return ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,7), tags)
+
+    def test_compressed_counts(self):
+        for stream in [False, True]:
+            api = self.create_api()
+            result = api.request_api_data(self.create_request(), fast=True, stream=stream)
+
+            self.assertIn("gzip", _GzipHandler.accept_encoding[-1])
+            self.assertEqual(result.content_encoding, "gzip")
+            self.assertEqual(result.decompressed_bytes, len(_GzipHandler.body))
+            self.assertEqual(result.compressed_bytes, len(gzip.compress(_GzipHandler.body)))
+            self.assertEqual(len(result.tag_data[0]), 6)
+
+            self.assertEqual(api.transfer.requests, 1)
+            self.assertEqual(api.transfer.decompressed_bytes, len(_GzipHandler.body))
+            self.assertGreater(api.transfer.ratio, 1)
+
+    def test_stream_chunks_counted(self):
+        api = self.create_api()
+        chunks = list(api.stream_api_data(self.create_request()))
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(api.transfer.decompressed_bytes, len(_GzipHandler.body))
+
+
+class TestConcurrentPlanner(unittest.TestCase):
+    def create_api(self):
+        return ERISAPI("https://eris.com/", "client", "user", password="pass")
+
+    def create_request(self, tag_count, days=10):
+        tags = [ERISTag(f"lbl{i}", f"tag.number.{i}", "average", "P1D") for i in range(tag_count)]
+        return ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,1) + datetime.timedelta(days=days), tags)
+
+    def test_batch_max_tags(self):
+        request = self.create_request(10)
+        batches = self.create_api()._batch_tags(request, max_tags=4)
+        self.assertEqual([len(_) for _ in batches], [4, 4, 2])
+        self.assertEqual([t for b in batches for t in b], request.tags)
+
+    def test_batch_default_single(self):
+        request = self.create_request(10)
+        batches = self.create_api()._batch_tags(request)
+        self.assertEqual(len(batches), 1)
+
+    def test_batch_max_url_length(self):
+        api = self.create_api()
+        request = self.create_request(300)
+        batches = api._batch_tags(request, max_url_length=2000)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual([t for b in batches for t in b], request.tags)
+
+        for batch in batches:
+            batch_request = ERISRequest(request.start, request.end, batch)
+            prepared = requests.Request('GET', api.base_api_url + api.data_url, params=api._construct_request_parameters(batch_request)).prepare()
+            self.assertLessEqual(len(prepared.url), 2000)
+
+    def test_build_grid(self):
+        request = self.create_request(10, days=10)
+        requests_list = self.create_api()._build_concurrent_requests(request, delta=5, max_tags=5)
+        self.assertEqual(len(requests_list), 4)
+        self.assertEqual([len(_.tags) for _ in requests_list], [5, 5, 5, 5])
+        self.assertEqual(requests_list[0].start, requests_list[1].start)
+
+    def test_date_range_non_overlapping(self):
+        api = self.create_api()
+        ranges = api._generate_date_range(datetime.datetime(2021,1,1), datetime.datetime(2021,1,12), 5)
+        self.assertEqual(ranges, [
+            (datetime.datetime(2021,1,1), datetime.datetime(2021,1,6)),
+            (datetime.datetime(2021,1,6), datetime.datetime(2021,1,11)),
+            (datetime.datetime(2021,1,11), datetime.datetime(2021,1,12)),
+        ])
+
+    def test_interval_windows(self):
+        tags = [
+            ERISTag("daily", "tag.daily", "average", "P1D"),
+            ERISTag("minute 1", "tag.minute.1", "average", "PT1M"),
+            ERISTag("minute 2", "tag.minute.2", "first", "PT1M"),
+        ]
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,3,2), tags)
+        requests_list = self.create_api()._build_concurrent_requests(request, target_rows=2880)
+
+        minute_requests = [_ for _ in requests_list if _.tags[0].interval == "PT1M"]
+        daily_requests = [_ for _ in requests_list if _.tags[0].interval == "P1D"]
+
+        self.assertTrue(all(len(_.tags) == 1 for _ in daily_requests))
+        self.assertTrue(all(len(_.tags) == 2 for _ in minute_requests))
+        self.assertEqual(len(daily_requests), 1)
+        self.assertEqual(len(minute_requests), 60)
+        self.assertEqual(minute_requests[0].end - minute_requests[0].start, datetime.timedelta(days=1))
+        self.assertEqual(minute_requests[-1].end, request.end)
+
+    def test_interval_windows_raw(self):
+        api = self.create_api()
+        api.raw_interval = datetime.timedelta(seconds=10)
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,2), [ERISTag("raw", "tag", "raw", "PT1M")])
+        requests_list = api._build_concurrent_requests(request, target_rows=360)
+        self.assertEqual(len(requests_list), 24)
+
+    def test_auto_compact(self):
+        api = self.create_api()
+        api.compact_rows = 100
+        self.assertEqual(api._use_compact(self.create_request(5, days=10)), None)
+        self.assertEqual(api._use_compact(self.create_request(20, days=10)), True)
+
+        request = self.create_request(20, days=10)
+        request.compact = False
+        self.assertEqual(api._use_compact(request), False)
+
+    def test_concurrent_compact(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        api.compact_rows = 100
+        requested = []
+        with patch.object(ERISAPI, 'request_api_data', side_effect=lambda request, *args, **kwargs: requested.append(request)):
+            api.request_api_data_concurrent(self.create_request(20, days=10), delta=5)
+            api.request_api_data_concurrent(self.create_request(20, days=10), delta=5, compact='auto')
+            api.request_api_data_concurrent(self.create_request(2, days=10), delta=5, compact='auto')
+            api.request_api_data_concurrent(self.create_request(20, days=10), delta=5, compact=False)
+
+        self.assertEqual([_.compact for _ in requested], [None, None, True, True, None, None, False, False])
+
+    def test_concurrent_progress_logged(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+
+        def _request(request, *args, **kwargs):
+            if request.start == datetime.datetime(2021,1,1):
+                raise ValueError("bad window")
+            return request
+
+        with patch.object(ERISAPI, 'request_api_data', side_effect=_request):
+            with self.assertLogs(level='INFO') as logs:
+                results = api.request_api_data_concurrent(self.create_request(2, days=10), delta=5)
+
+        self.assertEqual(len(results), 1)
+        self.assertIn("ERROR:root:Request from 2021-01-01 00:00:00 to 2021-01-06 00:00:00 generated an exception: bad window", logs.output)
+        self.assertIn("INFO:root:Requests Completed: 1 of 2", logs.output)
+        self.assertEqual(api.metrics.snapshot()["counters"]["errors"], {"ValueError": 1})
+
+    def test_metadata_from_full_responses(self):
+        api = self.create_api()
+        request = self.create_request(1)
+        tag = models.ERISColumnData(time=["2021-01-01T00:00:00"], value=[1], source=[""], tagUID=request.tags[0].request_uuid, name="name0", engUnits="m3")
+        api._update_metadata(ERIS_Responses.ERISResponse.from_columns(request, [tag]))
+
+        compact_request = self.create_request(1)
+        compact_request.compact = True
+        response = ERIS_Responses.ERISResponse.from_columns(compact_request, [models.ERISColumnData(time=["2021-01-01T00:00:00"], value=[1])])
+        api._update_metadata(response)
+        self.assertEqual(response.tag_data[0].engUnits, "m3")
+        self.assertEqual(response.tag_data[0].name, "name0")
+
+    def test_metadata_per_interval(self):
+        api = self.create_api()
+        daily = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,2), [ERISTag("lbl", "tag1", "average", "P1D")])
+        tag = models.ERISColumnData(time=["2021-01-01T00:00:00"], value=[1], source=[""], tagUID=daily.tags[0].request_uuid, name="tag1", sampleInterval="P1D", samplingMode="average:P1D")
+        api._update_metadata(ERIS_Responses.ERISResponse.from_columns(daily, [tag]))
+
+        raw = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,2), [ERISTag("lbl", "tag1", "raw", "PT1M")], compact=True)
+        response = ERIS_Responses.ERISResponse.from_columns(raw, [models.ERISColumnData(time=["2021-01-01T00:00:00"], value=[1])])
+        api._update_metadata(response)
+        self.assertEqual(response.tag_data[0].sampleInterval, "PT1M")
+        self.assertEqual(response.tag_data[0].samplingMode, "raw")
+
+
+if __name__ == "__main__":
+    unittest.main()
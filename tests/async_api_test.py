@@ -0,0 +1,153 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+from uuid import UUID
+
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ERIS_API.ERIS_Parameters import ERISRequest, ERISTag
+from ERIS_API import ERIS_AsyncAPI, ERIS_Responses
+
+
+@unittest.skipIf(ERIS_AsyncAPI.aiohttp is None, "aiohttp not installed")
+class TestAsyncERISAPI(unittest.IsolatedAsyncioTestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+
+    def create_api(self, **kwargs):
+        return ERIS_AsyncAPI.AsyncERISAPI("https://eris.com/", "client", "user", password="pass", **kwargs)
+
+    @patch('ERIS_API.ERIS_Parameters.uuid4')
+    def create_valid_params(self, mk):
+        mk.side_effect = ['uid1', 'uid2']
+        return [
+            ERISTag(label="lbl1", tag="tag1", mode="m", interval='i'),
+            ERISTag(label="lbl2", tag="tag2", mode="m", interval='i')
+        ]
+
+    def create_fixture_response(self):
+        with open(self.json_fixture_path, 'rb') as fl:
+            content = fl.read()
+        return ERIS_AsyncAPI._AsyncResponse(200, content, {}, "https://eris.com/api/rest/tag/data")
+
+    def test_auth_headers(self):
+        api = self.create_api()
+        self.assertTrue(api._auth_headers()["Authorization"].startswith("Basic "))
+
+    def test_clean_params(self):
+        api = self.create_api()
+        self.assertEqual(api._clean_params({"compact": True, "tags": "a"}), {"compact": "True", "tags": "a"})
+
+    async def test_request_api_data(self):
+        api = self.create_api()
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,7), self.create_valid_params())
+        with patch.object(ERIS_AsyncAPI.AsyncERISAPI, 'request_data', return_value=self.create_fixture_response()):
+            result = await api.request_api_data(request)
+
+        self.assertIsInstance(result, ERIS_Responses.ERISResponse)
+        self.assertEqual(len(result.tag_data), 2)
+        self.assertEqual(result.tag_data[0].eris_tag.request_uuid, 'uid1')
+        self.assertEqual(result.convert_tags_to_dataframes().shape, (12, 3))
+
+    async def test_concurrent_bounded_by_workers(self):
+        api = self.create_api(workers=2)
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,11), self.create_valid_params())
+
+        in_flight = []
+        peak = []
+
+        async def _request(request_parameters, **kwargs):
+            in_flight.append(request_parameters)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(request_parameters)
+            return request_parameters
+
+        with patch.object(ERIS_AsyncAPI.AsyncERISAPI, 'request_api_data', side_effect=_request):
+            with self.assertLogs(level='INFO') as logs:
+                results = await api.request_api_data_concurrent(request, delta=1)
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(max(peak), 2)
+        self.assertIn("Requests Completed: 10 of 10", logs.output[-1])
+
+    async def test_renewed_before_expiry(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "old", "expires": (datetime.now() + timedelta(minutes=3)).strftime("%Y-%m-%dT%H:%M:%S.%f")}
+        api._token_lifetime = timedelta(hours=1)
+
+        with patch.object(ERIS_AsyncAPI.AsyncERISAPI, '_login', new_callable=AsyncMock) as mock_login:
+            self.assertEqual(await api.get_access_token(), "old")
+            self.assertEqual(await api.get_access_token(), "old")
+            await api._renewal_task
+        mock_login.assert_called_once()
+
+    async def test_token_rejected(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "revoked", "expires": "2999-01-01T00:00:00.000"}
+        api._login = AsyncMock(return_value="new")
+        api._get = AsyncMock(side_effect=[ERIS_AsyncAPI._AsyncResponse(401, b"", {}, ""), self.create_fixture_response()])
+        result = await api.request_data("https://eris.com/api/rest/tag/data")
+
+        self.assertEqual(result.status_code, 200)
+        api._login.assert_awaited_once()
+        self.assertEqual(api._get.await_args.kwargs["headers"]["x-access-token"], "new")
+
+    async def test_sync_methods_not_available(self):
+        api = self.create_api()
+        for method in ['iter_api_data', 'sync', 'stream_api_data', 'stream_esrm_data']:
+            self.assertFalse(hasattr(api, method))
+        with self.assertRaises((AttributeError, TypeError)):
+            with api:
+                pass
+
+    async def test_concurrent_rejects_sync_options(self):
+        api = self.create_api()
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,7), self.create_valid_params())
+        for option in [{"stream": True}, {"sink": MagicMock()}, {"parse_workers": 2}]:
+            with self.assertRaises(TypeError):
+                await api.request_api_data_concurrent(request, delta=1, **option)
+
+    async def test_concurrent_target_bytes(self):
+        api = self.create_api()
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,3), self.create_valid_params())
+
+        async def _request(request_parameters, **kwargs):
+            return request_parameters
+
+        with patch.object(ERIS_AsyncAPI.AsyncERISAPI, 'request_api_data', side_effect=_request):
+            results = await api.request_api_data_concurrent(request, target_bytes=api.row_bytes * 1440, compact=True)
+
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all([_.compact for _ in results]))
+
+    async def test_parsed_off_the_loop(self):
+        api = self.create_api()
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,7), self.create_valid_params())
+        threads = []
+        process_results = ERIS_Responses.ERISResponse.process_results
+
+        def _process_results(response):
+            threads.append(threading.current_thread())
+            return process_results(response)
+
+        with patch.object(ERIS_AsyncAPI.AsyncERISAPI, 'request_data', return_value=self.create_fixture_response()):
+            with patch.object(ERIS_Responses.ERISResponse, 'process_results', _process_results):
+                result = await api.request_api_data(request)
+
+        self.assertEqual(len(result.tag_data), 2)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.current_thread())
+        self.assertIn(threads[0], api.executor._threads)
+
+        executor = api.executor
+        await api.close()
+        self.assertTrue(executor._shutdown)
+        self.assertIsNone(api._executor)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,373 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import sqlite3
+import tempfile
+import threading
+import concurrent.futures
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag, ERISSegmentCache, ERISResponseCache, ERISSyncState
+from ERIS_API import ERIS_Responses, models
+from ERIS_API.ERIS_Cache import to_epoch
+
+
+def daily_columns(start, end, tagUID=None, name=None):
+    days = (end - start).days
+    times = [(start + timedelta(days=d)).strftime("%Y-%m-%dT%H:%M:%S") for d in range(days + 1)]
+    return models.ERISColumnData(time=times, value=[str(d) for d in range(len(times))], source=[""] * len(times), tagUID=tagUID, name=name, engUnits="m3")
+
+
+class TestERISSegmentCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ERISSegmentCache(self.tmp.name)
+        self.key = "url|tag|mode|P1D"
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def test_path_directory(self):
+        self.assertEqual(self.cache.path, Path(self.tmp.name) / "eris_cache.sqlite")
+
+    def test_missing_empty(self):
+        start, end = datetime(2021,1,1), datetime(2021,2,1)
+        self.assertEqual(self.cache.missing_ranges(self.key, start, end), [(start, end)])
+
+    def test_missing_gaps(self):
+        self.cache.store(self.key, datetime(2021,1,5), datetime(2021,1,10), daily_columns(datetime(2021,1,5), datetime(2021,1,10)))
+        self.cache.store(self.key, datetime(2021,1,15), datetime(2021,1,20), daily_columns(datetime(2021,1,15), datetime(2021,1,20)))
+
+        missing = self.cache.missing_ranges(self.key, datetime(2021,1,1), datetime(2021,1,31))
+        self.assertEqual(missing, [
+            (datetime(2021,1,1), datetime(2021,1,5)),
+            (datetime(2021,1,10), datetime(2021,1,15)),
+            (datetime(2021,1,20), datetime(2021,1,31)),
+        ])
+        self.assertEqual(self.cache.missing_ranges(self.key, datetime(2021,1,6), datetime(2021,1,9)), [])
+
+    def test_segments_merged(self):
+        for start, end in [(datetime(2021,1,1), datetime(2021,1,5)), (datetime(2021,1,10), datetime(2021,1,12)), (datetime(2021,1,5), datetime(2021,1,10))]:
+            self.cache.store(self.key, start, end, daily_columns(start, end))
+
+        self.assertEqual(self.cache._segments(self.key), [(to_epoch(datetime(2021,1,1)), to_epoch(datetime(2021,1,12)))])
+
+    def test_empty_tag_not_covered(self):
+        start, end = datetime(2021,1,1), datetime(2021,1,10)
+        self.cache.store(self.key, start, end, models.ERISColumnData(name="name1"))
+        self.assertEqual(self.cache.missing_ranges(self.key, start, end), [(start, end)])
+
+    def test_times_normalised(self):
+        times = ["2021-01-01T00:00:00.000", "2021-01-02T00:00:00Z", "2021-01-03T01:00:00+01:00", "2021-01-04T00:00:00.500"]
+        tag = models.ERISColumnData(time=times, value=["1", "2", "3", "4"], source=[""] * 4)
+        self.cache.store(self.key, datetime(2021,1,1), datetime(2021,1,5), tag)
+
+        self.assertEqual(self.cache.load(self.key, datetime(2021,1,1), datetime(2021,1,3)).time, times[:3])
+        self.assertEqual(self.cache.load(self.key, datetime(2021,1,2), datetime(2021,1,4,0,0,1)).value, ["2", "3", "4"])
+        self.assertEqual(self.cache.missing_ranges(self.key, datetime(2021,1,1), datetime(2021,1,6)), [(datetime(2021,1,5), datetime(2021,1,6))])
+
+    def test_text_cache_dropped(self):
+        path = Path(self.tmp.name) / "old.sqlite"
+        connection = sqlite3.connect(str(path))
+        with connection:
+            connection.execute("CREATE TABLE segments (key TEXT NOT NULL, start TEXT NOT NULL, end TEXT NOT NULL)")
+            connection.execute("INSERT INTO segments VALUES (?, ?, ?)", (self.key, "2021-01-01T00:00:00", "2021-01-10T00:00:00"))
+        connection.close()
+
+        cache = ERISSegmentCache(path)
+        self.assertEqual(len(cache.missing_ranges(self.key, datetime(2021,1,1), datetime(2021,1,10))), 1)
+        cache.close()
+
+    def test_future_not_covered(self):
+        start = datetime.now().replace(microsecond=0) - timedelta(days=1)
+        end = start + timedelta(days=3)
+        self.cache.store(self.key, start, end, daily_columns(start, start))
+        missing = self.cache.missing_ranges(self.key, start, end)
+        self.assertEqual(len(missing), 1)
+        self.assertEqual(missing[0][1], end)
+
+    def test_load(self):
+        self.cache.store(self.key, datetime(2021,1,1), datetime(2021,1,10), daily_columns(datetime(2021,1,1), datetime(2021,1,10), name="name1"))
+        data = self.cache.load(self.key, datetime(2021,1,3), datetime(2021,1,5))
+        self.assertEqual(data.time, ["2021-01-03T00:00:00", "2021-01-04T00:00:00", "2021-01-05T00:00:00"])
+        self.assertEqual(data.value, ["2", "3", "4"])
+        self.assertEqual(data.name, "name1")
+        self.assertEqual(data.engUnits, "m3")
+
+    def test_clear(self):
+        self.cache.store(self.key, datetime(2021,1,1), datetime(2021,1,10), daily_columns(datetime(2021,1,1), datetime(2021,1,10)))
+        self.cache.clear()
+        self.assertEqual(len(self.cache.load(self.key, datetime(2021,1,1), datetime(2021,1,10))), 0)
+
+
+class TestCachedRequests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ERISSegmentCache(self.tmp.name)
+        self.api = ERISAPI("https://eris.com/", "client", "user", password="pass", cache=self.cache)
+        self.requested = []
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def _fake_request(self, request_parameters, fast=None, stream=None, **kwargs):
+        self.requested.append((request_parameters.start, request_parameters.end, [_.tag for _ in request_parameters.tags]))
+        tag_data = [
+            daily_columns(request_parameters.start, request_parameters.end, _.request_uuid, _.tag)
+            for _ in request_parameters.tags
+        ]
+        return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+    def create_request(self, start, end, tags=None):
+        tags = [ERISTag("lbl1", "tag1", "average", "P1D")] if tags is None else tags
+        return ERISRequest(start, end, tags)
+
+    def test_only_missing_requested(self):
+        with patch.object(ERISAPI, '_request_api_data', side_effect=self._fake_request):
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10)))
+            result = self.api.request_api_data(self.create_request(datetime(2021,1,5), datetime(2021,1,20)))
+
+        self.assertEqual(self.requested, [
+            (datetime(2021,1,1), datetime(2021,1,10), ["tag1"]),
+            (datetime(2021,1,10), datetime(2021,1,20), ["tag1"]),
+        ])
+        df = result.convert_tags_to_dataframes()
+        self.assertEqual(df.shape, (16, 3))
+        self.assertEqual(df.Tag.values[0], "lbl1")
+        self.assertTrue(df.Timestamp.is_unique)
+
+    def test_fully_cached(self):
+        with patch.object(ERISAPI, '_request_api_data', side_effect=self._fake_request):
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10)))
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10)))
+        self.assertEqual(len(self.requested), 1)
+
+    def test_tags_grouped_by_missing(self):
+        tags = [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")]
+        with patch.object(ERISAPI, '_request_api_data', side_effect=self._fake_request):
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10), tags[:1]))
+            result = self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10), tags))
+
+        self.assertEqual(self.requested[-1], (datetime(2021,1,1), datetime(2021,1,10), ["tag2"]))
+        self.assertEqual([_.eris_tag.label for _ in result.tag_data], ["lbl1", "lbl2"])
+
+    def test_failed_request_not_cached(self):
+        with patch.object(ERISAPI, '_request_api_data', return_value=None):
+            result = self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10)))
+        self.assertIsNone(result)
+        key = self.cache.tag_key(self.api.base_url, ERISTag("lbl1", "tag1", "average", "P1D"))
+        self.assertEqual(len(self.cache.missing_ranges(key, datetime(2021,1,1), datetime(2021,1,10))), 1)
+
+    def test_failed_tags_not_cached(self):
+        tags = [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")]
+
+        def _request(request_parameters, fast=None, stream=None, **kwargs):
+            result = self._fake_request(request_parameters)
+            result.response_dict = {'info': [{'type': 'exception', 'key': request_parameters.tags[1].request_uuid}]}
+            return result
+
+        with patch.object(ERISAPI, '_request_api_data', side_effect=_request):
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10), tags))
+        with patch.object(ERISAPI, '_request_api_data', side_effect=self._fake_request):
+            self.api.request_api_data(self.create_request(datetime(2021,1,1), datetime(2021,1,10), tags))
+
+        self.assertEqual(self.requested[-1], (datetime(2021,1,1), datetime(2021,1,10), ["tag2"]))
+
+    def test_string_times_not_cached(self):
+        with patch.object(ERISAPI, '_request_api_data', return_value=None) as mock_request:
+            self.api.request_api_data(self.create_request("2021-01-01T00:00:00", "P1D"))
+            self.assertEqual(mock_request.call_args.args[0].end, "P1D")
+
+
+class TestERISResponseCache(unittest.TestCase):
+    def test_request_key_strips_uuid(self):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass")
+        request_1 = ERISRequest(datetime(2021,1,1), datetime(2021,1,2), [ERISTag("a", "tag1", "average", "P1D")])
+        request_2 = ERISRequest(datetime(2021,1,1), datetime(2021,1,2), [ERISTag("b", "tag1", "average", "P1D")])
+        request_3 = ERISRequest(datetime(2021,1,1), datetime(2021,1,2), [ERISTag("a", "tag2", "average", "P1D")])
+        key = lambda _: ERISResponseCache.request_key("uri", api._construct_request_parameters(_))
+
+        self.assertEqual(key(request_1), key(request_2))
+        self.assertNotEqual(key(request_1), key(request_3))
+        self.assertNotIn(request_1.tags[0].request_uuid, str(key(request_1)))
+
+    def test_lru_eviction(self):
+        cache = ERISResponseCache(max_entries=2)
+        for key in ["a", "b"]:
+            cache.get_or_request(key, lambda: key)
+        cache.get_or_request("a", lambda: "new")
+        cache.get_or_request("c", lambda: "c")
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get_or_request("a", lambda: "new"), "a")
+        self.assertEqual(cache.get_or_request("b", lambda: "new"), "new")
+
+    def test_ttl(self):
+        cache = ERISResponseCache(ttl=10)
+        with patch('ERIS_API.ERIS_Cache.time.monotonic', return_value=100):
+            cache.get_or_request("a", lambda: "a")
+            self.assertEqual(cache.get_or_request("a", lambda: "new"), "a")
+        with patch('ERIS_API.ERIS_Cache.time.monotonic', return_value=111):
+            self.assertEqual(cache.get_or_request("a", lambda: "new"), "new")
+
+    def test_max_bytes(self):
+        cache = ERISResponseCache(max_bytes=450)
+        response = ERIS_Responses.ERISResponse.from_columns(ERISRequest("s", "e", []), [daily_columns(datetime(2021,1,1), datetime(2021,1,1))])
+        for key in ["a", "b", "c"]:
+            cache.get_or_request(key, lambda: response)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.total_bytes, 400)
+
+    def test_body_not_kept(self):
+        cache = ERISResponseCache()
+        request = ERISRequest(datetime(2021,1,1), datetime(2021,1,5), [ERISTag("a", "tag1", "average", "P1D")])
+        response = ERIS_Responses.ERISResponse.from_columns(request, [daily_columns(request.start, request.end, request.tags[0].request_uuid)])
+        response.response_class = MagicMock(content=b"x" * 10**6)
+        response.response_dict = {"tag": []}
+
+        self.assertIs(cache.get_or_request("a", lambda: response), response)
+        cached = cache.get_or_request("a", lambda: None)
+        self.assertIsNone(cached.response_class)
+        self.assertIsNone(cached.response_dict)
+        self.assertIs(cached.tag_data, response.tag_data)
+        self.assertEqual(cache.total_bytes, 5 * ERISResponseCache.column_row_bytes)
+        self.assertIsNotNone(response.response_class)
+
+    def test_not_cacheable(self):
+        cache = ERISResponseCache()
+        cache.get_or_request("a", lambda: None, lambda _: _ is not None)
+        self.assertEqual(len(cache), 0)
+
+    def test_in_flight_coalesced(self):
+        cache = ERISResponseCache()
+        release = threading.Event()
+        calls = []
+
+        def _request():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(cache.get_or_request, "a", _request) for _ in range(4)]
+            while len(cache._in_flight) == 0:
+                pass
+            release.set()
+            results = [_.result() for _ in futures]
+
+        self.assertEqual(results, ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_in_flight_error_shared(self):
+        cache = ERISResponseCache()
+        with self.assertRaises(ValueError):
+            cache.get_or_request("a", lambda: (_ for _ in ()).throw(ValueError("failed")))
+        self.assertEqual(len(cache._in_flight), 0)
+
+    def test_api_rebinds_labels(self):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", response_cache=ERISResponseCache())
+        calls = []
+
+        def _fake_request(request_parameters, fast=None, stream=None, **kwargs):
+            calls.append(request_parameters)
+            tag_data = [daily_columns(request_parameters.start, request_parameters.end, _.request_uuid, _.tag) for _ in request_parameters.tags]
+            return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+        request_1 = ERISRequest(datetime(2021,1,1), datetime(2021,1,5), [ERISTag("first", "tag1", "average", "P1D")])
+        request_2 = ERISRequest(datetime(2021,1,1), datetime(2021,1,5), [ERISTag("second", "tag1", "average", "P1D")])
+        with patch.object(ERISAPI, '_request_api_data', side_effect=_fake_request):
+            result_1 = api.request_api_data(request_1)
+            result_2 = api.request_api_data(request_2)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(result_1.convert_tags_to_dataframes().Tag.values[0], "first")
+        self.assertEqual(result_2.convert_tags_to_dataframes().Tag.values[0], "second")
+        self.assertEqual(result_2.tag_data[0].tagUID, request_2.tags[0].request_uuid)
+        self.assertEqual(len(result_1.tag_dataframes), 1)
+
+
+class TestSync(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ERISSyncState(self.tmp.name)
+        self.api = ERISAPI("https://eris.com/", "client", "user", password="pass")
+        self.tags = [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")]
+        self.requested = []
+        self.last_day = datetime(2021,1,10)
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.store.close()
+        self.tmp.cleanup()
+        return super().tearDown()
+
+    def _fake_request(self, request_parameters, fast=None, stream=None, **kwargs):
+        self.requested.append((request_parameters.start, [_.tag for _ in request_parameters.tags]))
+        tag_data = [
+            daily_columns(min(request_parameters.start, self.last_day).replace(second=0), self.last_day, _.request_uuid, _.tag)
+            for _ in request_parameters.tags
+        ]
+        return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+    def sync(self, tags=None, **kwargs):
+        with patch.object(ERISAPI, '_request_api_data', side_effect=self._fake_request):
+            return self.api.sync(self.tags if tags is None else tags, self.store, **kwargs)
+
+    def test_start_required(self):
+        with self.assertRaises(AssertionError):
+            self.sync()
+
+    def test_watermarks(self):
+        self.sync(start=datetime(2021,1,1))
+        key = self.store.tag_key(self.api.base_url, self.tags[0])
+        self.assertEqual(self.store.watermark(key), datetime(2021,1,10))
+
+        self.last_day = datetime(2021,1,12)
+        results = self.sync()
+        self.assertEqual(self.requested, [
+            (datetime(2021,1,1), ["tag1", "tag2"]),
+            (datetime(2021,1,10,0,0,1), ["tag1", "tag2"]),
+        ])
+        self.assertEqual(self.store.watermark(key), datetime(2021,1,12))
+        self.assertEqual(results[0].convert_tags_to_dataframes().Tag.unique().tolist(), ["lbl1", "lbl2"])
+
+    def test_look_back(self):
+        self.sync(start=datetime(2021,1,1))
+        self.sync(look_back=timedelta(days=2))
+        self.assertEqual(self.requested[-1], (datetime(2021,1,8), ["tag1", "tag2"]))
+
+    def test_new_tags_grouped(self):
+        self.sync(self.tags[:1], start=datetime(2021,1,1))
+        self.sync(start=datetime(2021,1,5))
+        self.assertEqual(self.requested[1:], [
+            (datetime(2021,1,5), ["tag2"]),
+            (datetime(2021,1,10,0,0,1), ["tag1"]),
+        ])
+
+    def test_failed_not_updated(self):
+        with patch.object(ERISAPI, '_request_api_data', return_value=None):
+            self.api.sync(self.tags, self.store, start=datetime(2021,1,1))
+        self.assertIsNone(self.store.watermark(self.store.tag_key(self.api.base_url, self.tags[0])))
+
+    def test_update_forward_only(self):
+        self.store.update("key", datetime(2021,1,5))
+        self.store.update("key", datetime(2021,1,3))
+        self.assertEqual(self.store.watermark("key"), datetime(2021,1,5))
+        self.store.clear("key")
+        self.assertIsNone(self.store.watermark("key"))
+
+    def test_last_time_model(self):
+        data = models.ERISData(data=[{"time": "2021-01-02T00:00:00", "source": "", "value": 1}, {"time": "2021-01-01T00:00:00", "source": "", "value": 2}])
+        self.assertEqual(self.store.last_time(data), datetime(2021,1,2))
+        self.assertIsNone(self.store.last_time(models.ERISColumnData()))
+
+
+if __name__ == "__main__":
+    unittest.main()
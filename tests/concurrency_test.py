@@ -0,0 +1,161 @@
+import unittest
+from unittest.mock import patch
+
+import datetime
+import threading
+import time
+
+import pandas as pd
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag, ERISConcurrencyController
+from ERIS_API import ERIS_Responses, models
+
+
+class TestERISConcurrencyController(unittest.TestCase):
+    def test_additive_increase(self):
+        controller = ERISConcurrencyController(initial=2, max_limit=4)
+        for _ in range(2):
+            controller.record(1.0)
+        self.assertEqual(controller.limit, 3)
+        for _ in range(3):
+            controller.record(1.0)
+        self.assertEqual(controller.limit, 4)
+        for _ in range(10):
+            controller.record(1.0)
+        self.assertEqual(controller.limit, 4)
+
+    def test_multiplicative_decrease(self):
+        controller = ERISConcurrencyController(initial=8, min_limit=2)
+        controller.record(1.0, overloaded=True)
+        self.assertEqual(controller.limit, 4)
+        controller._last_decrease = None
+        controller.record(1.0, overloaded=True)
+        controller._last_decrease = None
+        controller.record(1.0, overloaded=True)
+        self.assertEqual(controller.limit, 2)
+
+    def test_decrease_cooldown(self):
+        controller = ERISConcurrencyController(initial=8)
+        controller.record(10.0)
+        controller.record(10.0, overloaded=True)
+        controller.record(10.0, overloaded=True)
+        self.assertEqual(controller.limit, 4)
+
+    def test_latency_rise(self):
+        controller = ERISConcurrencyController(initial=8)
+        controller.record(1.0)
+        controller.record(1.5)
+        self.assertEqual(controller.limit, 8)
+        controller.record(5.0)
+        self.assertEqual(controller.limit, 4)
+
+    def test_acquire_waits_for_limit(self):
+        controller = ERISConcurrencyController(initial=1)
+        acquired = threading.Event()
+
+        def _acquire():
+            with controller:
+                acquired.set()
+
+        with controller:
+            thread = threading.Thread(target=_acquire)
+            thread.start()
+            self.assertFalse(acquired.wait(0.05))
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+        self.assertEqual(controller.in_flight, 0)
+
+    def test_max_limit_from_workers(self):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", workers=6, concurrency=ERISConcurrencyController(initial=10))
+        self.assertEqual(api.concurrency.max_limit, 6)
+        self.assertEqual(api.concurrency.limit, 6)
+
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", concurrency=ERISConcurrencyController(max_limit=16))
+        self.assertEqual(api.workers, 16)
+
+
+class TestAdaptiveConcurrentRequests(unittest.TestCase):
+    def test_in_flight_limited(self):
+        controller = ERISConcurrencyController(initial=2, max_limit=2)
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", workers=8, concurrency=controller)
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def _fake_request(request_parameters, fast=None, stream=None, **kwargs):
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+            tag_data = [models.ERISColumnData(time=[], value=[], source=[], tagUID=_.request_uuid) for _ in request_parameters.tags]
+            return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,11), [ERISTag("lbl", "tag", "average", "P1D")])
+        with patch.object(ERISAPI, 'request_api_data', side_effect=_fake_request):
+            results = api.request_api_data_concurrent(request, delta=1)
+
+        self.assertEqual(len(results), 10)
+        self.assertEqual(max(peak), 2)
+
+
+
+class TestIterApiData(unittest.TestCase):
+    def setUp(self) -> None:
+        self.api = ERISAPI("https://eris.com/", "client", "user", password="pass", workers=4)
+        self.api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        self.request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,21), [ERISTag("lbl1", "tag1", "average", "P1D"), ERISTag("lbl2", "tag2", "average", "P1D")])
+        self.lock = threading.Lock()
+        self.requested = []
+
+    def _fake_request(self, request_parameters, fast=None, stream=None, **kwargs):
+        with self.lock:
+            self.requested.append(request_parameters.start)
+        # later windows complete first
+        time.sleep(0.002 * (datetime.datetime(2021,1,21) - request_parameters.start).days)
+        days = (request_parameters.end - request_parameters.start).days
+        times = [(request_parameters.start + datetime.timedelta(days=d)).strftime("%Y-%m-%dT%H:%M:%S") for d in range(days + 1)]
+        tag_data = [models.ERISColumnData(time=times, value=["1"] * len(times), source=[""] * len(times), tagUID=_.request_uuid) for _ in request_parameters.tags]
+        return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+    def test_ordered_dataframes(self):
+        with patch.object(ERISAPI, 'request_api_data', side_effect=self._fake_request):
+            frames = list(self.api.iter_api_data(self.request, delta=2, ordered=True))
+
+        self.assertEqual(len(frames), 10)
+        self.assertEqual([_.Timestamp.min() for _ in frames], [pd.Timestamp(2021,1,d) for d in range(1, 21, 2)])
+        df = pd.concat(frames)
+        self.assertEqual(len(df), 2 * 21)
+        for _, tag_df in df.groupby('Tag'):
+            self.assertTrue(tag_df.Timestamp.is_monotonic_increasing)
+            self.assertTrue(tag_df.Timestamp.is_unique)
+
+    def test_backpressure(self):
+        yielded = 0
+        with patch.object(ERISAPI, 'request_api_data', side_effect=self._fake_request):
+            for _ in self.api.iter_api_data(self.request, delta=1, max_pending=3, output='response'):
+                time.sleep(0.01)
+                yielded += 1
+                with self.lock:
+                    self.assertLessEqual(len(self.requested) - yielded, 3)
+        self.assertEqual(yielded, 20)
+
+    def test_per_tag_columns(self):
+        with patch.object(ERISAPI, 'request_api_data', side_effect=self._fake_request):
+            columns = list(self.api.iter_api_data(self.request, delta=10, output='columns', per_tag=True))
+        self.assertEqual(len(columns), 4)
+        self.assertTrue(all([isinstance(_, models.ERISColumnData) for _ in columns]))
+        self.assertEqual(sorted([_.eris_tag.label for _ in columns]), ['lbl1', 'lbl1', 'lbl2', 'lbl2'])
+
+    def test_close_early(self):
+        with patch.object(ERISAPI, 'request_api_data', side_effect=self._fake_request):
+            windows = self.api.iter_api_data(self.request, delta=1, max_pending=2)
+            next(windows)
+            windows.close()
+        self.assertLess(len(self.requested), 20)
+
+if __name__ == "__main__":
+    unittest.main()
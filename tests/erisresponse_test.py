@@ -4,8 +4,9 @@ from unittest.mock import MagicMock, patch
 from ERIS_API.ERIS_Parameters import ERISRequest, ERISTag
 from ERIS_API import utils
 from ERIS_API import ERIS_Responses
+from benchmarks import synthetic
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import requests
 from pathlib import Path
@@ -17,6 +18,8 @@ from pathlib import Path
 
 import logging
 
+import pandas as pd
+
 class ERISResponse(unittest.TestCase):
     json_fixture_path = Path("./tests/fixtures/json_response.json")
     json_error_fixture_path = Path("./tests/fixtures/json_response_error_one_tag.json")
@@ -68,14 +71,14 @@ class ERISResponse(unittest.TestCase):
             tags=tags
         )
 
-    def setup_ERIS_Response(self, fixture_data, is_xml):
+    def setup_ERIS_Response(self, fixture_data, is_xml, fast=None):
         fixture_data = self.load_json(fixture_data) if not is_xml else self.load_xml(fixture_data)
         mock_response = self.request_response_json(fixture_data) if not is_xml else self.request_response_xml(fixture_data)
         
         tags = self.create_valid_params()
         eris_r = self.create_valid_request(tags)
 
-        return ERIS_Responses.ERISResponse(mock_response, eris_r, is_xml)
+        return ERIS_Responses.ERISResponse(mock_response, eris_r, is_xml, fast)
 
     def test_json_match_tags(self):
         er_class = self.setup_ERIS_Response(self.json_fixture_path, False)
@@ -208,6 +211,167 @@ class ERISResponse(unittest.TestCase):
             self.assertEqual(er_class.raw_model, None)
             self.assertEqual(er_class.tag_data, None)
 
+    def test_fast_json_process(self):
+        data_class = self.setup_ERIS_Response(self.json_fixture_path, False, True)
+        res = data_class.process_results()
+
+        self.assertEqual(len(res), 2)
+        self.assertEqual(data_class.raw_model, None)
+        self.assertEqual(res[0].eris_tag.request_uuid, 'uid1')
+        self.assertEqual(res[0].name, 'name1')
+        self.assertEqual(res[0].engUnits, 'm3')
+        self.assertEqual(len(res[0]), 6)
+        self.assertEqual(res[0].time[0], '2021-01-01T00:00:00')
+
+    def test_fast_matches_model_dataframe(self):
+        for fixture, is_xml in [(self.json_fixture_path, False), (self.xml_two_tags, True), (self.json_blank_value, False)]:
+            model_class = self.setup_ERIS_Response(fixture, is_xml)
+            model_class.process_results()
+            fast_class = self.setup_ERIS_Response(fixture, is_xml, True)
+            fast_class.process_results()
+
+            model_df = model_class.convert_tags_to_dataframes()
+            fast_df = fast_class.convert_tags_to_dataframes()
+            pd.testing.assert_frame_equal(model_df, fast_df, check_dtype=False)
+
+    def test_parse_columns_matches_fast(self):
+        for fixture, is_xml in [(self.json_fixture_path, False), (self.xml_two_tags, True)]:
+            fast_class = self.setup_ERIS_Response(fixture, is_xml, True)
+            fast_class.process_results()
+
+            with open(fixture, 'rb') as fl:
+                tag_data = ERIS_Responses.parse_columns(fl.read(), is_xml)
+            parsed_class = ERIS_Responses.ERISResponse.from_columns(fast_class.eris_parameters, tag_data, is_xml)
+
+            pd.testing.assert_frame_equal(fast_class.convert_tags_to_dataframes(), parsed_class.convert_tags_to_dataframes())
+
+    def test_compact_rows(self):
+        data = {"tag": [
+            {"data": [["2021-01-01T00:00:00", "1"], ["2021-01-02T00:00:00", "2"]]},
+            {"data": [{"time": "2021-01-01T00:00:00", "value": "3"}]},
+        ]}
+        request = self.create_valid_request(self.create_valid_params())
+        request.compact = True
+        er_class = ERIS_Responses.ERISResponse(self.request_response_json(data), request, False)
+        er_class.process_results()
+
+        self.assertEqual(er_class.fast, True)
+        self.assertEqual(er_class.tag_data[0].value, ["1", "2"])
+        self.assertEqual(er_class.tag_data[0].source, [None, None])
+        self.assertEqual([_.tagUID for _ in er_class.tag_data], ['uid1', 'uid2'])
+
+        er_class.attach_metadata({("tag2", "m", "i"): {"engUnits": "m3", "name": "name2"}, ("tag1", "raw", "i"): {"name": "other"}})
+        self.assertEqual(er_class.tag_data[0].name, "tag1")
+        self.assertEqual(er_class.tag_data[0].samplingMode, "m")
+        self.assertEqual(er_class.tag_data[1].name, "name2")
+        self.assertEqual(er_class.tag_data[1].engUnits, "m3")
+
+        df = er_class.convert_tags_to_dataframes()
+        self.assertEqual(df.Tag.tolist(), ['lbl1', 'lbl1', 'lbl2'])
+
+    def test_lean_dataframe(self):
+        for fast in [False, True]:
+            er_class = self.setup_ERIS_Response(self.json_blank_value, False, fast)
+            er_class.process_results()
+            default_df = er_class.convert_tags_to_dataframes()
+            er_class.tag_dataframes = []
+            df = er_class.convert_tags_to_dataframes(lean=True)
+
+            self.assertEqual(df.Tag.dtype, 'category')
+            self.assertEqual(list(df.Tag.cat.categories), ['lbl1', 'lbl2'])
+            self.assertEqual(df.Timestamp.dtype, 'datetime64[ns]')
+            self.assertIn(str(df.Value.dtype), ['Float64', 'Int64'])
+            self.assertEqual(df.Value.isna().sum(), default_df.Value.isna().sum())
+            self.assertEqual(df.Value.astype(float).fillna(-1).tolist(), default_df.Value.astype(float).fillna(-1).tolist())
+
+    def test_lean_dataframe_options(self):
+        df = pd.DataFrame({'Timestamp': ['2021-01-01T00:00:00', '2021-01-01T00:01:00'], 'Tag': 'lbl1', 'Value': [1, None]})
+        lean_df = ERIS_Responses.lean_dataframe(df, float32=True, index=True)
+        self.assertEqual(lean_df.index.name, 'Timestamp')
+        self.assertEqual(lean_df.Value.dtype, 'Float32')
+        self.assertTrue(pd.isna(lean_df.Value.iloc[1]))
+
+        df = pd.DataFrame({'Timestamp': ['2021-01-01T00:00:00', '2021-01-01T00:01:00'], 'Tag': 'lbl1', 'Value': [1, 2]})
+        self.assertEqual(ERIS_Responses.lean_dataframe(df).Value.dtype, 'Int64')
+
+        df = pd.DataFrame({'Timestamp': ['2021-01-01T00:00:00', '2021-01-01T00:01:00'], 'Tag': 'lbl1', 'Value': ['Open', 'Closed']})
+        self.assertEqual(ERIS_Responses.lean_dataframe(df).Value.dtype, 'category')
+
+    def test_wide_dataframe(self):
+        for fast in [False, True]:
+            er_class = self.setup_ERIS_Response(self.json_fixture_path, False, fast)
+            er_class.process_results()
+            long_df = er_class.convert_tags_to_dataframes()
+            expected = long_df.pivot(index='Timestamp', columns='Tag', values='Value').rename_axis(columns=None)
+
+            df = er_class.convert_tags_to_wide()
+            pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+    def test_wide_alignment(self):
+        columns = [
+            ('a', ['2021-01-01T00:00:00', '2021-01-01T00:15:00', '2021-01-01T00:30:00'], ['1', '2', '3']),
+            ('b', ['2021-01-01T00:00:05', '2021-01-01T00:29:55', '2021-01-01T00:30:00'], ['4', '5', '']),
+        ]
+        outer = ERIS_Responses.wide_dataframe(columns)
+        self.assertEqual(outer.shape, (5, 2))
+        self.assertEqual(ERIS_Responses.wide_dataframe(columns, 'inner').index.tolist(), [pd.Timestamp('2021-01-01T00:30:00')])
+
+        snapped = ERIS_Responses.wide_dataframe(columns, 'interval', timedelta(minutes=15))
+        self.assertEqual(snapped.index.tolist(), list(pd.date_range('2021-01-01T00:00:00', periods=3, freq='15min')))
+        self.assertEqual(snapped.a.tolist(), [1, 2, 3])
+        self.assertEqual(snapped.b.iloc[0], 4)
+        self.assertTrue(pd.isna(snapped.b.iloc[1]))
+        self.assertTrue(pd.isna(snapped.b.iloc[2]))
+
+        with self.assertRaises(AssertionError):
+            ERIS_Responses.wide_dataframe(columns, 'left')
+        with self.assertRaises(AssertionError):
+            ERIS_Responses.wide_dataframe(columns, 'interval')
+        self.assertIsNone(ERIS_Responses.wide_dataframe([]))
+
+    def test_synthetic_json_matches_xml(self):
+        tags = [ERISTag(f"lbl{i}", f"tag{i}", "average", "PT1M") for i in range(3)]
+        request = ERISRequest("2021-01-01T00:00:00", "2021-01-02T00:00:00", tags)
+        uids = [_.request_uuid for _ in tags]
+
+        frames = []
+        for content, is_xml in [(synthetic.generate_json_bytes(uids, 200, density=0.5, blank=0.1), False), (synthetic.generate_xml_bytes(uids, 200, density=0.5, blank=0.1), True)]:
+            for fast in [False, True]:
+                er_class = ERIS_Responses.ERISResponse(synthetic.SyntheticResponse(content), request, is_xml, fast)
+                er_class.process_results()
+                frames.append(er_class.convert_tags_to_dataframes())
+
+        self.assertEqual(frames[0].shape, (600, 3))
+        self.assertGreater(frames[0].Value.isna().sum(), 0)
+        for df in frames[1:]:
+            pd.testing.assert_frame_equal(frames[0], df, check_dtype=False)
+
+    def test_tag_metadata(self):
+        er_class = self.setup_ERIS_Response(self.json_fixture_path, False, True)
+        er_class.process_results()
+        metadata = er_class.tag_metadata()
+        self.assertEqual(metadata[('tag1', 'm', 'i')]['name'], 'name1')
+        self.assertEqual(metadata[('tag1', 'm', 'i')]['engUnits'], 'm3')
+        self.assertNotIn('tagUID', metadata[('tag1', 'm', 'i')])
+
+    def test_fast_all_tags_to_dataframe_one_error(self):
+        er_class = self.setup_ERIS_Response(self.json_error_fixture_path, False, True)
+        er_class.process_results()
+        df = er_class.convert_tags_to_dataframes()
+
+        self.assertEqual(df.shape, (6,3))
+        self.assertEqual(df.Tag.values[0], 'lbl1')
+
+    def test_failed_tags(self):
+        for path, is_xml, expected in [
+            (self.json_fixture_path, False, set()),
+            (self.json_error_fixture_path, False, {"key2"}),
+            (self.xml_two_tags_one_error, True, {"6b6845c4b57a4f7c8e587554e1062d53"}),
+        ]:
+            er_class = self.setup_ERIS_Response(path, is_xml, True)
+            er_class.process_results()
+            self.assertEqual(er_class.failed_tags(), expected)
+
     def test_save_eris_request(self):
         er_class = self.setup_ERIS_Response(self.json_fixture_path, False)
         er_res = er_class.process_results()
@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import MagicMock
+
+import json
+import math
+from pathlib import Path
+
+import requests
+
+from ERIS_API import ERIS_JSON, ERIS_Responses
+from ERIS_API import ERISRequest, ERISTag
+
+
+class TestJSONDecoders(unittest.TestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+
+    def test_default_fastest(self):
+        fastest = next(_ for _ in ['orjson', 'ujson', 'json'] if _ in ERIS_JSON.DECODERS)
+        self.assertIs(ERIS_JSON.get_decoder(), ERIS_JSON.DECODERS[fastest])
+
+    def test_named_and_callable(self):
+        self.assertIs(ERIS_JSON.get_decoder('json'), json.loads)
+        decoder = lambda _: {"tag": []}
+        self.assertIs(ERIS_JSON.get_decoder(decoder), decoder)
+        with self.assertRaises(AssertionError):
+            ERIS_JSON.get_decoder('simdjson')
+
+    def test_decoders_match(self):
+        with open(self.json_fixture_path, 'rb') as fl:
+            content = fl.read()
+        expected = json.loads(content)
+        for name in ERIS_JSON.DECODERS:
+            self.assertEqual(ERIS_JSON.loads(content, name), expected)
+
+    def test_fallback(self):
+        def _failing(content):
+            raise ValueError("not supported")
+        self.assertTrue(math.isnan(ERIS_JSON.loads(b'{"a": NaN}', _failing)['a']))
+
+        with self.assertRaises(json.JSONDecodeError):
+            ERIS_JSON.loads(b'{"a": ', 'json')
+
+    def test_response_uses_decoder(self):
+        with open(self.json_fixture_path, 'rb') as fl:
+            content = fl.read()
+        mk = MagicMock(spec=requests.Response)
+        mk.content = content
+        decoder = MagicMock(side_effect=json.loads)
+
+        request = ERISRequest("2021-01-01T00:00:00", "2021-01-07T00:00:00", [ERISTag("lbl1", "tag1", "m", "i")])
+        response = ERIS_Responses.ERISResponse(mk, request, False, True, json_decoder=decoder)
+        response.process_results()
+
+        decoder.assert_called_once_with(content)
+        mk.json.assert_not_called()
+        self.assertEqual(len(response.tag_data), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+
+import datetime
+
+from ERIS_API import ERISAPI, ERISMetrics, ERISRequest, ERISTag, ERISRetryPolicy, combine_concurrent_results
+from benchmarks.mock_server import MockERISServer, MockFaults
+
+
+class TestERISMetrics(unittest.TestCase):
+    def test_histogram(self):
+        metrics = ERISMetrics(buckets=[0.1, 1, 10])
+        for seconds in [0.05, 0.5, 0.5, 20]:
+            metrics.observe('decode', seconds)
+
+        stage = metrics.snapshot()["stages"]["decode"]
+        self.assertEqual(stage["count"], 4)
+        self.assertAlmostEqual(stage["sum"], 21.05)
+        self.assertEqual(stage["buckets"], {0.1: 1, 1: 3, 10: 3})
+
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()["stages"], {})
+
+    def test_counters_and_callbacks(self):
+        metrics = ERISMetrics()
+        events = []
+        metrics.add_callback(lambda event, data: events.append(event))
+        metrics.add_callback(lambda event, data: 1 / 0)
+
+        metrics.record_attempt(503)
+        metrics.record_retry("url", "status 503", 1, 0.5)
+        metrics.record_attempt(200)
+        metrics.record_response("url", 200, {"ttfb": 0.2, "decode": 0.1}, 100, 1000, 50, 2)
+        metrics.record_error(AssertionError("Failed to reach API"))
+
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["http_requests"], {"503": 1, "200": 1})
+        self.assertEqual(counters["retries"], {"status 503": 1})
+        self.assertEqual(counters["errors"], {"AssertionError": 1})
+        self.assertEqual((counters["compressed_bytes"], counters["decompressed_bytes"], counters["rows"]), (100, 1000, 50))
+        self.assertEqual(events, ["retry", "request", "error"])
+
+    def test_prometheus(self):
+        metrics = ERISMetrics(buckets=[0.1, 1])
+        metrics.record_attempt(200)
+        metrics.record_retry("url", 'quote " reason', 1, 0.5)
+        metrics.observe('decode', 0.5)
+        metrics.observe('auth', 0.01)
+        text = metrics.to_prometheus(prefix="test")
+
+        self.assertIn('# TYPE test_http_requests_total counter\ntest_http_requests_total{status="200"} 1\n', text)
+        self.assertIn('test_retries_total{reason="quote \\" reason"} 1', text)
+        self.assertIn('test_logins_total 0', text)
+        self.assertIn('# TYPE test_stage_seconds histogram', text)
+        self.assertIn('test_stage_seconds_bucket{stage="decode",le="0.1"} 0\ntest_stage_seconds_bucket{stage="decode",le="1"} 1\ntest_stage_seconds_bucket{stage="decode",le="+Inf"} 1', text)
+        self.assertIn('test_stage_seconds_sum{stage="decode"} 0.5\ntest_stage_seconds_count{stage="decode"} 1', text)
+        self.assertLess(text.index('stage="auth"'), text.index('stage="decode"'))
+
+
+class TestAPIMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tags = [ERISTag("lbl1", "tag1", "average", "PT1H"), ERISTag("lbl2", "tag2", "raw", "PT1H")]
+        self.request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,5), self.tags)
+
+    def create_api(self, server, **kwargs):
+        return ERISAPI(server.url, "client", "user", password="pass", retry=ERISRetryPolicy(backoff=0.001, jitter=False, max_retries=10), **kwargs)
+
+    def test_request_stages(self):
+        events = []
+        with MockERISServer() as server:
+            api = self.create_api(server)
+            api.metrics.add_callback(lambda event, data: events.append((event, data)))
+            first = api.request_api_data(self.request)
+            second = api.request_api_data(self.request, fast=True)
+            second.convert_tags_to_dataframes()
+
+        self.assertEqual([_[0] for _ in events], ["login", "request", "request", "dataframe", "dataframe"])
+        request = events[1][1]
+        self.assertEqual(request["status"], 200)
+        self.assertEqual(request["rows"], 97 + 5761)
+        self.assertEqual(request["tags"], 2)
+        self.assertEqual(set(request["stages"]), {'auth', 'connect', 'ttfb', 'download', 'decode', 'model'})
+        # the connection opened by the login is reused
+        self.assertEqual(first.timings['connect'], 0)
+        self.assertEqual(second.timings['connect'], 0)
+        self.assertIn('dataframe', second.timings)
+        self.assertEqual(sum([_[1]["rows"] for _ in events[3:]]), 97 + 5761)
+
+        snapshot = api.metrics.snapshot()
+        self.assertEqual(snapshot["counters"]["logins"], 1)
+        self.assertEqual(snapshot["counters"]["responses"], 2)
+        self.assertEqual(snapshot["counters"]["compressed_bytes"], api.transfer.compressed_bytes)
+        self.assertEqual(snapshot["stages"]["decode"]["count"], 2)
+
+    def test_connect(self):
+        with MockERISServer() as server:
+            api = self.create_api(server, keep_alive=False)
+            result = api.request_api_data(self.request, fast=True)
+
+        self.assertGreater(result.timings['connect'], 0)
+        self.assertGreater(result.timings['ttfb'], 0)
+
+    def test_retries_and_errors(self):
+        faults = MockFaults(error_rate=0.3, error_statuses=[503], seed=0)
+        with MockERISServer(faults=faults) as server:
+            metrics = ERISMetrics()
+            api = self.create_api(server, workers=2, metrics=metrics)
+            results = api.request_api_data_concurrent(self.request, delta=1, fast=True)
+            combine_concurrent_results(results)
+
+            api.retry = ERISRetryPolicy(max_retries=0)
+            server.faults = MockFaults(error_rate=1, error_statuses=[500])
+            api.request_api_data(self.request)
+
+        counters = metrics.snapshot()["counters"]
+        self.assertEqual(counters["http_requests"]["503"], server.statuses["503"])
+        self.assertEqual(counters["retries"]["status 503"], server.statuses["503"])
+        self.assertEqual(counters["http_requests"]["500"], 1)
+        self.assertEqual(counters["errors"], {"AssertionError": 1})
+        self.assertIn("backoff", metrics.snapshot()["stages"])
+        self.assertEqual(metrics.snapshot()["stages"]["dataframe"]["count"], 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
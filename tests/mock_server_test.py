@@ -0,0 +1,126 @@
+import unittest
+
+import datetime
+import math
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag, ERISRetryPolicy, combine_concurrent_results
+from benchmarks.load_test import run_load_test
+from benchmarks.mock_server import MockERISServer, MockFaults
+
+
+class TestMockERISServer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tags = [ERISTag("lbl1", "tag1", "average", "PT1H"), ERISTag("lbl2", "tag2", "raw", "PT1H")]
+        self.request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,5), self.tags)
+
+    def create_api(self, server, **kwargs):
+        return ERISAPI(server.url, "client", "user", password="pass", retry=ERISRetryPolicy(backoff=0.001, jitter=False, max_retries=10), **kwargs)
+
+    def test_login_and_expiry(self):
+        with MockERISServer() as server:
+            api = self.create_api(server)
+            token = api.get_access_token()
+            self.assertTrue(server.token_valid(token))
+            self.assertTrue(api._current_token_valid())
+
+            result = api.request_api_data(self.request, fast=True)
+            self.assertEqual(len(result.tag_data[0]), 97)
+            self.assertEqual(len(result.tag_data[1]), 4 * 1440 + 1)
+            self.assertEqual(result.tag_data[0].name, "tag1")
+
+            server.tokens[token] = datetime.datetime.now()
+            result = api.request_api_data(self.request, fast=True)
+            self.assertEqual(len(result.tag_data[0]), 97)
+            self.assertEqual(server.statuses["401"], 1)
+            self.assertNotEqual(api.get_access_token(), token)
+
+            server.tokens.clear()
+            api.get_access_token = lambda **kwargs: token
+            self.assertEqual(api.request_api_data(self.request, fast=True).status_code, 401)
+            self.assertEqual(server.statuses["401"], 3)
+
+    def test_streams_retried(self):
+        faults = MockFaults(error_rate=0.5, error_statuses=[503], seed=5)
+        with MockERISServer(faults=faults) as server:
+            api = self.create_api(server)
+            token = api.get_access_token()
+            server.tokens.clear()
+            api_chunks = list(api.stream_api_data(self.request))
+            self.assertEqual(server.statuses, {"401": 1, "503": 2, "200": 1})
+            esrm_chunks = list(api.stream_esrm_data(self.request))
+            self.assertEqual(server.statuses, {"401": 1, "503": 4, "200": 2})
+
+        self.assertNotEqual(api.get_access_token(), token)
+        for chunks in [api_chunks, esrm_chunks]:
+            self.assertEqual(sum([len(_) for _ in chunks]), 97 + 5761)
+
+        counters = api.metrics.snapshot()["counters"]
+        self.assertEqual(counters["retries"]["status 503"], server.statuses["503"])
+        self.assertEqual(counters["responses"], 2)
+        self.assertEqual(counters["rows"], 2 * (97 + 5761))
+        self.assertEqual(api.metrics.snapshot()["stages"]["decode"]["count"], 2)
+
+    def test_esrm_and_compact(self):
+        with MockERISServer() as server:
+            api = self.create_api(server)
+            xml_result = api.request_esrm_data(self.request)
+            request = ERISRequest(self.request.start, self.request.end, self.tags, compact=True)
+            compact_result = api.request_api_data(request)
+
+            self.assertEqual(xml_result.convert_tags_to_dataframes().shape, (97 + 5761, 3))
+            pd_compact = compact_result.convert_tags_to_dataframes()
+            self.assertEqual(pd_compact.shape, (97 + 5761, 3))
+            self.assertEqual(compact_result.content_encoding, "gzip")
+
+    def test_faults_recovered(self):
+        faults = MockFaults(error_rate=0.3, error_statuses=[500, 503], drop_rate=0.2, seed=0)
+        with MockERISServer(faults=faults) as server:
+            api = self.create_api(server, workers=4)
+            results = api.request_api_data_concurrent(self.request, delta=1, fast=True)
+
+        self.assertEqual(len(combine_concurrent_results(results)), 97 + 5761)
+        self.assertGreater(sum([v for k, v in server.statuses.items() if k != "200"]), 0)
+        self.assertEqual(server.statuses, {"200": 4, "503": 1, "drop": 1})
+
+    def test_truncated_body_retried(self):
+        with MockERISServer(faults=MockFaults(truncate_rate=0.5, seed=5)) as server:
+            api = self.create_api(server)
+            api_result = api.request_api_data(self.request, fast=True)
+            esrm_result = api.request_esrm_data(self.request, fast=True)
+
+            api.retry = ERISRetryPolicy(max_retries=0)
+            server.faults = MockFaults(truncate_rate=1)
+            self.assertIsNone(api.request_api_data(self.request))
+
+        self.assertEqual(server.statuses, {"truncate": 5, "200": 2})
+        self.assertEqual(api_result.row_count(), 97 + 5761)
+        self.assertEqual(esrm_result.row_count(), 97 + 5761)
+        self.assertEqual(api.metrics.snapshot()["counters"]["http_requests"]["ChunkedEncodingError"], 5)
+
+    def test_slow_body(self):
+        with MockERISServer(faults=MockFaults(body_rate=20000)) as server:
+            api = self.create_api(server)
+            api.get_access_token()
+            chunks = server.chunks
+            result = api.request_esrm_data(self.request, stream=True)
+
+        self.assertEqual(len(result.tag_data), 2)
+        self.assertEqual(server.chunks - chunks, math.ceil(result.compressed_bytes / 2000))
+        self.assertGreater(server.chunks - chunks, 10)
+
+    def test_load_test_report(self):
+        with MockERISServer(faults=MockFaults(error_rate=0.2, error_statuses=[502], seed=1)) as server:
+            api = self.create_api(server, workers=2)
+            report = run_load_test(api, self.request, 'iter', server, delta=1, fast=True)
+
+        self.assertEqual(report["windows"], 4)
+        self.assertEqual(report["failed_windows"], 0)
+        self.assertEqual(report["missing_rows"], 0)
+        self.assertEqual(report["rows"], 97 + 5761)
+        self.assertEqual(report["server_requests"], 6)
+        self.assertIsNotNone(report["window_latency"]["p90"])
+        self.assertNotIn("request_api_data", vars(api))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,6 +4,7 @@ import unittest
 from unittest.mock import MagicMock, patch
 from uuid import UUID
 from ERIS_API.ERIS_Parameters import ERISRequest, ERISTag
+from datetime import timedelta
 
 class TestERISTag(unittest.TestCase):
     _norm_uuid = MagicMock(return_value=UUID('f2a8f445-45f9-4608-a9a3-5c1fa9fcbe7b'))
@@ -92,6 +93,19 @@ class TestERISTag(unittest.TestCase):
         self.assertEqual(_valid, dict(_tag))
 
 
+    def test_sample_interval(self):
+        self.assertEqual(ERISTag(tag="t", mode="average", interval="PT15M").sample_interval(), timedelta(minutes=15))
+        self.assertEqual(ERISTag(tag="t", mode="first", interval="P1D").sample_interval(), timedelta(days=1))
+        self.assertEqual(ERISTag(tag="t", mode="first", interval="P1DT12H").sample_interval(), timedelta(days=1, hours=12))
+        self.assertEqual(ERISTag(tag="t", mode="first", interval="P2M").sample_interval(), timedelta(days=60))
+
+    def test_sample_interval_raw(self):
+        raw = timedelta(seconds=30)
+        self.assertEqual(ERISTag(tag="t", mode="raw", interval="P1D").sample_interval(raw), raw)
+        self.assertEqual(ERISTag(tag="t", mode="first", interval="interval").sample_interval(raw), raw)
+        self.assertEqual(ERISTag(tag="t", mode="first", interval="interval").sample_interval(), None)
+
+
 class TestERISRequest(unittest.TestCase):
     def create_eris_tag(self):
         return ERIS_API.ERISTag("lbl", "tag","mode","interval")
@@ -0,0 +1,129 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import datetime
+import requests
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag, ERISRetryPolicy
+from ERIS_API import ERIS_Responses, models
+
+
+def mock_response(status_code, headers=None):
+    response = MagicMock(spec=requests.Response)
+    response.status_code = status_code
+    response.headers = {} if headers is None else headers
+    return response
+
+
+class TestERISRetryPolicy(unittest.TestCase):
+    def test_backoff(self):
+        policy = ERISRetryPolicy(backoff=1, max_backoff=5, jitter=False)
+        self.assertEqual([policy.retry_delay(_, 503) for _ in range(3)], [1, 2, 4])
+        self.assertEqual(policy.retry_delay(3, 503), None)
+
+        policy = ERISRetryPolicy(backoff=1, max_backoff=5, max_retries=10, jitter=False)
+        self.assertEqual(policy.retry_delay(5, 503), 5)
+
+    def test_jitter(self):
+        policy = ERISRetryPolicy(backoff=4)
+        for _ in range(20):
+            self.assertTrue(0 <= policy.retry_delay(1, 500) <= 8)
+
+    def test_statuses(self):
+        policy = ERISRetryPolicy(jitter=False)
+        self.assertEqual(policy.retry_delay(0, 404), None)
+        self.assertEqual(policy.retry_delay(0, 200), None)
+        self.assertEqual(policy.retry_delay(0, 502), 1)
+        self.assertEqual(policy.retry_delay(0), 1)
+
+    def test_429_retry_after(self):
+        policy = ERISRetryPolicy(jitter=False, max_backoff=60)
+        self.assertEqual(policy.retry_delay(0, 429, retry_after=30), 30)
+        self.assertEqual(policy.retry_delay(0, 429, retry_after=600), 60)
+        self.assertEqual(policy.parse_retry_after("12"), 12)
+        self.assertEqual(policy.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+        self.assertEqual(policy.parse_retry_after("soon"), None)
+
+    def test_timeout_retries(self):
+        policy = ERISRetryPolicy(timeout_retries=1)
+        self.assertIsNotNone(policy.retry_delay(0, timeout=True))
+        self.assertIsNone(policy.retry_delay(1, timeout=True))
+
+    def test_budget(self):
+        policy = ERISRetryPolicy(budget=2)
+        self.assertIsNotNone(policy.retry_delay(0, 503))
+        self.assertIsNotNone(policy.retry_delay(0, 503))
+        self.assertIsNone(policy.retry_delay(0, 503))
+        policy.reset()
+        self.assertIsNotNone(policy.retry_delay(0, 503))
+
+
+class TestRetryRequests(unittest.TestCase):
+    def create_api(self, **kwargs):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass", retry=ERISRetryPolicy(jitter=False, **kwargs))
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        return api
+
+    @patch('ERIS_API.ERIS_API.time.sleep')
+    def test_retry_status(self, mock_sleep):
+        api = self.create_api()
+        responses = [mock_response(503), mock_response(429, {"Retry-After": "5"}), mock_response(200)]
+        with patch.object(requests.Session, 'get', side_effect=responses) as mock_get:
+            result = api.request_data("https://eris.com/api/rest/tag/data")
+
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual([_.args[0] for _ in mock_sleep.call_args_list], [1, 5])
+        responses[0].close.assert_called_once()
+
+    @patch('ERIS_API.ERIS_API.time.sleep')
+    def test_retries_exhausted(self, mock_sleep):
+        api = self.create_api(max_retries=2)
+        with patch.object(requests.Session, 'get', return_value=mock_response(500)) as mock_get:
+            result = api.request_data("https://eris.com/api/rest/tag/data")
+        self.assertEqual(result.status_code, 500)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('ERIS_API.ERIS_API.time.sleep')
+    def test_timeout_raised(self, mock_sleep):
+        api = self.create_api(timeout_retries=1)
+        with patch.object(requests.Session, 'get', side_effect=requests.exceptions.ReadTimeout()) as mock_get:
+            with self.assertRaises(requests.exceptions.ReadTimeout):
+                api.request_data("https://eris.com/api/rest/tag/data")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertTrue(api._local.timed_out)
+
+    def test_split_request(self):
+        api = self.create_api(min_window=datetime.timedelta(days=1))
+        tags = [ERISTag("lbl", "tag", "average", "P1D")]
+        halves = api._split_request(ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,4), tags))
+        self.assertEqual([(_.start, _.end) for _ in halves], [
+            (datetime.datetime(2021,1,1), datetime.datetime(2021,1,2,12)),
+            (datetime.datetime(2021,1,2,12), datetime.datetime(2021,1,4)),
+        ])
+        self.assertIsNone(api._split_request(ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,2), tags)))
+        self.assertIsNone(api._split_request(ERISRequest("2021-01-01T00:00:00", "P1D", tags)))
+
+    def test_concurrent_splits_timeouts(self):
+        api = self.create_api(min_window=datetime.timedelta(days=1))
+        requested = []
+
+        def _fake_request(request_parameters, fast=None, stream=None, **kwargs):
+            requested.append((request_parameters.start, request_parameters.end))
+            if request_parameters.end - request_parameters.start > datetime.timedelta(days=2):
+                api._local.timed_out = True
+                return None
+            tag_data = [models.ERISColumnData(time=[request_parameters.start.isoformat()], value=[1], source=[""], tagUID=_.request_uuid) for _ in request_parameters.tags]
+            return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,9), [ERISTag("lbl", "tag", "average", "P1D")])
+        with patch.object(ERISAPI, 'request_api_data', side_effect=_fake_request):
+            results = api.request_api_data_concurrent(request, delta=8)
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(len(requested), 7)
+        self.assertEqual(sorted([_.eris_parameters.start for _ in results]), [datetime.datetime(2021,1,d) for d in [1, 3, 5, 7]])
+
+
+if __name__ == "__main__":
+    unittest.main()
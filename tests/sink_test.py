@@ -0,0 +1,93 @@
+import unittest
+from unittest.mock import patch
+
+import datetime
+import tempfile
+
+import pandas as pd
+
+from ERIS_API import ERISAPI, ERISRequest, ERISTag
+from ERIS_API import ERIS_Responses, ERIS_Sink, models
+
+
+@unittest.skipIf(ERIS_Sink.pyarrow is None, "pyarrow not installed")
+class TestERISParquetSink(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.tags = [ERISTag("lbl 1", "tag1", "average", "P1D"), ERISTag("lbl/2", "tag2", "average", "P1D")]
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def create_response(self, request_parameters: ERISRequest, values=None):
+        days = (request_parameters.end - request_parameters.start).days
+        times = [(request_parameters.start + datetime.timedelta(days=d)).strftime("%Y-%m-%dT%H:%M:%S") for d in range(days + 1)]
+        tag_data = [
+            models.ERISColumnData(time=times, value=[str(i)] * len(times) if values is None else values, source=[""] * len(times), tagUID=_.request_uuid)
+            for i, _ in enumerate(request_parameters.tags)
+        ]
+        return ERIS_Responses.ERISResponse.from_columns(request_parameters, tag_data)
+
+    def test_partitions(self):
+        sink = ERIS_Sink.ERISParquetSink(self.directory.name)
+        request = ERISRequest(datetime.datetime(2021,1,30), datetime.datetime(2021,2,2), self.tags)
+        files = sink.write(self.create_response(request))
+
+        self.assertEqual(len(files), 4)
+        self.assertEqual(sink.rows, 8)
+        self.assertTrue((sink.path / "tag=lbl%201" / "date=2021-02").is_dir())
+
+        table = sink.dataset().to_table()
+        self.assertEqual(table.num_rows, 8)
+        self.assertEqual(sorted(set(table.column('tag').to_pylist())), ["lbl 1", "lbl/2"])
+        self.assertEqual(str(table.schema.field('Timestamp').type), 'timestamp[ns]')
+        self.assertEqual(str(table.schema.field('Value').type), 'double')
+
+    def test_end_and_text_values(self):
+        sink = ERIS_Sink.ERISParquetSink(self.directory.name, format='arrow', period='D')
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,1,3), self.tags[:1])
+        files = sink.write(self.create_response(request, ["Open", "", "Closed"]), end=datetime.datetime(2021,1,3))
+
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].suffix == ".arrow")
+        df = sink.dataset().to_table().to_pandas().sort_values('Timestamp')
+        self.assertEqual(df.Value.tolist(), ["Open", None])
+
+    def test_windows_appended(self):
+        sink = ERIS_Sink.ERISParquetSink(self.directory.name, format='arrow')
+        for day in [1, 4, 7]:
+            request = ERISRequest(datetime.datetime(2021,1,day), datetime.datetime(2021,1,day + 3), self.tags[:1])
+            files = sink.write(self.create_response(request), end=request.end)
+        request = ERISRequest(datetime.datetime(2021,1,10), datetime.datetime(2021,1,11), self.tags[:1])
+        sink.write(self.create_response(request, ["Open", "Closed"]))
+
+        self.assertEqual(len(files), 1)
+        self.assertEqual(len(sink.files), 2)
+        self.assertEqual(sink.rows, 11)
+        sink.close()
+        with ERIS_Sink.pyarrow.ipc.open_file(str(files[0])) as reader:
+            self.assertEqual(reader.num_record_batches, 3)
+            self.assertEqual(reader.read_all().num_rows, 9)
+
+    def test_concurrent_sink(self):
+        api = ERISAPI("https://eris.com/", "client", "user", password="pass")
+        api.access_token = {"x-access-token": "abc", "expires": "2999-01-01T00:00:00.000"}
+        sink = ERIS_Sink.ERISParquetSink(self.directory.name)
+
+        request = ERISRequest(datetime.datetime(2021,1,1), datetime.datetime(2021,3,1), self.tags)
+        with patch.object(ERISAPI, 'request_api_data', side_effect=lambda request_parameters, *args, **kwargs: self.create_response(request_parameters)):
+            files = api.request_api_data_concurrent(request, delta=7, sink=sink)
+
+        self.assertEqual(files, sink.files)
+        self.assertEqual(len(files), 2 * 3)
+        self.assertEqual(len(list(sink.path.glob("tag=*/date=*/*.parquet"))), 2 * 3)
+        self.assertEqual(sink._writers, {})
+        df = sink.dataset().to_table().to_pandas()
+        self.assertEqual(len(df), 2 * 60)
+        for _, tag_df in df.groupby('tag'):
+            self.assertTrue(tag_df.Timestamp.is_unique)
+            self.assertEqual(tag_df.Timestamp.max(), pd.Timestamp(2021,3,1))
+
+
+if __name__ == "__main__":
+    unittest.main()
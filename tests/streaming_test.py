@@ -0,0 +1,208 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+import json
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import requests
+
+from ERIS_API.ERIS_Parameters import ERISRequest, ERISTag
+from ERIS_API import ERIS_Responses, ERIS_Streaming
+
+
+def split_bytes(data, size):
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+
+class TestJSONStreaming(unittest.TestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+    json_error_fixture_path = Path("./tests/fixtures/json_response_error_one_tag.json")
+
+    def load_bytes(self, _path):
+        with open(_path, 'rb') as fl:
+            return fl.read()
+
+    def collect(self, data, read_size, chunk_size=None):
+        return list(ERIS_Streaming.iter_json_tag_chunks(split_bytes(data, read_size), chunk_size))
+
+    def test_matches_full_decode(self):
+        data = self.load_bytes(self.json_fixture_path)
+        expected = json.loads(data)['tag']
+        for read_size in [1, 7, 64, len(data)]:
+            chunks = self.collect(data, read_size)
+            self.assertEqual(len(chunks), 2)
+            for chunk, tag in zip(chunks, expected):
+                self.assertEqual(chunk.last, True)
+                self.assertEqual(chunk.tagUID, tag['tagUID'])
+                self.assertEqual(chunk.provider, tag.get('provider'))
+                self.assertEqual(chunk.time, [_['time'] for _ in tag['data']])
+                self.assertEqual(chunk.value, [_['value'] for _ in tag['data']])
+
+    def test_chunk_size(self):
+        data = self.load_bytes(self.json_fixture_path)
+        chunks = self.collect(data, 50, chunk_size=4)
+
+        self.assertEqual([len(_) for _ in chunks], [4, 2, 4, 2])
+        self.assertEqual([_.tag_index for _ in chunks], [0, 0, 1, 1])
+        self.assertEqual([_.last for _ in chunks], [False, True, False, True])
+        self.assertEqual(chunks[0].tagUID, 'uid1')
+
+    def test_tag_without_data(self):
+        data = self.load_bytes(self.json_error_fixture_path)
+        chunks = self.collect(data, 13)
+        self.assertEqual(len(chunks), 2)
+        self.assertEqual(len(chunks[1]), 0)
+
+    def test_multibyte_split(self):
+        data = json.dumps({"tag": [{"tagUID": "uid1", "description": "débit m³", "data": [{"time": "t", "value": 1.5}]}]}).encode()
+        data = data.replace(b'\\u00e9', 'é'.encode()).replace(b'\\u00b3', '³'.encode())
+        chunks = self.collect(data, 1)
+        self.assertEqual(chunks[0].description, "débit m³")
+        self.assertEqual(chunks[0].value, [1.5])
+
+    def test_numbers_split_across_reads(self):
+        data = b'{"tag":[{"tagUID":"a","data":[{"time":"t","value":123456789}]}]}'
+        chunks = self.collect(data, 3)
+        self.assertEqual(chunks[0].value, [123456789])
+
+    def test_compact_rows(self):
+        data = b'{"tag":[{"data":[["2021-01-01T00:00:00","1"],["2021-01-02T00:00:00","2",""]]}]}'
+        chunks = self.collect(data, 5)
+        self.assertEqual(chunks[0].time, ["2021-01-01T00:00:00", "2021-01-02T00:00:00"])
+        self.assertEqual(chunks[0].value, ["1", "2"])
+        self.assertEqual(chunks[0].source, [None, ""])
+
+    def test_truncated_body(self):
+        data = self.load_bytes(self.json_fixture_path)
+        with self.assertRaises(json.JSONDecodeError):
+            self.collect(data[:len(data)//2], 64)
+
+
+class TestXMLStreaming(unittest.TestCase):
+    xml_two_tags = Path('./tests/fixtures/xml_two_tag.xml')
+    xml_two_tags_one_day = Path('./tests/fixtures/xml_two_tags_one_day.xml')
+    xml_two_tags_one_error = Path('./tests/fixtures/xml_two_tags_one_error.xml')
+    xml_one_tags_one_data = Path('./tests/fixtures/xml_one_tag_one_data.xml')
+
+    def load_bytes(self, _path):
+        with open(_path, 'rb') as fl:
+            return fl.read()
+
+    def collect(self, data, read_size, chunk_size=None):
+        return list(ERIS_Streaming.iter_xml_tag_chunks(split_bytes(data, read_size), chunk_size))
+
+    def parse_full(self, _path):
+        response = ERIS_Responses.ERISResponse(None, None, True)
+        with open(_path) as fl:
+            return response._parse_xml(fl.read())['tag']
+
+    def test_matches_parse_xml(self):
+        for _path in [self.xml_two_tags, self.xml_two_tags_one_day, self.xml_two_tags_one_error, self.xml_one_tags_one_data]:
+            data = self.load_bytes(_path)
+            expected = self.parse_full(_path)
+            for read_size in [1, 50, len(data)]:
+                chunks = self.collect(data, read_size)
+                self.assertEqual(len(chunks), len(expected))
+                for chunk, tag in zip(chunks, expected):
+                    self.assertEqual(chunk.last, True)
+                    self.assertEqual(chunk.tagUID, tag['tagUID'])
+                    self.assertEqual(chunk.name, tag['name'])
+                    self.assertEqual(chunk.provider, tag['provider'])
+                    self.assertEqual(chunk.time, [_['time'] for _ in tag['data']])
+                    self.assertEqual(chunk.value, [_['value'] for _ in tag['data']])
+                    self.assertEqual(chunk.source, [_['source'] for _ in tag['data']])
+
+    def test_chunk_size(self):
+        data = self.load_bytes(self.xml_two_tags)
+        expected = self.parse_full(self.xml_two_tags)
+        chunks = self.collect(data, 100, chunk_size=1)
+
+        self.assertEqual(len(chunks), sum(len(_['data']) for _ in expected) + len(expected))
+        self.assertEqual(chunks[0].tagUID, 'uid1')
+        self.assertEqual(sum(_.last for _ in chunks), 2)
+
+    def test_memory_flat_with_rows(self):
+        def body(rows):
+            yield b'<?xml version="1.0" encoding="UTF-8"?><tagDataset><tag><tagUID>uid1</tagUID><name>tag1</name>'
+            for start in range(0, rows, 1000):
+                yield b"".join([b'<data time="2021-01-01T00:00:00" value="%d" source=""/>' % i for i in range(start, start + 1000)])
+            yield b'</tag></tagDataset>'
+
+        peaks = []
+        for rows in [20000, 80000]:
+            tracemalloc.start()
+            count = sum([len(_) for _ in ERIS_Streaming.iter_xml_tag_chunks(body(rows), 1000)])
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            self.assertEqual(count, rows)
+        self.assertLess(peaks[1], peaks[0] * 1.5)
+
+    def test_error_tag_skipped(self):
+        chunks = self.collect(self.load_bytes(self.xml_two_tags_one_error), 64)
+        self.assertEqual([_.tag_index for _ in chunks], [0])
+
+
+class TestStreamingResponse(unittest.TestCase):
+    json_fixture_path = Path("./tests/fixtures/json_response.json")
+    xml_fixture_path = Path('./tests/fixtures/xml_two_tag.xml')
+
+    @patch('ERIS_API.ERIS_Parameters.uuid4')
+    def create_valid_request(self, mk):
+        mk.side_effect = ['uid1', 'uid2']
+        tags = [
+            ERISTag(label="lbl1", tag="tag1", mode="m", interval='i'),
+            ERISTag(label="lbl2", tag="tag2", mode="m", interval='i')
+        ]
+        return ERISRequest(datetime(2021,1,1), datetime(2021,1,7), tags)
+
+    def create_response(self, stream, is_xml=False):
+        _path = self.xml_fixture_path if is_xml else self.json_fixture_path
+        with open(_path, 'rb') as fl:
+            data = fl.read()
+        mk = MagicMock(spec=requests.Response)
+        if is_xml:
+            mk.text = data.decode()
+        else:
+            mk.json.return_value = json.loads(data)
+        mk.iter_content.return_value = split_bytes(data, 100)
+        return ERIS_Responses.ERISResponse(mk, self.create_valid_request(), is_xml, True, stream)
+
+    def test_stream_matches_fast(self):
+        stream_response = self.create_response(True)
+        res = stream_response.process_results()
+        self.assertEqual(res[0].eris_tag.request_uuid, 'uid1')
+        self.assertEqual(res[1].eris_tag.request_uuid, 'uid2')
+        self.assertEqual(stream_response.response_dict, None)
+
+        fast_response = self.create_response(False)
+        fast_response.process_results()
+        pd.testing.assert_frame_equal(
+            stream_response.convert_tags_to_dataframes(),
+            fast_response.convert_tags_to_dataframes()
+        )
+
+    def test_xml_stream_matches_fast(self):
+        stream_response = self.create_response(True, True)
+        res = stream_response.process_results()
+        self.assertEqual(res[0].eris_tag.request_uuid, 'uid1')
+        self.assertEqual(res[1].eris_tag.request_uuid, 'uid2')
+
+        fast_response = self.create_response(False, True)
+        fast_response.process_results()
+        pd.testing.assert_frame_equal(
+            stream_response.convert_tags_to_dataframes(),
+            fast_response.convert_tags_to_dataframes()
+        )
+
+    def test_iter_chunks_match_tags(self):
+        response = self.create_response(True)
+        response.chunk_size = 5
+        chunks = list(response.iter_chunks())
+        self.assertEqual([_.eris_tag.label for _ in chunks], ['lbl1', 'lbl1', 'lbl2', 'lbl2'])
+
+
+if __name__ == "__main__":
+    unittest.main()
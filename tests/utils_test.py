@@ -0,0 +1,113 @@
+import unittest
+from unittest.mock import patch
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from ERIS_API.ERIS_Parameters import ERISRequest, ERISTag
+from ERIS_API import ERIS_Responses, models, utils
+
+
+class TestCombineConcurrentResults(unittest.TestCase):
+    @patch('ERIS_API.ERIS_Parameters.uuid4')
+    def create_tags(self, mk):
+        mk.side_effect = ['uid1', 'uid2']
+        return [
+            ERISTag(label="lbl1", tag="tag1", mode="m", interval='P1D'),
+            ERISTag(label="lbl2", tag="tag2", mode="m", interval='P1D')
+        ]
+
+    def create_response(self, tags, start, end):
+        """Window response with a daily sample for each tag, including the end (inclusive end)"""
+        request = ERISRequest(start, end, tags)
+        response = ERIS_Responses.ERISResponse(None, request, False, True)
+        days = (end - start).days
+        times = [(start + timedelta(days=d)).strftime("%Y-%m-%dT%H:%M:%S") for d in range(days + 1)]
+        response.tag_data = [
+            models.ERISColumnData(time=times, value=[float(i)] * len(times), tagUID=tag.request_uuid, name=tag.tag)
+            for i, tag in enumerate(tags)
+        ]
+        response._match_tags()
+        return response
+
+    def create_results(self):
+        tags = self.create_tags()
+        windows = [(datetime(2021,1,1), datetime(2021,1,5)), (datetime(2021,1,5), datetime(2021,1,9)), (datetime(2021,1,9), datetime(2021,1,10))]
+        results = [self.create_response(tags, *_) for _ in windows]
+        return [results[2], results[0], results[1]]
+
+    def test_ordered_and_deduplicated(self):
+        df = utils.combine_concurrent_results(self.create_results())
+
+        self.assertEqual(df.shape, (20, 3))
+        self.assertEqual(list(df.Tag.unique()), ['lbl1', 'lbl2'])
+        for _, tag_df in df.groupby('Tag'):
+            self.assertTrue(tag_df.Timestamp.is_monotonic_increasing)
+            self.assertTrue(tag_df.Timestamp.is_unique)
+            self.assertEqual(tag_df.Timestamp.iloc[0], pd.Timestamp(2021,1,1))
+            self.assertEqual(tag_df.Timestamp.iloc[-1], pd.Timestamp(2021,1,10))
+
+    def test_boundary_from_later_window(self):
+        results = self.create_results()
+        for i, response in enumerate(results):
+            for tag in response.tag_data:
+                tag.value = [float(i)] * len(tag.time)
+        df = utils.combine_concurrent_results(results).set_index('Timestamp')
+
+        # windows are half open, as in iter_api_data and ERISParquetSink
+        self.assertEqual(df.loc[pd.Timestamp(2021,1,5)].Value.tolist(), [2.0, 2.0])
+        self.assertEqual(df.loc[pd.Timestamp(2021,1,9)].Value.tolist(), [0.0, 0.0])
+        self.assertEqual(df.loc[pd.Timestamp(2021,1,10)].Value.tolist(), [0.0, 0.0])
+        self.assertEqual(ERIS_Responses.window_end(results[1].eris_parameters, datetime(2021,1,10)), datetime(2021,1,5))
+        self.assertIsNone(ERIS_Responses.window_end(results[0].eris_parameters, datetime(2021,1,10)))
+
+        wide = utils.combine_concurrent_results_wide(results)
+        self.assertEqual(wide.loc[pd.Timestamp(2021,1,5)].tolist(), [2.0, 2.0])
+
+    def test_no_dedupe(self):
+        df = utils.combine_concurrent_results(self.create_results(), dedupe=False)
+        self.assertEqual(df.shape, (24, 3))
+
+    def test_lean(self):
+        df = utils.combine_concurrent_results(self.create_results(), lean=True, index=True)
+
+        self.assertEqual(df.shape, (20, 2))
+        self.assertEqual(df.index.dtype, 'datetime64[ns]')
+        self.assertEqual(df.Tag.dtype, 'category')
+        self.assertEqual(list(df.Tag.cat.categories), ['lbl1', 'lbl2'])
+        self.assertEqual(df.Value.dtype, 'Float64')
+
+    def test_wide(self):
+        df = utils.combine_concurrent_results_wide(self.create_results())
+        long_df = utils.combine_concurrent_results(self.create_results())
+
+        self.assertEqual(df.shape, (10, 2))
+        self.assertEqual(list(df.columns), ['lbl1', 'lbl2'])
+        self.assertTrue(df.index.is_monotonic_increasing)
+        pd.testing.assert_frame_equal(df, long_df.pivot(index='Timestamp', columns='Tag', values='Value').rename_axis(columns=None))
+
+    def test_wide_interval(self):
+        results = self.create_results()
+        results[0].tag_data[0].time = ["2021-01-09T00:00:10", "2021-01-10T00:00:10"]
+        df = utils.combine_concurrent_results_wide(results, align='interval')
+        self.assertEqual(df.shape, (10, 2))
+        self.assertEqual(df.index.freq, 'D')
+        self.assertEqual(df.lbl1.isna().sum(), 0)
+
+        results = self.create_results()
+        results[0].tag_data[0].time = ["2021-01-09T00:00:10", "2021-01-10T00:00:10"]
+        df = utils.combine_concurrent_results_wide(results, align='inner')
+        self.assertEqual(df.shape, (9, 2))
+
+    def test_failed_results_skipped(self):
+        results = self.create_results() + [None]
+        df = utils.combine_concurrent_results(results)
+        self.assertEqual(df.shape, (20, 3))
+
+    def test_no_results(self):
+        self.assertIsNone(utils.combine_concurrent_results([]))
+
+
+if __name__ == "__main__":
+    unittest.main()